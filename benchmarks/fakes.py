@@ -0,0 +1,98 @@
+"""Stand-ins for the Discord objects and the bot, shared by the subscription
+benchmarks, and helpers to fill an in-memory database with their guild."""
+import logging
+
+from peewee import chunked
+
+from kyogre.exts.db.kyogredb import KyogreDB, GuildTable, TeamTable, TrainerTable, SubscriptionTable
+from kyogre.exts.db.kyogredb import LocationTable, GymTable, PokestopTable, RegionTable
+from kyogre.exts.db.kyogredb import LocationRegionRelation, LocationNoteTable
+
+GUILD_ID = 1
+POKEMON = [f'pokemon{n}' for n in range(400)]
+
+
+class Pokemon:
+    def __init__(self, name):
+        self.name = name
+
+
+class Role:
+    def __init__(self, name):
+        self.name = name
+
+
+class Member:
+    def __init__(self, guild, member_id, roles=()):
+        self.id = member_id
+        self.guild = guild
+        self.bot = False
+        self.mention = f'<@{member_id}>'
+        self.roles = [Role(r) for r in roles]
+
+
+class Message:
+    async def delete(self):
+        pass
+
+
+class Guild:
+    def __init__(self, member_roles):
+        """member_roles maps each member id to the names of its roles."""
+        self.id = GUILD_ID
+        self._members = {m: Member(self, m, roles) for m, roles in member_roles.items()}
+
+    @property
+    def members(self):
+        return list(self._members.values())
+
+    def get_member(self, member_id):
+        return self._members.get(member_id, None)
+
+
+class Channel:
+    def __init__(self, guild):
+        self.id = 1
+        self.guild = guild
+        self.sent = 0
+
+    async def send(self, content):
+        self.sent += 1
+        return Message()
+
+
+class Faves:
+    @staticmethod
+    def get_report_points(guild, pokemon_list, notification_type, perfect):
+        return 1
+
+
+class Bot:
+    def __init__(self, region_names=(), notification_window=0):
+        regions = {'enabled': bool(region_names),
+                   'info': {name: {'role': name} for name in region_names}}
+        # reports repeat, so the dedup window is off unless asked for
+        subscriptions = {'notification_window': notification_window}
+        self.guild_dict = {GUILD_ID: {'configure_dict': {'regions': regions, 'subscriptions': subscriptions},
+                                      'trainers': {'info': {}}}}
+        self.cogs = {'Faves': Faves()}
+        self.logger = logging.getLogger('benchmark')
+
+
+def create_database(database):
+    """Points KyogreDB at database and creates the tables and the guild the benchmarks use."""
+    KyogreDB._db.initialize(database)
+    KyogreDB._db.create_tables([GuildTable, TeamTable, TrainerTable, SubscriptionTable, LocationTable, GymTable,
+                                PokestopTable, RegionTable, LocationRegionRelation, LocationNoteTable])
+    GuildTable.create(snowflake=GUILD_ID)
+
+
+def insert_subscriptions(trainer_ids, rows):
+    """Adds the trainers and their (trainer, type, target, specific) subscription rows."""
+    with KyogreDB._db.atomic():
+        for batch in chunked([(t, GUILD_ID) for t in trainer_ids], 200):
+            TrainerTable.insert_many(batch, fields=[TrainerTable.snowflake, TrainerTable.guild]).execute()
+        for batch in chunked([(GUILD_ID, *r) for r in rows], 200):
+            SubscriptionTable.insert_many(batch, fields=[SubscriptionTable.guild, SubscriptionTable.trainer,
+                                                         SubscriptionTable.type, SubscriptionTable.target,
+                                                         SubscriptionTable.specific]).execute()
@@ -0,0 +1,124 @@
+"""Compares how fast guild state mutations can be made durable.
+
+Run from the repository root with ``python -m benchmarks.guild_persistence``.
+Builds a synthetic guild_dict, then makes one raid RSVP change at a time and
+persists it after each change using:
+
+- the whole-dict serverdict pickle the bot used to write,
+- a GuildStore save of the dirty guild shards,
+- a GuildStore journal flush, for each fsync policy.
+
+Everything is written to a temporary directory.
+"""
+import argparse
+import os
+import pickle
+import random
+import tempfile
+import time
+
+from kyogre.guild_store import GuildStore
+from kyogre.journal import Journal, FSYNC_POLICIES
+
+
+def build_guild_dict(guilds, raids, reports, trainers):
+    guild_dict = {}
+    for guild_id in range(1, guilds + 1):
+        raid_dict = {}
+        for channel_id in range(raids):
+            raid_dict[channel_id] = {'reportcity': 1, 'trainer_dict': {}, 'exp': time.time() + 3600,
+                                     'pokemon': 'pokemon', 'egg_level': '5', 'address': f'Gym {channel_id}',
+                                     'type': 'raid', 'moveset': 0, 'manual_timer': False}
+        wild_dict = {report_id: {'exp': time.time() + 3600, 'reportchannel': 1, 'reportauthor': 1,
+                                 'location': f'Stop {report_id}', 'pokemon': 'pokemon', 'omw': []}
+                     for report_id in range(reports)}
+        guild_dict[guild_id] = {
+            'configure_dict': {'settings': {'offset': 0, 'prefix': '!'},
+                               'subscriptions': {'enabled': True, 'report_channels': list(range(20))}},
+            'raidchannel_dict': raid_dict,
+            'wildreport_dict': wild_dict,
+            'questreport_dict': dict(wild_dict),
+            'trainers': {'info': {t: {'raid_reports': 0, 'wild_reports': 0} for t in range(trainers)}},
+        }
+    return guild_dict
+
+
+def mutate(guild_dict, args):
+    guild_id = random.randint(1, args.guilds)
+    channel_id = random.randrange(args.raids)
+    trainer = random.randrange(args.trainers)
+    trainer_dict = guild_dict[guild_id]['raidchannel_dict'][channel_id]['trainer_dict']
+    trainer_dict[trainer] = {'status': {'maybe': 0, 'coming': 1, 'here': 0, 'lobby': 0},
+                             'count': random.randint(1, 3), 'party': {'mystic': 1}}
+
+
+def save_serverdict(path, guild_dict):
+    """The whole-dict pickle AdminCommands.save used to write. Returns the bytes written."""
+    serverdict = os.path.join(path, 'serverdict')
+    with tempfile.NamedTemporaryFile('wb', dir=path, delete=False) as tf:
+        pickle.dump(guild_dict, tf, 4)
+        tempname = tf.name
+    if os.path.exists(serverdict):
+        os.replace(serverdict, serverdict + '_backup')
+    os.replace(tempname, serverdict)
+    return os.path.getsize(serverdict)
+
+
+def save_shards(store):
+    return store.save()['bytes']
+
+
+def flush_journal(store):
+    before = store.journal.get_stats()['bytes']
+    store.flush_journal()
+    return store.journal.get_stats()['bytes'] - before
+
+
+def run_case(name, args, guild_dict, persist):
+    random.seed(args.seed)
+    written = 0
+    start = time.perf_counter()
+    for __ in range(args.mutations):
+        mutate(guild_dict, args)
+        written += persist()
+    elapsed = time.perf_counter() - start
+    print(f"{name:>22}: {args.mutations / elapsed:10.1f} mutations/s, {elapsed / args.mutations * 1000:8.3f}ms "
+          f"and {written / args.mutations / 1024:8.1f} KiB written per mutation")
+
+
+def new_store(path, guild_dict, state_journal=None):
+    store = GuildStore(os.path.join(path, 'guilds'), journal=state_journal)
+    for guild_id, state in guild_dict.items():
+        store[guild_id] = state
+    store.save()
+    store.flush_journal()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=20)
+    parser.add_argument('--raids', type=int, default=50, help='raid channels per guild')
+    parser.add_argument('--reports', type=int, default=200, help='wild and research reports per guild')
+    parser.add_argument('--trainers', type=int, default=500, help='trainers per guild')
+    parser.add_argument('--mutations', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    # each case starts from a fresh copy, replaying the same mutations over an already
+    # mutated dict would change nothing
+    guild_dict = build_guild_dict(args.guilds, args.raids, args.reports, args.trainers)
+    print(f"{args.guilds} guilds, {len(pickle.dumps(guild_dict, 4)) / 1024:.0f} KiB pickled")
+    with tempfile.TemporaryDirectory() as path:
+        run_case('serverdict pickle', args, guild_dict, lambda: save_serverdict(path, guild_dict))
+    with tempfile.TemporaryDirectory() as path:
+        store = new_store(path, build_guild_dict(args.guilds, args.raids, args.reports, args.trainers))
+        run_case('dirty shard save', args, store, lambda: save_shards(store))
+    for policy in FSYNC_POLICIES:
+        with tempfile.TemporaryDirectory() as path:
+            store = new_store(path, build_guild_dict(args.guilds, args.raids, args.reports, args.trainers),
+                              Journal(os.path.join(path, 'journal'), fsync=policy))
+            run_case(f'journal fsync={policy}', args, store, lambda: flush_journal(store))
+            store.journal.close()
+
+if __name__ == '__main__':
+    main()
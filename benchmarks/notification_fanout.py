@@ -0,0 +1,230 @@
+"""Simulates subscription fan-out for each report type.
+
+Run from the repository root with ``python -m benchmarks.notification_fanout``.
+Builds a synthetic guild with the requested trainers, subscriptions per type,
+regions and gyms in an in-memory database, then drives
+send_notifications_async with stand-ins for the Discord objects. For each of
+raid, wild, research, lure and item reports it prints the p50/p99 latency, the
+SQL queries issued per report and the memory allocated per report.
+
+Notifications are recorded instead of being handed to the background
+dispatcher, so only matching and message building are measured.
+"""
+import argparse
+import asyncio
+import random
+import time
+import tracemalloc
+
+from playhouse.apsw_ext import APSWDatabase
+
+from benchmarks.fakes import GUILD_ID, POKEMON, Pokemon, Guild, Channel, Bot, create_database, insert_subscriptions
+from kyogre.exts.db.kyogredb import KyogreDB, LocationTable, GymTable, PokestopTable, RegionTable
+from kyogre.exts.db.kyogredb import LocationRegionRelation
+from kyogre.exts.locationmatching import LocationStore
+from kyogre.exts.regions import Regions
+from kyogre.exts.subscriptions import Subscriptions, SubscriptionIndex
+
+ITEMS = ['rare candy', 'golden razz berry', 'silver pinap berry', 'sinnoh stone', 'unova stone',
+         'metal coat', 'dragon scale', 'kings rock', 'sun stone', 'up-grade', 'fast tm', 'charged tm']
+LURES = ['normal', 'glacial', 'mossy', 'magnetic']
+REPORT_TYPES = ['raid', 'wild', 'research', 'lure', 'item']
+CENTER = (47.6, -122.3)
+
+
+class CountingDatabase(APSWDatabase):
+    """Counts the statements executed against the database."""
+    queries = 0
+
+    def execute_sql(self, sql, params=None, commit=True):
+        CountingDatabase.queries += 1
+        return super().execute_sql(sql, params, commit)
+
+
+class Stop:
+    def __init__(self, name, latitude, longitude):
+        self.name = name
+        self.latitude = latitude
+        self.longitude = longitude
+
+    def __str__(self):
+        return self.name
+
+
+class RecordingDispatcher:
+    """Stands in for NotificationDispatcher and counts the members notified."""
+    def __init__(self):
+        self.notified = 0
+
+    def enqueue(self, channel, message, members):
+        self.notified += len(members)
+
+    def stop(self):
+        pass
+
+
+def _random_coordinates():
+    return CENTER[0] + random.uniform(-0.1, 0.1), CENTER[1] + random.uniform(-0.1, 0.1)
+
+
+def _random_target(sub_type, gym_ids):
+    if sub_type == 'pokemon':
+        return random.choice(POKEMON), None
+    if sub_type == 'raid':
+        return random.choice(POKEMON + [str(level) for level in range(1, 6)]), None
+    if sub_type == 'wild':
+        return random.choice(POKEMON + ['perfect']), None
+    if sub_type == 'research':
+        return random.choice(POKEMON), None
+    if sub_type == 'gym':
+        return str(random.randint(1, 5)), str(random.sample(gym_ids, min(3, len(gym_ids))))
+    if sub_type == 'item':
+        return random.choice(ITEMS), None
+    return random.choice(LURES), None
+
+
+def populate(args):
+    """Fills an in-memory database and returns (guild, bot, gyms, stops, subscription count)."""
+    create_database(CountingDatabase(':memory:', pragmas={'foreign_keys': 1}))
+    region_names = [f'region{n}' for n in range(args.regions)]
+    region_ids = [RegionTable.create(name=name, guild=GUILD_ID).id for name in region_names]
+    gyms, stops = [], []
+    with KyogreDB._db.atomic():
+        for n in range(args.gyms + args.stops):
+            latitude, longitude = _random_coordinates()
+            is_gym = n < args.gyms
+            name = f'Gym {n}' if is_gym else f'Stop {n}'
+            location = LocationTable.create(name=name, latitude=str(latitude), longitude=str(longitude),
+                                            guild=GUILD_ID)
+            region = random.randrange(len(region_ids)) if region_ids else None
+            if is_gym:
+                GymTable.create(location=location, ex_eligible=random.random() < 0.1)
+            else:
+                PokestopTable.create(location=location)
+            if region is not None:
+                LocationRegionRelation.create(location=location, region=region_ids[region])
+            entry = (location.id, name, latitude, longitude, [region_names[region]] if region is not None else [])
+            (gyms if is_gym else stops).append(entry)
+    trainer_ids = list(range(1000, 1000 + args.trainers))
+    member_roles = {t: random.sample(region_names, random.randint(1, min(2, len(region_names))))
+                    if region_names else [] for t in trainer_ids}
+    rows = set()
+    gym_ids = [g[0] for g in gyms]
+    for sub_type in ['pokemon', 'raid', 'wild', 'research', 'gym', 'item', 'lure']:
+        count = getattr(args, sub_type)
+        goal, attempts = len(rows) + count, 0
+        # small target pools can run out of unique rows, so give up after a while
+        while len(rows) < goal and attempts < count * 20:
+            attempts += 1
+            target, specific = _random_target(sub_type, gym_ids)
+            rows.add((random.choice(trainer_ids), sub_type, target, specific))
+    insert_subscriptions(trainer_ids, rows)
+    bot = Bot(region_names, args.dedup_window)
+    trainer_info = bot.guild_dict[GUILD_ID]['trainers']['info']
+    for trainer in random.sample(trainer_ids, int(len(trainer_ids) * args.ranged)):
+        trainer_info[trainer] = {'location': _random_coordinates(), 'distance': random.uniform(0.5, 5)}
+    return Guild(member_roles), bot, gyms, stops, len(rows)
+
+
+def build_reports(report_type, gyms, stops, count):
+    """Returns count random report details dicts for report_type."""
+    reports = []
+    for __ in range(count):
+        gym_id, gym_name, __, __, gym_regions = random.choice(gyms)
+        __, stop_name, latitude, longitude, stop_regions = random.choice(stops)
+        if report_type == 'raid':
+            reports.append({'pokemon': [Pokemon(random.choice(POKEMON))], 'tier': random.randint(1, 5),
+                            'location': gym_name, 'gym_id': gym_id, 'regions': gym_regions})
+        elif report_type == 'wild':
+            reports.append({'pokemon': Pokemon(random.choice(POKEMON)), 'perfect': random.random() < 0.2,
+                            'location': stop_name, 'regions': stop_regions})
+        elif report_type == 'research':
+            reports.append({'pokemon': [Pokemon(random.choice(POKEMON))], 'location': stop_name,
+                            'regions': stop_regions})
+        elif report_type == 'lure':
+            reports.append({'type': 'lure', 'lure_type': random.choice(LURES),
+                            'location': Stop(stop_name, latitude, longitude), 'regions': stop_regions})
+        else:
+            reports.append({'item': random.choice(ITEMS), 'location': stop_name, 'regions': stop_regions})
+    return reports
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+async def measure(subscriptions, channel, report_type, reports, repeat):
+    timings, queries = [], 0
+    for n in range(repeat):
+        details = reports[n % len(reports)]
+        before = CountingDatabase.queries
+        start = time.perf_counter()
+        await subscriptions.send_notifications_async(report_type, details, channel)
+        timings.append((time.perf_counter() - start) * 1000)
+        queries += CountingDatabase.queries - before
+    timings.sort()
+    tracemalloc.start()
+    peaks, allocated = [], 0
+    for n in range(repeat):
+        details = reports[n % len(reports)]
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        await subscriptions.send_notifications_async(report_type, details, channel)
+        current, peak = tracemalloc.get_traced_memory()
+        peaks.append(peak - baseline)
+        allocated += current - baseline
+    tracemalloc.stop()
+    return {'p50': percentile(timings, 0.5), 'p99': percentile(timings, 0.99),
+            'queries': queries / repeat, 'peak_kib': sum(peaks) / len(peaks) / 1024,
+            'retained_kib': allocated / repeat / 1024}
+
+
+async def run(args):
+    random.seed(args.seed)
+    guild, bot, gyms, stops, sub_count = populate(args)
+    subscriptions = Subscriptions(bot)
+    subscriptions.dispatcher = RecordingDispatcher()
+    bot.cogs['Regions'] = Regions(bot)
+    channel = Channel(guild)
+    start = time.perf_counter()
+    before = CountingDatabase.queries
+    SubscriptionIndex.invalidate(GUILD_ID)
+    SubscriptionIndex.match(GUILD_ID, [], [])
+    LocationStore.by_id(GUILD_ID, 'gym', gyms[0][0])
+    print(f"{sub_count} subscriptions from {args.trainers} trainers, {args.regions} regions, "
+          f"{args.gyms} gyms and {args.stops} stops")
+    print(f"caches loaded in {(time.perf_counter() - start) * 1000:.1f}ms "
+          f"with {CountingDatabase.queries - before} queries")
+    print(f"{'type':>10} {'p50 ms':>9} {'p99 ms':>9} {'queries':>8} {'peak KiB':>9} "
+          f"{'kept KiB':>9} {'notified':>9}")
+    for report_type in REPORT_TYPES:
+        reports = build_reports(report_type, gyms, stops, args.variety)
+        subscriptions.dispatcher.notified = 0
+        result = await measure(subscriptions, channel, report_type, reports, args.repeat)
+        notified = subscriptions.dispatcher.notified / (args.repeat * 2)
+        print(f"{report_type:>10} {result['p50']:9.3f} {result['p99']:9.3f} {result['queries']:8.2f} "
+              f"{result['peak_kib']:9.1f} {result['retained_kib']:9.2f} {notified:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trainers', type=int, default=2000)
+    parser.add_argument('--regions', type=int, default=4)
+    parser.add_argument('--gyms', type=int, default=200)
+    parser.add_argument('--stops', type=int, default=600)
+    parser.add_argument('--ranged', type=float, default=0.2,
+                        help='fraction of trainers with a notification distance set')
+    for sub_type, default in [('pokemon', 6000), ('raid', 4000), ('wild', 3000), ('research', 3000),
+                              ('gym', 500), ('item', 1500), ('lure', 1000)]:
+        parser.add_argument(f'--{sub_type}', type=int, default=default,
+                            help=f'number of {sub_type} subscriptions')
+    parser.add_argument('--repeat', type=int, default=500, help='reports timed per type')
+    parser.add_argument('--variety', type=int, default=50, help='distinct reports generated per type')
+    parser.add_argument('--dedup-window', type=int, default=0,
+                        help='per-trainer notification dedup window in seconds, 0 to measure every match')
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
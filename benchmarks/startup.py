@@ -0,0 +1,122 @@
+"""Measures how long guild state takes to load at startup.
+
+Run from the repository root with ``python -m benchmarks.startup``.
+Builds a synthetic guild_dict and times each way of getting every guild
+ready, which is reading its configure_dict and report dicts:
+
+- the whole-dict serverdict pickle, loaded with RenameUnpickler and then
+  migrated guild by guild the way on_ready used to on every start,
+- the same states as pre-section pickled shards, migrated on first load,
+- sectioned shards, where the cold sections stay encoded until read.
+
+It then times the first read of every cold section for the sectioned shards.
+Everything is written to a temporary directory.
+"""
+import argparse
+import datetime
+import os
+import pickle
+import random
+import tempfile
+import time
+
+from kyogre import guild_schema
+from kyogre.bot import KyogreBot
+from kyogre.guild_store import GuildStore
+
+
+def build_guild_state(args):
+    state = guild_schema.new_guild_state()
+    now = datetime.datetime.utcnow()
+    state['trainers'] = {t: {'raid_reports': random.randint(0, 500), 'wild_reports': random.randint(0, 500),
+                             'research_reports': random.randint(0, 500), 'joined': random.randint(0, 100),
+                             'silph': f'trainer{t}', 'pokebattler_id': random.randint(0, 10 ** 6)}
+                         for t in range(args.trainers)}
+    state['trainer_names'] = {f'trainer{t}': t for t in range(args.trainers)}
+    state['trade_dict'] = {t: {'lister_id': t, 'report_channel_id': 1, 'offered_pokemon': 'pokemon',
+                               'wanted_pokemon': ['pokemon'] * 3, 'offers': {o: 'pokemon' for o in range(5)},
+                               'report_time': now}
+                           for t in range(args.trades)}
+    reports = {r: {'exp': time.time() + 3600, 'reportchannel': 1, 'reportauthor': 1, 'location': f'Stop {r}',
+                   'pokemon': 'pokemon', 'omw': []} for r in range(args.reports)}
+    state['wildreport_dict'] = reports
+    state['questreport_dict'] = dict(reports)
+    # a state from before the sections on_ready used to add
+    del state['configure_dict']['hideout']
+    state['configure_dict']['trainers'] = state.pop('trainers')
+    return state
+
+
+def ready(state):
+    return state['configure_dict']['settings'], state.get('wildreport_dict'), state.get('questreport_dict')
+
+
+def load_serverdict(path, guild_ids):
+    with open(os.path.join(path, 'serverdict'), 'rb') as fd:
+        guild_dict = KyogreBot.RenameUnpickler(fd).load()
+    for guild_id in guild_ids:
+        guild_dict[guild_id] = guild_schema.MIGRATIONS[0](guild_dict[guild_id])
+        ready(guild_dict[guild_id])
+    return guild_dict
+
+
+def load_store(path, guild_ids):
+    store = GuildStore(path, unpickler=KyogreBot.RenameUnpickler, migrations=guild_schema.MIGRATIONS,
+                       cold_sections=guild_schema.COLD_SECTIONS)
+    for guild_id in guild_ids:
+        ready(store[guild_id])
+    return store
+
+
+def timed(name, runs, load):
+    best = None
+    for __ in range(runs):
+        start = time.perf_counter()
+        load()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:>32}: {best * 1000:9.1f}ms")
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=50)
+    parser.add_argument('--trainers', type=int, default=2000, help='trainers per guild')
+    parser.add_argument('--trades', type=int, default=500, help='trades per guild')
+    parser.add_argument('--reports', type=int, default=100, help='wild and research reports per guild')
+    parser.add_argument('--runs', type=int, default=5, help='runs per case, the best is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    guild_dict = {guild_id: build_guild_state(args) for guild_id in range(1, args.guilds + 1)}
+    guild_ids = list(guild_dict)
+    with tempfile.TemporaryDirectory() as path:
+        with open(os.path.join(path, 'serverdict'), 'wb') as fd:
+            pickle.dump(guild_dict, fd, 4)
+        print(f"{args.guilds} guilds, {os.path.getsize(os.path.join(path, 'serverdict')) / 1024:.0f} KiB pickled")
+        timed('serverdict and on_ready', args.runs, lambda: load_serverdict(path, guild_ids))
+        legacy_path = os.path.join(path, 'legacy')
+        os.makedirs(legacy_path)
+        for guild_id, state in guild_dict.items():
+            with open(os.path.join(legacy_path, f'{guild_id}.pickle'), 'wb') as fd:
+                pickle.dump(state, fd, 4)
+        timed('pickled shards, migrated', args.runs, lambda: load_store(legacy_path, guild_ids))
+        # saving the migrated states writes the sectioned format
+        sectioned_path = os.path.join(path, 'sectioned')
+        migrated = load_store(legacy_path, guild_ids)
+        store = load_store(sectioned_path, [])
+        for guild_id in guild_ids:
+            store[guild_id] = migrated[guild_id]
+        store.save()
+        timed('sectioned shards', args.runs, lambda: load_store(sectioned_path, guild_ids))
+        store = load_store(sectioned_path, guild_ids)
+
+        def read_cold():
+            for guild_id in guild_ids:
+                for section in guild_schema.COLD_SECTIONS:
+                    store[guild_id].get(section)
+        timed('first read of cold sections', 1, read_cold)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Times send_notifications_async against a synthetic guild.
+
+Run from the repository root with ``python -m benchmarks.subscription_index``.
+Uses an in-memory database and stand-ins for the Discord objects, so only
+the subscription matching and message building are measured.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+
+from playhouse.apsw_ext import APSWDatabase
+
+from benchmarks.fakes import GUILD_ID, POKEMON, Pokemon, Guild, Channel, Bot, create_database, insert_subscriptions
+from kyogre.exts.db.kyogredb import KyogreDB, LocationTable, GymTable, RegionTable, LocationRegionRelation
+from kyogre.exts.subscriptions import Subscriptions, SubscriptionIndex
+
+
+def populate(trainers, subscriptions, gyms):
+    create_database(APSWDatabase(':memory:', pragmas={'foreign_keys': 1}))
+    region = RegionTable.create(name='city', guild=GUILD_ID)
+    with KyogreDB._db.atomic():
+        for n in range(gyms):
+            location = LocationTable.create(name=f'Gym {n}', latitude='0', longitude='0', guild=GUILD_ID)
+            GymTable.create(location=location, ex_eligible=False)
+            LocationRegionRelation.create(location=location, region=region)
+    gym_ids = [g.location_id for g in GymTable.select()]
+    trainer_ids = list(range(1000, 1000 + trainers))
+    rows = set()
+    targets = [('raid', str(level)) for level in range(1, 6)] + [('wild', 'perfect')]
+    while len(rows) < subscriptions:
+        trainer = random.choice(trainer_ids)
+        roll = random.random()
+        if roll < 0.05:
+            rows.add((trainer, 'gym', str(random.randint(1, 5)), str(random.sample(gym_ids, 3))))
+        elif roll < 0.1:
+            rows.add((trainer, *random.choice(targets), None))
+        else:
+            rows.add((trainer, random.choice(['pokemon', 'raid', 'wild', 'research']), random.choice(POKEMON), None))
+    insert_subscriptions(trainer_ids, rows)
+    return trainer_ids, gym_ids
+
+
+async def run(args):
+    random.seed(args.seed)
+    trainer_ids, gym_ids = populate(args.trainers, args.subscriptions, args.gyms)
+    subscriptions = Subscriptions(Bot())
+    channel = Channel(Guild({t: [] for t in trainer_ids}))
+    reports = [('raid', {'pokemon': [Pokemon(random.choice(POKEMON))], 'tier': random.randint(1, 5),
+                         'location': 'Gym 0', 'gym_id': gym_ids[0], 'regions': []}),
+               ('wild', {'pokemon': Pokemon(random.choice(POKEMON)), 'perfect': random.random() < 0.2,
+                         'location': 'Some Place', 'regions': []}),
+               ('research', {'pokemon': [Pokemon(random.choice(POKEMON))],
+                             'location': 'Some Stop', 'regions': []})]
+    start = time.perf_counter()
+    SubscriptionIndex.invalidate(GUILD_ID)
+    SubscriptionIndex.match(GUILD_ID, [], [])
+    print(f"{args.subscriptions} subscriptions from {args.trainers} trainers, "
+          f"index loaded in {(time.perf_counter() - start) * 1000:.1f}ms")
+    for notification_type, details in reports:
+        timings = []
+        for __ in range(args.repeat):
+            start = time.perf_counter()
+            await subscriptions.send_notifications_async(notification_type, details, channel)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        print(f"{notification_type:>10}: median {statistics.median(timings):.3f}ms, "
+              f"max {timings[-1]:.3f}ms over {args.repeat} reports")
+    for task in asyncio.all_tasks():
+        if task is not asyncio.current_task():
+            task.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--trainers', type=int, default=2000)
+    parser.add_argument('--subscriptions', type=int, default=10000)
+    parser.add_argument('--gyms', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -7,6 +7,7 @@ import time
 import aiohttp
 import discord
 
+from kyogre import guild_schema
 from kyogre.bot import KyogreBot
 
 from kyogre.exts.db.kyogredb import *
@@ -21,7 +22,6 @@ config = Kyogre.config
 
 async def guild_cleanup(loop=True):
     while not Kyogre.is_closed():
-        guilddict_srvtemp = copy.deepcopy(guild_dict)
         logger.info('Server_Cleanup ------ BEGIN ------')
         guilddict_srvtemp = guild_dict
         dict_guild_list = []
@@ -48,7 +48,7 @@ async def guild_cleanup(loop=True):
             admin_commands_cog = Kyogre.cogs.get('AdminCommands')
             if not admin_commands_cog:
                 return None
-            await admin_commands_cog.save(guild_id)
+            admin_commands_cog.save_nowait(guild_id)
         except Exception as err:
             logger.info('Server_Cleanup - SAVING FAILED' + str(err))
         logger.info('Server_Cleanup ------ END ------')
@@ -60,14 +60,14 @@ async def message_cleanup(loop=True):
     while not Kyogre.is_closed():
         logger.info('message_cleanup ------ BEGIN ------')
         guild_dict = Kyogre.guild_dict
-        guilddict_temp = copy.deepcopy(Kyogre.guild_dict)
         update_ids = set()
         guild_id = None
-        for guildid in guilddict_temp.keys():
+        for guildid in list(guild_dict.keys()):
             if guildid in Kyogre.util_servers:
                 continue
-            questreport_dict = guilddict_temp[guildid].get('questreport_dict', {})
-            wildreport_dict = guilddict_temp[guildid].get('wildreport_dict', {})
+            # only copy the report dicts, copying everything would decode the cold sections too
+            questreport_dict = copy.deepcopy(guild_dict[guildid].get('questreport_dict', {}))
+            wildreport_dict = copy.deepcopy(guild_dict[guildid].get('wildreport_dict', {}))
             report_dict_dict = {
                 'questreport_dict': questreport_dict,
                 'wildreport_dict': wildreport_dict,
@@ -122,7 +122,7 @@ async def message_cleanup(loop=True):
             admin_commands_cog = Kyogre.cogs.get('AdminCommands')
             if not admin_commands_cog:
                 return None
-            await admin_commands_cog.save(guild_id)
+            admin_commands_cog.save_nowait(guild_id)
         except Exception as err:
             logger.info('message_cleanup - SAVING FAILED' + str(err))
         logger.info('message_cleanup ------ END ------')
@@ -144,10 +144,13 @@ async def maint_start(bot):
         exraids_cog = bot.get_cog("EXRaids")
         raids_cog = bot.get_cog("RaidCommands")
         invasions_cog = bot.get_cog("Invasions")
+        faves_cog = bot.get_cog("Faves")
         tasks.append(event_loop.create_task(exraids_cog.channel_cleanup()))
         tasks.append(event_loop.create_task(raids_cog.channel_cleanup()))
         tasks.append(event_loop.create_task(message_cleanup()))
         tasks.append(event_loop.create_task(bot.update_subs_leaderboard()))
+        tasks.append(event_loop.create_task(bot.persist_guild_data()))
+        tasks.append(event_loop.create_task(faves_cog.top_subs_consistency_check()))
         await invasions_cog.cleanup_counters()
         logger.info('Maintenance Tasks Started')
     except KeyboardInterrupt:
@@ -173,128 +176,9 @@ async def on_ready():
     users = 0
     for guild in Kyogre.guilds:
         users += len(guild.members)
-        try:
-            if guild.id not in guild_dict:
-                guild_dict[guild.id] = {
-                    'configure_dict': {
-                                'welcome': {'enabled': False, 'welcomechan': '', 'welcomemsg': ''},
-                                'raid': {'enabled': False, 'report_channels': {}, 'categories': 'same',
-                                         'category_dict': {}, 'raid_channels': {},
-                                         'listings': {'enabled': False, 'channels': {}}, 'short_output': {}},
-                                'counters': {'enabled': False, 'auto_levels': []},
-                                'wild': {'enabled': False, 'report_channels': {},
-                                         'listings': {'enabled': False, 'channels': {}}},
-                                'research': {'enabled': False, 'report_channels': {},
-                                             'listings': {'enabled': False, 'channels': {}}},
-                                'archive': {'enabled': False, 'category': 'same', 'list': None},
-                                'invite': {'enabled': False},
-                                'team': {'enabled': False},
-                                'settings': {'offset': 0, 'regional': None, 'done': False, 'prefix': None,
-                                             'config_sessions': {}, 'invasion_minutes': 30, 'lure_minutes': 30},
-                                'trade': {'enabled': False, 'report_channels': []},
-                                'regions': {'enabled': False, 'command_channels': [], 'info': {}, 'notify_channel': None},
-                                'meetup': {'enabled': False},
-                                'subscriptions': {'enabled': False, 'report_channels': [], 'leaderboard_refresh_seconds': 720,
-                                                  'leaderboard_message': None, 'leaderboard_channel': None,
-                                                  'leaderboard_limit': 5},
-                                'pvp': {'enabled': False, 'report_channels': []},
-                                'join': {'enabled': False},
-                                'lure': {'enabled': False, 'report_channels': {},
-                                         'listings': {'enabled': False, 'channels': {}}},
-                                'invite_tracking': {'enabled': False, 'destination': None, 'invite_counts': {}},
-                                'quick_badge': {'listen_channels': [], 'pokenav_channel': None, 'badge_channel': None,
-                                                'badges': {}, '40_role': None, '40_listen_channels': []},
-                                'hideout': {'enabled': False, 'report_channels': {},
-                                             'listings': {'enabled': False, 'channels': {}}}},
-                    'wildreport_dict': {},
-                    'questreport_dict': {},
-                    'raidchannel_dict': {},
-                    'exchannel_dict': {},
-                    'pvp_dict': {},
-                    'raid_notice_dict': {},
-                    'trade_dict': {},
-                    'trainers': {},
-                    'trainer_names': {}
-                }
-            else:
-                guild_dict[guild.id]['configure_dict'].setdefault('trade', {})
-                guild_dict[guild.id]['configure_dict'].setdefault('regions',
-                                                                  {'enabled': False, 'command_channels': [], 'info': {},
-                                                                   'notify_channel': None})
-                guild_dict[guild.id]['configure_dict'].setdefault('meetup', {'enabled': False})
-                guild_dict[guild.id]['configure_dict'].setdefault('subscriptions',
-                                                                  {'enabled': False, 'report_channels': [],
-                                                                   'leaderboard_refresh_seconds': 720,
-                                                                   'leaderboard_message': None,
-                                                                   'leaderboard_channel': None, 'leaderboard_limit': 5})
-                guild_dict[guild.id]['configure_dict'].setdefault('pvp', {'enabled': False, 'report_channels': []})
-                guild_dict[guild.id]['configure_dict'].setdefault('join', {'enabled': False})
-                guild_dict[guild.id]['configure_dict'].setdefault('lure', {'enabled': False, 'report_channels': {},
-                                                                           'listings': {'enabled': False,
-                                                                                        'channels': {}}})
-                guild_dict[guild.id]['configure_dict'].setdefault('invite_tracking',
-                                                                  {'enabled': False, 'destination': None,
-                                                                   'invite_counts': {}})
-                guild_dict[guild.id]['configure_dict'].setdefault('quick_badge',
-                                                                  {'listen_channels': [], 'pokenav_channel': None,
-                                                                   'badge_channel': None, 'badges': {}, '40_role': None,
-                                                                   '40_listen_channels': []})
-                guild_dict[guild.id]['configure_dict'].setdefault('hideout', {'enabled': False, 'report_channels': {},
-                                                                               'listings': {'enabled': True,
-                                                                                            'channels': {}}})
-                guild_dict[guild.id].setdefault('pvp_dict', {})
-                guild_dict[guild.id].setdefault('raid_notice_dict', {})
-                guild_dict[guild.id].setdefault('trade_dict', {})
-                guild_dict[guild.id].setdefault('exchannel_dict', {})
-                try:
-                    trainers = guild_dict[guild.id]['configure_dict']['trainers']
-                    guild_dict[guild.id]['trainers'] = trainers
-                    del guild_dict[guild.id]['configure_dict']['trainers']
-                except KeyError:
-                    guild_dict[guild.id].setdefault('trainers', {})
-                guild_dict[guild.id].setdefault('trainer_names', {})
-        except KeyError:
-            guild_dict[guild.id] = {
-                'configure_dict': {
-                        'welcome': {'enabled': False, 'welcomechan': '', 'welcomemsg': ''},
-                        'raid': {'enabled': False, 'report_channels': {}, 'categories': 'same',
-                                 'category_dict': {}, 'raid_channels': {},
-                                 'listings': {'enabled': False, 'channels': {}}, 'short_output': {}},
-                        'counters': {'enabled': False, 'auto_levels': []},
-                        'wild': {'enabled': False, 'report_channels': {},
-                                 'listings': {'enabled': False, 'channels': {}}},
-                        'research': {'enabled': False, 'report_channels': {},
-                                     'listings': {'enabled': False, 'channels': {}}},
-                        'archive': {'enabled': False, 'category': 'same', 'list': None},
-                        'invite': {'enabled': False},
-                        'team': {'enabled': False},
-                        'settings': {'offset': 0, 'regional': None, 'done': False, 'prefix': None,
-                                     'config_sessions': {}, 'invasion_minutes': 30, 'lure_minutes': 30},
-                        'trade': {'enabled': False, 'report_channels': []},
-                        'regions': {'enabled': False, 'command_channels': [], 'info': {}, 'notify_channel': None},
-                        'meetup': {'enabled': False},
-                        'subscriptions': {'enabled': False, 'report_channels': [], 'leaderboard_refresh_seconds': 720,
-                                          'leaderboard_message': None, 'leaderboard_channel': None,
-                                          'leaderboard_limit': 5},
-                        'pvp': {'enabled': False, 'report_channels': []},
-                        'join': {'enabled': False},
-                        'lure': {'enabled': False, 'report_channels': {},
-                                 'listings': {'enabled': False, 'channels': {}}},
-                        'invite_tracking': {'enabled': False, 'destination': None, 'invite_counts': {}},
-                        'quick_badge': {'listen_channels': [], 'pokenav_channel': None, 'badge_channel': None,
-                                        'badges': {}, '40_role': None, '40_listen_channels': []},
-                        'hideout': {'enabled': False, 'report_channels': {},
-                                     'listings': {'enabled': False, 'channels': {}}}},
-                'wildreport_dict': {},
-                'questreport_dict': {},
-                'raidchannel_dict': {},
-                'exchannel_dict': {},
-                'pvp_dict': {},
-                'raid_notice_dict': {},
-                'trade_dict': {},
-                'trainers': {},
-                'trainer_names': {}
-            }
+        # older guild states are migrated by GuildStore when they are first loaded
+        if guild.id not in guild_dict:
+            guild_dict[guild.id] = guild_schema.new_guild_state()
         owners.append(guild.owner)
     help_cog = Kyogre.cogs.get('HelpCommand')
     help_cog.set_avatar(Kyogre.user.avatar_url)
@@ -1,13 +1,21 @@
 import asyncio
 import copy
+import hashlib
 import json
 import os
 import pickle
 import sys
+import time
 
 from kyogre.exts.pokemon import Pokemon
+from kyogre import guild_schema
+from kyogre.guild_store import GuildStore, migrate_serverdict
+from kyogre.journal import Journal
+from kyogre.raid_store import RaidChannelStore
+from kyogre.save_scheduler import SaveScheduler
 from kyogre.logs import init_loggers, init_logger
 from kyogre.errors import custom_error_handling
+from kyogre.type_chart import TypeChart
 
 import discord
 from discord.ext import commands
@@ -94,10 +102,12 @@ class KyogreBot(commands.AutoShardedBot):
         self.guild_dict = {}
         self.vision_api_enabled = False
         self.api_usage_limit = 20
+        self.leaderboard_hashes = {}
+        self._load_config()
         self._load_data()
+        self.save_scheduler = SaveScheduler(self, self.config.get('save_interval', 60))
         self.raid_json_path = self._load_raid_data()
         self.quest_json_path = self._load_quest_data()
-        self._load_config()
         self.active_ex = []
         self.active_raids = []
         self.active_wilds = []
@@ -142,22 +152,22 @@ class KyogreBot(commands.AutoShardedBot):
             return super().find_class(module, name)
 
     def _load_data(self):
-        try:
-            with open(os.path.join('data', 'serverdict'), 'rb') as fd:
-                self.guild_dict = self.RenameUnpickler(fd).load()
-            self.logger.info('Serverdict Loaded Successfully')
-        except OSError:
-            self.logger.info('Serverdict Not Found - Looking for Backup')
-            try:
-                with open(os.path.join('data', 'serverdict_backup'), 'rb') as fd:
-                    self.guild_dict = self.RenameUnpickler(fd).load()
-                self.logger.info('Serverdict Backup Loaded Successfully')
-            except OSError:
-                self.logger.info('Serverdict Backup Not Found - Creating New Serverdict')
-                self.guild_dict = {}
-                with open(os.path.join('data', 'serverdict'), 'wb') as fd:
-                    pickle.dump(self.guild_dict, fd, -1)
-                self.logger.info('Serverdict Created')
+        RaidChannelStore.logger = self.logger
+        state_journal = Journal(os.path.join('data', 'journal'), fsync=self.config.get('journal_fsync', 'interval'),
+                                logger=self.logger)
+        self.guild_dict = GuildStore(os.path.join('data', 'guilds'), self.logger, self.RenameUnpickler,
+                                     journal=state_journal, external={'raidchannel_dict': RaidChannelStore.load},
+                                     migrations=guild_schema.MIGRATIONS, cold_sections=guild_schema.COLD_SECTIONS)
+        migrated = migrate_serverdict(self.guild_dict, os.path.join('data', 'serverdict'),
+                                      self.RenameUnpickler, self.logger)
+        if migrated is not None:
+            self.logger.info(f'Serverdict Migrated to Shards for {migrated} Guilds')
+        replayed = self.guild_dict.recover()
+        if replayed:
+            self.logger.info(f'Replayed {replayed} Journal Records')
+        # raid channels imported from the serverdict or the shards go straight to the database
+        RaidChannelStore.flush()
+        self.logger.info(f'Guild Data Found for {len(self.guild_dict)} Guilds')
 
     def _load_config(self):
         # Load configuration
@@ -166,6 +176,7 @@ class KyogreBot(commands.AutoShardedBot):
         # Load type information
         with open(os.path.join('data', 'defense_chart.json'), 'r') as fd:
             self.defense_chart = json.load(fd)
+        self.type_chart = TypeChart(self.defense_chart)
         with open(os.path.join('data', 'type_list.json'), 'r') as fd:
             self.type_list = json.load(fd)
 
@@ -310,8 +321,8 @@ class KyogreBot(commands.AutoShardedBot):
 
     async def _calculate_invite_used(self, member):
         guild = member.guild
-        t_guild_dict = copy.deepcopy(self.guild_dict)
-        invite_dict = t_guild_dict[guild.id]['configure_dict']['invite_tracking']['invite_counts']
+        invite_tracking = copy.deepcopy(self.guild_dict[guild.id]['configure_dict']['invite_tracking'])
+        invite_dict = invite_tracking['invite_counts']
         all_invites = await guild.invites()
         messages = []
         invite_codes = []
@@ -327,7 +338,7 @@ class KyogreBot(commands.AutoShardedBot):
             invite_dict[inv.code] = inv.uses
         notify = '\n'.join(messages)
         self.user_logger.info(notify)
-        destination = t_guild_dict[guild.id]['configure_dict']['invite_tracking'].get('destination', None)
+        destination = invite_tracking.get('destination', None)
         if destination and len(messages) > 0:
             try:
                 await self.get_channel(destination).send(notify)
@@ -450,48 +461,105 @@ class KyogreBot(commands.AutoShardedBot):
             if message.content.strip() == "!archive":
                 self.guild_dict[guild.id]['raidchannel_dict'][channel.id]['archive'] = True
             if self.guild_dict[guild.id]['raidchannel_dict'][channel.id].get('archive', False):
-                logs = self.guild_dict[guild.id]['raidchannel_dict'][channel.id].get('logs', {})
+                logs = self.guild_dict[guild.id]['raidchannel_dict'][channel.id].setdefault('logs', {})
                 logs[message.id] = {'author_id': author.id, 'author_str': str(author),'author_avy':author.avatar_url,'author_nick':author.nick,'color_int':author.color.value,'content': message.clean_content,'created_at':message.created_at}
-                self.guild_dict[guild.id]['raidchannel_dict'][channel.id]['logs'] = logs
+
+    async def persist_guild_data(self):
+        """Journals guild state changes and writes changed raid channels every
+        journal_interval seconds, and folds the journal into the guild shards once
+        it passes journal_compact_bytes or journal_compact_seconds have gone by."""
+        interval = self.config.get('journal_interval', 5)
+        compact_bytes = self.config.get('journal_compact_bytes', 8 * 1024 * 1024)
+        compact_seconds = self.config.get('journal_compact_seconds', 600)
+        last_compaction = time.monotonic()
+        while not self.is_closed():
+            await asyncio.sleep(interval)
+            try:
+                RaidChannelStore.flush()
+                self.guild_dict.flush_journal()
+                if self.guild_dict.journal.size() >= compact_bytes or \
+                        time.monotonic() - last_compaction >= compact_seconds:
+                    await self.save_scheduler.request()
+                    last_compaction = time.monotonic()
+            except Exception as e:
+                self.logger.error(f"Failed to persist guild data. Error: {str(e)}")
 
     async def update_subs_leaderboard(self):
+        """Refreshes each guild's subscription leaderboard on that guild's own
+        leaderboard_refresh_seconds interval, leaderboard_concurrency guilds at a time.
+        Only the guilds the bot is in are checked, going by their configure_dict
+        alone, so the shards of guilds it left aren't loaded and cold sections
+        aren't decoded."""
         await self.wait_until_ready()
-        sleep_time = 3600
+        semaphore = asyncio.Semaphore(self.config.get('leaderboard_concurrency', 4))
+        next_runs = {}
+        running = set()
+
+        async def run(guild_id):
+            try:
+                async with semaphore:
+                    await self._update_guild_subs_leaderboard(guild_id)
+            finally:
+                running.discard(guild_id)
+
         while not self.is_closed():
-            guilddict_chtemp = copy.deepcopy(self.guild_dict)
-            # for every server in save data
-            for guildid in guilddict_chtemp.keys():
-                if guildid in self.util_servers:
+            now = time.monotonic()
+            leaderboards = self._leaderboard_settings()
+            for guild_id in [g for g in next_runs if g not in leaderboards]:
+                del next_runs[guild_id]
+            for guild_id, sub_settings in leaderboards.items():
+                if guild_id in running or next_runs.get(guild_id, 0) > now:
                     continue
-                self.logger.info(f"Updating subscription leaderboard for guild with id: {guildid}")
-                guild = self.get_guild(guildid)
-                message_id = guilddict_chtemp[guildid]['configure_dict'].get('subscriptions', {}).get(
-                    'leaderboard_message', 0)
-                channel_id = guilddict_chtemp[guildid]['configure_dict'].get('subscriptions', {}).get(
-                    'leaderboard_channel', None)
-                if channel_id is not None:
-                    channel = guild.get_channel(channel_id)
-                    message = None
-                    try:
-                        message = await channel.fetch_message(message_id)
-                    except discord.errors.NotFound:
-                        self.logger.info(f"Could not find previous leaderboard message with id: {message_id}")
-                    try:
-                        faves_cog = self.cogs.get('Faves')
-                        content = await faves_cog.build_top_sub_lists(guild)
-                        if message is None:
-                            new_msg = await channel.send(content)
-                            guilddict_chtemp[guildid]['configure_dict']['subscriptions']['leaderboard_message'] = new_msg.id
-                        else:
-                            await message.edit(content=content)
-                        self.logger.info("Subscription leaderboard update complete.")
-                    except (AttributeError, Exception) as e:
-                        self.logger.info(f"Failed to update top subs leaderboard with error: {e}")
-                # this is a bug. sleep time is stored per guild but the sleep and do work loop is for all guilds
-                # should spawn separate loops per guild but that's low-pri until there is actually an instance
-                # running on multiple guilds.
-                sleep_time = guilddict_chtemp[guildid]['configure_dict'].get('subscriptions', {}).get(
-                    'leaderboard_refresh_seconds', 3600)
-            self.guild_dict = guilddict_chtemp
-
-            await asyncio.sleep(sleep_time)
+                next_runs[guild_id] = now + sub_settings.get('leaderboard_refresh_seconds', 3600)
+                running.add(guild_id)
+                asyncio.ensure_future(run(guild_id))
+            # wake up for the next guild that's due, checking for config changes at least once a minute
+            sleep_time = min([t - now for t in next_runs.values()] + [60])
+            await asyncio.sleep(max(sleep_time, 1))
+
+    def _leaderboard_settings(self):
+        """Returns the subscription settings of the guilds the bot is in that have a
+        leaderboard channel configured, by guild id."""
+        leaderboards = {}
+        for guild in self.guilds:
+            if guild.id in self.util_servers or guild.id not in self.guild_dict:
+                continue
+            sub_settings = self.guild_dict[guild.id].get('configure_dict', {}).get('subscriptions', {})
+            if sub_settings.get('leaderboard_channel', None) is not None:
+                leaderboards[guild.id] = sub_settings
+        return leaderboards
+
+    async def _update_guild_subs_leaderboard(self, guild_id):
+        guild = self.get_guild(guild_id)
+        if guild is None:
+            return
+        sub_settings = self.guild_dict[guild_id]['configure_dict'].get('subscriptions', {})
+        channel = guild.get_channel(sub_settings.get('leaderboard_channel', None))
+        if channel is None:
+            return
+        try:
+            faves_cog = self.cogs.get('Faves')
+            content = await faves_cog.build_top_sub_lists(guild)
+        except Exception as e:
+            return self.logger.info(f"Failed to build top subs leaderboard for guild {guild_id} with error: {e}")
+        message_id = sub_settings.get('leaderboard_message', 0)
+        content_hash = hashlib.sha1(content.encode('utf-8')).hexdigest()
+        if self.leaderboard_hashes.get(guild_id, None) == (message_id, content_hash):
+            return
+        message = None
+        try:
+            message = await channel.fetch_message(message_id)
+        except discord.errors.NotFound:
+            self.logger.info(f"Could not find previous leaderboard message with id: {message_id}")
+        except Exception as e:
+            return self.logger.info(f"Failed to fetch leaderboard message for guild {guild_id} with error: {e}")
+        try:
+            if message is None:
+                message = await channel.send(content)
+                sub_settings['leaderboard_message'] = message.id
+            else:
+                await message.edit(content=content)
+            self.leaderboard_hashes[guild_id] = (message.id, content_hash)
+            self.logger.info(f"Subscription leaderboard update complete for guild with id: {guild_id}")
+        except Exception as e:
+            self.logger.info(f"Failed to update top subs leaderboard with error: {e}")
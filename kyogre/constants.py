@@ -1 +1,2 @@
-MAX_MESSAGE_LENGTH = 2000
\ No newline at end of file
+MAX_MESSAGE_LENGTH = 2000
+MAX_EMBED_FIELD_LENGTH = 1024
\ No newline at end of file
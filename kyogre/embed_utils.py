@@ -2,7 +2,7 @@ import copy
 import datetime
 import discord
 
-from kyogre import server_emoji, utils
+from kyogre import constants, server_emoji, utils
 from kyogre.exts.pokemon import Pokemon
 
 
@@ -124,11 +124,14 @@ async def build_raid_embeds(kyogre, message, raid_dict, enabled, assume=False):
     else:
         egg_info = kyogre.raid_info['raid_eggs'][str(raid_dict['egglevel'])]
         egg_img = egg_info['egg_img']
-        boss_list = []
-        for entry in egg_info['pokemon']:
-            p = Pokemon.get_pokemon(kyogre, entry)
-            boss_list.append(str(p) + utils.types_to_str(guild, p.types, kyogre.config))
-        bosslist = '\n'.join(boss_list)
+        bosses = [Pokemon.get_pokemon(kyogre, entry) for entry in egg_info['pokemon']]
+        weaknesses = Pokemon.get_weaknesses(kyogre, bosses)
+        boss_list = [str(p) + utils.types_to_str(guild, p.types, kyogre.config) for p in bosses]
+        bosslist = '\n'.join(f"{line} **Weak:** {utils.types_to_str(guild, weaknesses[p.name], kyogre.config)}"
+                             for p, line in zip(bosses, boss_list))
+        # long boss lists leave the weaknesses out rather than overflow the field
+        if len(bosslist) > constants.MAX_EMBED_FIELD_LENGTH:
+            bosslist = '\n'.join(boss_list)
         if len(bosslist) < 1:
             bosslist = kyogre.empty_str
         if enabled:
@@ -1,13 +1,10 @@
 import asyncio
-import errno
 import io
 import json
 import os
-import pickle
 import re
 import sys
 import textwrap
-import tempfile
 import time
 import traceback
 
@@ -18,7 +15,8 @@ from discord.ext import commands
 
 from kyogre import checks, utils, server_emoji
 from kyogre.exts.db.kyogredb import PokemonTable
-from kyogre.exts.pokemon import Pokemon
+from kyogre.exts.locationmatching import GymAliasStore
+from kyogre.exts.pokemon import Pokemon, PokedexRegistry
 
 
 class AdminCommands(commands.Cog):
@@ -123,47 +121,30 @@ class AdminCommands(commands.Cog):
         """**Usage**: `!save`
         Save persistent state to file, path is relative to current directory."""
         try:
-            await self.save(ctx.guild.id)
+            await self.save(ctx.guild.id, immediate=True)
             self.bot.logger.info('CONFIG SAVED')
             await ctx.message.add_reaction('✅')
         except Exception as err:
             await self._print(self.bot.owner, 'Error occurred while trying to save!')
             await self._print(self.bot.owner, err)
 
-    async def save(self, guildid):
-        try:
-            with open('config.json', 'w') as fd:
-                json.dump(self.bot.config, fd, indent=4)
-        except Exception as e:
-            self.bot.logger.error(f"Failed to save config. Error: {str(e)}")
+    async def save(self, guildid, immediate=False):
+        """Saves through the bot's save scheduler, which folds requests made close
+        together into one flush. Pass immediate to flush without waiting."""
+        result = await self.bot.save_scheduler.request(guildid, immediate)
+        for error in result['errors']:
+            await self._print(self.bot.owner, error)
+
+    def save_nowait(self, guildid):
+        """Asks for a save without waiting for the flush, for the maintenance loops.
+        Errors are still sent to the owner once the flush is done."""
+        asyncio.ensure_future(self._save_in_background(guildid))
+
+    async def _save_in_background(self, guildid):
         try:
-            with tempfile.NamedTemporaryFile('wb', dir=os.path.dirname(os.path.join('data', 'serverdict')),
-                                             delete=False) as tf:
-                pickle.dump(self.bot.guild_dict, tf, 4)
-                tempname = tf.name
-            try:
-                os.remove(os.path.join('data', 'serverdict_backup'))
-            except OSError:
-                pass
-            try:
-                os.rename(os.path.join('data', 'serverdict'), os.path.join('data', 'serverdict_backup'))
-            except OSError as e:
-                if e.errno != errno.ENOENT:
-                    raise
-            os.rename(tempname, os.path.join('data', 'serverdict'))
-        except Exception as e:
-            self.bot.logger.error(f"Failed to save serverdict. Error: {str(e)}")
-        location_matching_cog = self.bot.cogs.get('LocationMatching')
-        if not location_matching_cog:
-            await self._print(self.bot.owner, 'Pokestop and Gym data not saved!')
-            return None
-        stop_save = location_matching_cog.save_stops_to_json(guildid)
-        gym_save = location_matching_cog.save_gyms_to_json(guildid)
-        pkmn_save = Pokemon.save_pokemon_to_json()
-        if stop_save is not None:
-            await self._print(self.bot.owner, f'Failed to save pokestop data with error: {stop_save}!')
-        if gym_save is not None:
-            await self._print(self.bot.owner, f'Failed to save gym data with error: {gym_save}!')
+            await self.save(guildid)
+        except Exception as err:
+            self.bot.logger.info('Background save failed: ' + str(err))
 
     async def _print(self, owner, message):
         if 'launcher' in sys.argv[1:]:
@@ -178,7 +159,7 @@ class AdminCommands(commands.Cog):
         """**Usage**: `!restart`
         Calls the save function and restarts Kyogre."""
         try:
-            await self.save(ctx.guild.id)
+            await self.save(ctx.guild.id, immediate=True)
         except Exception as err:
             await self._print(self.bot.owner, 'Error occurred while trying to save!')
             await self._print(self.bot.owner, err)
@@ -193,7 +174,7 @@ class AdminCommands(commands.Cog):
         Calls the save function and shuts down the bot.
         **Note**: If running bot through docker, Kyogre will likely restart."""
         try:
-            await self.save(ctx.guild.id)
+            await self.save(ctx.guild.id, immediate=True)
         except Exception as err:
             await self._print(self.bot.owner, 'Error occurred while trying to save!')
             await self._print(self.bot.owner, err)
@@ -642,6 +623,7 @@ class AdminCommands(commands.Cog):
             elif attr == "released":
                 poke_instance.released = True
             poke_instance.save()
+            PokedexRegistry.invalidate()
         else:
             await ctx.channel.send(embed=discord.Embed(
                 colour=discord.Colour.red(),
@@ -654,6 +636,55 @@ class AdminCommands(commands.Cog):
             delete_after=12)
         return await ctx.message.add_reaction(self.bot.success_react)
 
+    @commands.command(name='cache_stats', aliases=['cs'], hidden=True)
+    @checks.is_owner()
+    async def _cache_stats(self, ctx):
+        """**Usage**: `!cache_stats/cs`
+        Shows the hit rates of the in-memory lookup caches."""
+        stats = Pokemon.get_parse_cache_stats()
+        msg = f"**Pokemon argument cache**: {stats['hits']} hits, {stats['misses']} misses " \
+              f"({stats['hit_rate']:.1%}), {stats['size']}/{stats['maxsize']} entries"
+        if ctx.guild:
+            stats = GymAliasStore.get_stats(ctx.guild.id)
+            msg += f"\n**Gym aliases**: {stats['hits']} hits, {stats['misses']} misses " \
+                   f"({stats['hit_rate']:.1%}), {stats['size']} entries"
+        await ctx.send(msg)
+
+    @commands.command(name='notification_stats', aliases=['ns'], hidden=True)
+    @checks.is_owner()
+    async def _notification_stats(self, ctx):
+        """**Usage**: `!notification_stats/ns`
+        Shows the subscription notification queue depth and send latency."""
+        subscriptions_cog = self.bot.cogs.get('Subscriptions')
+        stats = subscriptions_cog.dispatcher.get_stats()
+        msg = f"**Notification queue**: {stats['queue_depth']} pending, {stats['jobs']} sent " \
+              f"({stats['coalesced']} coalesced) in {stats['messages']} messages, {stats['failed']} failed\n" \
+              f"**Send latency**: avg {stats['latency_avg']:.2f}s, p95 {stats['latency_p95']:.2f}s, " \
+              f"max {stats['latency_max']:.2f}s\n" \
+              f"**Scheduled cleanups**: {stats['scheduled']} pending, {stats['deleted']} messages deleted"
+        window = subscriptions_cog.notification_window.get_stats()
+        msg += f"\n**Dedup window**: {window['allowed']} trainers notified, {window['duplicates']} duplicates " \
+               f"and {window['rate_limited']} over the rate limit skipped, {window['tracked']} pairs tracked"
+        if stats['role_pool'] is not None:
+            pool = stats['role_pool']
+            msg += f"\n**Role pool**: {stats['role_notifications']} role notifications, " \
+                   f"{pool['in_use']} roles in use, {pool['free']} free, {pool['exhausted']} times exhausted, " \
+                   f"{pool['role_edits']} role edits ({pool['edit_failures']} failed)"
+        await ctx.send(msg)
+
+    @commands.command(name='save_stats', aliases=['svs'], hidden=True)
+    @checks.is_owner()
+    async def _save_stats(self, ctx):
+        """**Usage**: `!save_stats/svs`
+        Shows how often state is saved and how long the saves take."""
+        stats = self.bot.save_scheduler.get_stats()
+        last_flush = 'never' if stats['last_flush_age'] is None else f"{stats['last_flush_age']:.0f}s ago"
+        msg = f"**Saves**: {stats['requests']} requested, {stats['flushes']} flushes, last {last_flush}, " \
+              f"{stats['failures']} failed\n" \
+              f"**Flush duration**: avg {stats['duration_avg']:.3f}s, max {stats['duration_max']:.3f}s\n" \
+              f"**Written**: {stats['shards']} guild shards, {stats['bytes'] / 1024:.0f} KiB"
+        await ctx.send(msg)
+
     @commands.command(name='cloud_enable', aliases=['ecloud'])
     @checks.is_owner()
     async def _enable_cloud_vision(self, ctx):
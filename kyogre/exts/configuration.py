@@ -139,6 +139,7 @@ class Configuration(commands.Cog):
                 ctx.config_dict_temp['settings']['done'] = True
                 await ctx.channel.send("Config changed: overwriting config dict.")
                 self.bot.guild_dict[guild.id]['configure_dict'] = ctx.config_dict_temp
+                self._config_changed(guild.id)
                 await owner.send(embed=discord.Embed(colour=discord.Colour.lighter_grey(), description="Alright! Your settings have been saved and I'm ready to go! If you need to change any of these settings, just type **!configure** in your server again.").set_author(name='Configuration Complete', icon_url=self.bot.user.avatar_url))
             del self.bot.guild_dict[guild.id]['configure_dict']['settings']['config_sessions'][owner.id]
 
@@ -147,6 +148,11 @@ class Configuration(commands.Cog):
         """All settings"""
         await self._configure(ctx, "all")
 
+    def _config_changed(self, guild_id):
+        regions_cog = self.bot.cogs.get('Regions')
+        if regions_cog:
+            regions_cog.invalidate(guild_id)
+
     async def _check_sessions_and_invoke(self, ctx, func_ref):
         guild = ctx.message.guild
         owner = ctx.message.author
@@ -169,6 +175,7 @@ class Configuration(commands.Cog):
         ctx = await func_ref(ctx, self.bot)
         if ctx:
             self.bot.guild_dict[guild.id]['configure_dict'] = ctx.config_dict_temp
+            self._config_changed(guild.id)
             await owner.send(embed=discord.Embed(colour=discord.Colour.lighter_grey(), description="Alright! Your settings have been saved and I'm ready to go! If you need to change any of these settings, just type **!configure** in your server again.").set_author(name='Configuration Complete', icon_url=self.bot.user.avatar_url))
         del self.bot.guild_dict[guild.id]['configure_dict']['settings']['config_sessions'][owner.id]
 
@@ -24,10 +24,10 @@ class KyogreDB:
             HideoutTable, InvasionTable, InviteRoleTable, LocationNoteTable, LocationRegionRelation,
             LocationTable, LureTable, LureTypeRelation, LureTypeTable,
             PokemonTable, PokestopTable, QuestTable, RaidActionTable,
-            RaidBossRelation, RaidTable, RegionTable, ResearchTable,
+            RaidBossRelation, RaidChannelTable, RaidLogTable, RaidRSVPTable, RaidTable, RegionTable, ResearchTable,
             RewardTable, SightingTable, SilphcardTable, SubscriptionTable,
             TeamTable, TradeTable, TrainerReportRelation, TrainerTable,
-            TopSubsTable, APIUsageTable
+            TopSubsTable, APIUsageTable, GymAliasTable
         ])
         cls.init()
         cls._migrator = SqliteMigrator(cls._db)
@@ -251,6 +251,17 @@ class LocationTable(BaseModel):
             LocationTable.create_location(name, data)
 
 
+class GymAliasTable(BaseModel):
+    guild = ForeignKeyField(GuildTable, field=GuildTable.snowflake, backref='gymaliases', index=True)
+    alias = TextField(index=True)
+    location = ForeignKeyField(LocationTable, backref='aliases', index=True)
+    source = TextField()
+    hits = IntegerField(default=0)
+
+    class Meta:
+        constraints = [SQL('UNIQUE(guild_id, alias)')]
+
+
 class LocationNoteTable(BaseModel):
     location = ForeignKeyField(LocationTable, backref='notes')
     note = TextField()
@@ -430,6 +441,50 @@ class RaidActionTable(BaseModel):
     trainer_dict = JSONField(null=True)
 
 
+class RaidChannelTable(BaseModel):
+    guild = BigIntegerField(index=True)
+    channel = BigIntegerField(unique=True)
+    type = TextField(index=True, null=True)
+    level = TextField(null=True)
+    pokemon = TextField(null=True)
+    gym = IntegerField(index=True, null=True)
+    active = BooleanField(default=True)
+    meetup = BooleanField(default=False)
+    hatch_time = FloatField(null=True)
+    expire_time = FloatField(null=True)
+    report_message = BigIntegerField(index=True, null=True)
+    city_message = BigIntegerField(index=True, null=True)
+    state = BlobField()
+
+    class Meta:
+        indexes = ((('guild', 'expire_time'), False),)
+
+
+class RaidRSVPTable(BaseModel):
+    raid_channel = ForeignKeyField(RaidChannelTable, field=RaidChannelTable.channel,
+                                   backref='rsvps', on_delete='CASCADE')
+    trainer = BigIntegerField(index=True)
+    maybe = IntegerField(default=0)
+    coming = IntegerField(default=0)
+    here = IntegerField(default=0)
+    lobby = IntegerField(default=0)
+    count = IntegerField(default=1)
+    details = BlobField()
+
+    class Meta:
+        constraints = [SQL('UNIQUE(raid_channel_id, trainer)')]
+
+
+class RaidLogTable(BaseModel):
+    raid_channel = ForeignKeyField(RaidChannelTable, field=RaidChannelTable.channel,
+                                   backref='logs', on_delete='CASCADE')
+    message = BigIntegerField()
+    details = BlobField()
+
+    class Meta:
+        constraints = [SQL('UNIQUE(raid_channel_id, message)')]
+
+
 class RaidBossRelation(BaseModel):
     boss = ForeignKeyField(BossTable, backref='raids')
     raid = ForeignKeyField(RaidTable, backref='boss')
@@ -362,10 +362,9 @@ class EXRaids(commands.Cog):
     async def channel_cleanup(self):
         while not self.bot.is_closed():
             active_ex = self.bot.active_ex
-            guilddict_chtemp = copy.deepcopy(self.bot.guild_dict)
             self.bot.logger.info('EX Channel_Cleanup ------ BEGIN ------')
             # for every server in save data
-            for guildid in guilddict_chtemp.keys():
+            for guildid in list(self.bot.guild_dict.keys()):
                 if guildid in self.bot.util_servers:
                     continue
                 guild = self.bot.get_guild(guildid)
@@ -379,8 +378,9 @@ class EXRaids(commands.Cog):
                 dict_channel_delete = []
                 discord_channel_delete = []
                 # check every ex channel data for each server
-                for cat in guilddict_chtemp[guildid].get('exchannel_dict', {}):
-                    cat_dict = guilddict_chtemp[guildid]['exchannel_dict'][cat]
+                exchannel_dict = copy.deepcopy(self.bot.guild_dict[guildid].get('exchannel_dict', {}))
+                for cat in exchannel_dict:
+                    cat_dict = exchannel_dict[cat]
                     for channelid in cat_dict['channels'].keys():
                         channel = self.bot.get_channel(channelid)
                         log_str = 'EX Channel_Cleanup - Server: ' + guild.name
@@ -437,7 +437,7 @@ class EXRaids(commands.Cog):
                     admin_commands_cog = self.bot.cogs.get('AdminCommands')
                     if not admin_commands_cog:
                         return None
-                    await admin_commands_cog.save(guildid)
+                    admin_commands_cog.save_nowait(guildid)
                 except Exception as err:
                     self.bot.logger.info('EX Channel_Cleanup - SAVING FAILED' + str(err))
             self.bot.logger.info('EX Channel_Cleanup ------ END ------')
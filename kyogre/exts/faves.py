@@ -1,8 +1,108 @@
+import asyncio
 import math
+from collections import Counter
 from discord.ext import commands
 from kyogre.exts.db.kyogredb import *
 
 
+class TopSubs:
+    """In-memory per-guild subscription counts by report type and target.
+
+    'pokemon' subscriptions count towards both wild and research. Counts are
+    loaded once per guild, then adjusted as trainers add and remove
+    subscriptions and written through to TopSubsTable.
+    """
+    _guilds = {}
+    counted_types = {'research': ['research'], 'wild': ['wild'], 'pokemon': ['research', 'wild']}
+
+    @classmethod
+    def _count(cls, guild_id):
+        counts = {'research': Counter(), 'wild': Counter()}
+        result = (SubscriptionTable
+                  .select(SubscriptionTable.type, SubscriptionTable.target,
+                          fn.Count(fn.DISTINCT(SubscriptionTable.trainer)).alias('count'))
+                  .where(SubscriptionTable.guild_id == guild_id)
+                  .where(SubscriptionTable.type << list(cls.counted_types.keys()))
+                  .group_by(SubscriptionTable.type, SubscriptionTable.target))
+        for r in result:
+            for report_type in cls.counted_types[r.type]:
+                counts[report_type][r.target] += r.count
+        return counts
+
+    @staticmethod
+    def _write_table(guild_id, counts):
+        with KyogreDB._db.atomic():
+            TopSubsTable.delete().where(TopSubsTable.guild_id == guild_id).execute()
+            data = [(guild_id, target, report_type, count)
+                    for report_type in counts for target, count in counts[report_type].items()]
+            # SQLite can only insert 999 values at a time with insert_many. Each row uses 4 values, so 124 is the max
+            # row count we can insert at once
+            for chunk in chunked(data, 124):
+                TopSubsTable.insert_many(chunk, fields=[TopSubsTable.guild_id, TopSubsTable.pokemon,
+                                                        TopSubsTable.type, TopSubsTable.count]).execute()
+
+    @classmethod
+    def get(cls, guild_id):
+        counts = cls._guilds.get(guild_id, None)
+        if counts is None:
+            counts = cls._count(guild_id)
+            cls._write_table(guild_id, counts)
+            cls._guilds[guild_id] = counts
+        return counts
+
+    @classmethod
+    def apply(cls, guild_id, removed, added):
+        """Adjusts the counts for (type, target) subscriptions that were just removed and added."""
+        if guild_id not in cls._guilds:
+            # loading reads the counts after the change, nothing to adjust
+            cls.get(guild_id)
+            return
+        counts = cls._guilds[guild_id]
+        changed = set()
+        for keys, delta in ((removed, -1), (added, 1)):
+            for sub_type, target in keys:
+                for report_type in cls.counted_types.get(sub_type, []):
+                    counts[report_type][target] += delta
+                    if counts[report_type][target] <= 0:
+                        del counts[report_type][target]
+                    changed.add((report_type, target))
+        if not changed:
+            return
+        with KyogreDB._db.atomic():
+            for report_type, target in changed:
+                count = counts[report_type].get(target, 0)
+                query = ((TopSubsTable.guild_id == guild_id) & (TopSubsTable.type == report_type) &
+                         (TopSubsTable.pokemon == target))
+                if count == 0:
+                    TopSubsTable.delete().where(query).execute()
+                elif TopSubsTable.update(count=count).where(query).execute() == 0:
+                    TopSubsTable.create(guild=guild_id, pokemon=target, type=report_type, count=count)
+
+    @classmethod
+    def check(cls, guild_id):
+        """Recounts a loaded guild's subscriptions and repairs the in-memory counts and
+        TopSubsTable if either drifted. Returns the number of mismatched entries found."""
+        if guild_id not in cls._guilds:
+            return 0
+        fresh = cls._count(guild_id)
+        stored = {'research': Counter(), 'wild': Counter()}
+        for r in TopSubsTable.select().where(TopSubsTable.guild_id == guild_id):
+            stored.setdefault(r.type, Counter())[r.pokemon] += r.count
+        mismatches = 0
+        for report_type in fresh:
+            for counts in (cls._guilds[guild_id][report_type], stored[report_type]):
+                targets = set(fresh[report_type]) | set(counts)
+                mismatches += len([t for t in targets if fresh[report_type].get(t, 0) != counts.get(t, 0)])
+        if mismatches:
+            cls._write_table(guild_id, fresh)
+            cls._guilds[guild_id] = fresh
+        return mismatches
+
+    @classmethod
+    def loaded_guilds(cls):
+        return list(cls._guilds.keys())
+
+
 class Faves(commands.Cog):
 
     def __init__(self, bot):
@@ -24,37 +124,13 @@ class Faves(commands.Cog):
             await ctx.send(result_str)
 
     async def build_top_sub_lists(self, guild):
-        results = {}
-        out_results = {'research': {},
-                       'wild': {}}
-        # get the count of all subs for these 3 categories
-        for sub_type in ['research', 'wild', 'pokemon']:
-            results[sub_type] = self._get_top_subs_per_type(guild.id, [sub_type])
-        # preload the outgoing results with research and wild counts
-        for sub_type in ['research', 'wild']:
-            for r in results[sub_type]:
-                out_results[sub_type][r.target] = r.count
-        # 'pokemon' type subs count for both wild and research so add those counts to the outgoing
-        for r in results['pokemon']:
-            if r.target in out_results['research']:
-                out_results['research'][r.target] += r.count
-            else:
-                out_results['research'][r.target] = r.count
-            if r.target in out_results['wild']:
-                out_results['wild'][r.target] += r.count
-            else:
-                out_results['wild'][r.target] = r.count
+        counts = TopSubs.get(guild.id)
         # pull the configured limit from the config_dict, use default of 10 if none found
         limit = self.bot.guild_dict[guild.id]['configure_dict'].get('subscriptions', {}).get('leaderboard_limit', 10)
 
-        # sort by count
-        out_results['research'] = sorted(out_results['research'].items(), key=lambda t: t[1], reverse=True)
-        out_results['wild'] = sorted(out_results['wild'].items(), key=lambda t: t[1], reverse=True)
-        # Update the top subs table used to count personal stats when a report is made
-        self._update_top_subs_table(guild.id, out_results)
-        # Now apply the limit before building the message
-        out_results['research'] = out_results['research'][:limit]
-        out_results['wild'] = out_results['wild'][:limit]
+        # sort by count and apply the limit before building the message
+        out_results = {sub_type: sorted(counts[sub_type].items(), key=lambda t: (-t[1], t[0]))[:limit]
+                       for sub_type in ['research', 'wild']}
         # build the final leaderboard message
         leaderboard_str = '**The following lists are the most popular Subscriptions per type**\n'
         leaderboard_str += self._build_category_list(out_results, 'wild', '\n**Wild Spawns**\n')
@@ -84,51 +160,31 @@ class Faves(commands.Cog):
             leaderboard_str += f" {results[category][i][0]} ({results[category][i][1]})\n"
         return leaderboard_str
 
-    @staticmethod
-    def _get_top_subs_per_type(guild_id, sub_type=None, count=0):
-        result = (SubscriptionTable
-                  .select(SubscriptionTable.target, fn.Count(SubscriptionTable.target).alias('count'))
-                  .where(SubscriptionTable.guild_id == guild_id)
-                  .group_by(SubscriptionTable.target)
-                  .order_by(SQL('count').desc())
-                  .limit(count)
-                  )
-        if sub_type is None or sub_type[0].lower() == 'all':
-            return result
-        return result.where(SubscriptionTable.type << sub_type)
-
-    def _update_top_subs_table(self, guild_id, out_results):
-        try:
-            # First clear out previous entries
-            TopSubsTable.delete().where(TopSubsTable.guild_id == guild_id).execute()
-            data = []
-            # Build data set from new entries
-            # SQLite can only insert 999 values at a time with insert_many. Each row uses 4 values, so 124 is the max
-            # row count we can insert at once
-            for key in out_results.keys():
-                [data.append((guild_id, i[0], key, i[1])) for i in out_results[key]]
-            with KyogreDB._db.atomic():
-                for chunk in chunked(data, 124):
-                    TopSubsTable.insert_many(chunk, fields=[TopSubsTable.guild_id, TopSubsTable.pokemon,
-                                                            TopSubsTable.type, TopSubsTable.count]).execute()
-        except Exception as e:
-            self.bot.logger.info(f"Failed to update Top Subs Table with error: {e}")
+    async def top_subs_consistency_check(self):
+        await self.bot.wait_until_ready()
+        while not self.bot.is_closed():
+            await asyncio.sleep(6 * 3600)
+            for guild_id in TopSubs.loaded_guilds():
+                try:
+                    mismatches = TopSubs.check(guild_id)
+                except Exception as e:
+                    self.bot.logger.info(f"Failed to check Top Subs counts with error: {e}")
+                    continue
+                if mismatches:
+                    self.bot.logger.info(f"Repaired {mismatches} drifted Top Subs counts for guild {guild_id}.")
 
     @staticmethod
     def get_report_points(guild, pokemon_list, report_type, perfect):
 
         pokemon_list = [p.name.capitalize() for p in pokemon_list]
         points = 1
-        result = (TopSubsTable
-                  .select(TopSubsTable.pokemon, TopSubsTable.count)
-                  .where(TopSubsTable.guild_id == guild.id)
-                  .where(TopSubsTable.type == report_type.lower())
-                  .where(TopSubsTable.pokemon << pokemon_list))
+        counts = TopSubs.get(guild.id).get(report_type.lower(), {})
+        result = [counts[p] for p in set(pokemon_list) if p in counts]
         if len(result) > 0:
             points += 1
-        for r in result:
-            mult = min(r.count / guild.member_count + .8, 1)
-            points += round((r.count / 4) * mult)
+        for count in result:
+            mult = min(count / guild.member_count + .8, 1)
+            points += round((count / 4) * mult)
         if perfect:
             points = math.ceil(points * 1.1)
         return points
@@ -13,6 +13,7 @@ from discord.ext import commands
 from kyogre.exts.pokemon import Pokemon
 from kyogre.exts.db.kyogredb import *
 from kyogre import constants, embed_utils, utils, server_emoji
+from kyogre.raid_store import RaidChannelStore
 
 
 class ListManagement(commands.Cog):
@@ -65,7 +66,8 @@ class ListManagement(commands.Cog):
         }
         exraid_list = []
         event_list = []
-        for r in rc_d:
+        for raid in RaidChannelStore.channels(guild.id):
+            r = raid.channel
             if region:
                 reportlocation = rc_d[r].get('regions', [])
             elif listing_enabled and 'channel' in listing_dict:
@@ -74,18 +76,17 @@ class ListManagement(commands.Cog):
                 reportlocation = [self.bot.get_channel(rc_d[r]['reportcity']).name]
             if not reportlocation:
                 continue
-            if (cty in reportlocation) and discord.utils.get(guild.text_channels, id=r):
-                raid_type = rc_d[r]['type']
-                level = rc_d[r]['egglevel']
-                if (raid_type == 'egg') and level.isdigit():
-                    raid_dict[level]["egg"][r] = rc_d[r]['expire_time']
-                elif rc_d[r].get('meetup', {}):
+            if (cty in reportlocation) and guild.get_channel(r):
+                level = raid.level or ''
+                if (raid.type == 'egg') and level.isdigit():
+                    raid_dict[level]["egg"][r] = raid.expire_time
+                elif raid.meetup:
                     event_list.append(r)
-                elif raid_type == 'exraid' or level == 'EX':
+                elif raid.type == 'exraid' or level == 'EX':
                     exraid_list.append(r)
                 else:
-                    egglevel = Pokemon.get_pokemon(self.bot, rc_d[r]['pokemon']).raid_level
-                    raid_dict[egglevel]["raid"][r] = rc_d[r]['expire_time']
+                    egglevel = Pokemon.get_pokemon(self.bot, raid.pokemon).raid_level
+                    raid_dict[egglevel]["raid"][r] = raid.expire_time
 
         def list_output(raid):
             trainer_dict = rc_d[raid]['trainer_dict']
@@ -1034,6 +1035,10 @@ class ListManagement(commands.Cog):
             boss_dict[name] = {"type": utils.types_to_str(message.guild, p.types, self.bot.config),
                                "total": 0, "maybe": 0, "coming": 0, "here": 0}
         boss_list.append('unspecified')
+        bosses = [Pokemon.get_pokemon(self.bot, entry) for entry in egg_info['pokemon']]
+        weaknesses = Pokemon.get_weaknesses(self.bot, bosses)
+        for p in bosses:
+            boss_dict[str(p).lower()]['weak'] = utils.types_to_str(message.guild, weaknesses[p.name], self.bot.config)
         trainer_dict = copy.deepcopy(guild_dict[message.guild.id]['raidchannel_dict'][channel.id]['trainer_dict'])
         for trainer in trainer_dict:
             if not ctx.guild.get_member(trainer):
@@ -1044,14 +1049,20 @@ class ListManagement(commands.Cog):
                 count = trainer_dict[trainer]['count']
                 boss_dict[item][status] += count
                 boss_dict[item]['total'] += count
-        bossliststr = ''
+        bossliststr, weakliststr = '', ''
         for boss in boss_list:
             if boss_dict[boss]['total'] > 0:
-                bossliststr += '{type}{name}: **{total} total,** {interested} interested, {coming} coming, ' \
-                               '{here} waiting{type}\n' \
+                line = '{type}{name}: **{total} total,** {interested} interested, {coming} coming, ' \
+                       '{here} waiting{type}' \
                     .format(type=boss_dict[boss]['type'], name=boss.capitalize(),
                             total=boss_dict[boss]['total'], interested=boss_dict[boss]['maybe'],
                             coming=boss_dict[boss]['coming'], here=boss_dict[boss]['here'])
+                bossliststr += line + '\n'
+                weak = boss_dict[boss].get('weak', None)
+                weakliststr += f"{line} **Weak:** {weak}\n" if weak else line + '\n'
+        # leave the weaknesses out when they'd push the list past one message
+        if len(weakliststr) < constants.MAX_MESSAGE_LENGTH - 100:
+            bossliststr = weakliststr
         if bossliststr:
             listmsg = ' Boss numbers for the raid:\n{}'.format(bossliststr)
         else:
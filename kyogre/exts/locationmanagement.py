@@ -1,9 +1,13 @@
+import csv
+import io
+
 import discord
 from discord.ext import commands
 
-from kyogre import checks
+from kyogre import checks, location_import
 from kyogre.exts.db.kyogredb import KyogreDB, RegionTable, GymTable, PokestopTable, GuildTable, TrainerReportRelation
 from kyogre.exts.db.kyogredb import LocationTable, LocationRegionRelation, LocationNoteTable
+from kyogre.exts.locationmatching import GymAliasStore, LocationStore
 
 
 class LocationManagement(commands.Cog):
@@ -58,6 +62,8 @@ class LocationManagement(commands.Cog):
         if error_msg is None:
             location_id, error_msg = LocationTable.create_single_location(name, data, ctx.guild.id)
         if error_msg is None:
+            location_id = location_id.location_id
+            LocationStore.refresh(ctx.guild.id, location_id)
             await channel.send(embed=discord.Embed(
                 colour=discord.Colour.green(),
                 description=f"Successfully added **{loc_type}** with name: **{name}**."),
@@ -284,6 +290,7 @@ class LocationManagement(commands.Cog):
             except:
                 pass
             LocationNoteTable.create(location_id=locationresult.id, note=location_note)
+            LocationStore.refresh(guild.id, locationresult.id)
             await channel.send(embed=discord.Embed(colour=discord.Colour.green(),
                                                    description=f"Successfully added note to {name}."),
                                delete_after=12)
@@ -312,6 +319,7 @@ class LocationManagement(commands.Cog):
                                    (LocationTable.name == name)))
             current_note = LocationNoteTable.get(location_id=locationresult.id)
             current_note.delete_instance()
+            LocationStore.refresh(guild.id, locationresult.id)
             await channel.send(embed=discord.Embed(colour=discord.Colour.green(),
                                                    description=f"Successfully removed note from {name}."),
                                delete_after=12)
@@ -439,6 +447,8 @@ class LocationManagement(commands.Cog):
             except Exception as e:
                 await channel.send(e)
                 txn.rollback()
+        if success:
+            LocationStore.refresh(channel.guild.id, location.id)
         if success == 0:
             await channel.send(embed=discord.Embed(colour=discord.Colour.red(),
                                                    description=f"Failed to update the location."),
@@ -453,6 +463,144 @@ class LocationManagement(commands.Cog):
             await ctx.message.add_reaction(self.bot.success_react)
             return
 
+    @_loc.command(name="aliases", aliases=["al"])
+    @checks.is_dev_or_owner_or_perms(manage_nicknames=True)
+    async def _loc_aliases(self, ctx, *, info=None):
+        """**Usage**: `!loc aliases/al [gym name]`
+        **Alias**: `al`
+        Lists the alternate names remembered for gyms, optionally for a single gym.
+        Aliases are learned from confirmed screenshot scans and from gym choices made when a name didn't match."""
+        channel = ctx.channel
+        gym = None
+        if info:
+            gym = await self._location_match_prompt(channel, ctx.author.id, info, self._get_gyms(ctx.guild.id, None))
+            if not gym:
+                return await channel.send(embed=discord.Embed(colour=discord.Colour.red(),
+                                                              description=f"No gym found with name {info}"),
+                                          delete_after=12)
+        aliases = GymAliasStore.aliases(ctx.guild.id, gym.id if gym else None)
+        stats = GymAliasStore.get_stats(ctx.guild.id)
+        title = f"Aliases for {gym.name}" if gym else "Gym aliases"
+        embed = discord.Embed(colour=ctx.guild.me.colour, title=title)
+        embed.set_footer(text=f"{stats['size']} aliases, {stats['hits']} hits, {stats['misses']} misses "
+                              f"({stats['hit_rate']:.1%}) since restart")
+        lines = []
+        for alias, location_id, hits in aliases:
+            location = gym or LocationStore.by_id(ctx.guild.id, 'gym', location_id)
+            lines.append(f"`{alias}` → {location.name if location else location_id} ({hits} hits)")
+        if not lines:
+            lines = ['No aliases found.']
+        description = ''
+        for line in lines:
+            if len(description) + len(line) > 2000:
+                description += '\n...'
+                break
+            description += line + '\n'
+        embed.description = description
+        await channel.send(embed=embed)
+
+    @_loc.command(name="addalias", aliases=["aa"])
+    @checks.is_dev_or_owner_or_perms(manage_nicknames=True)
+    async def _loc_addalias(self, ctx, *, info):
+        """**Usage**: `!loc addalias/aa <alias>, <gym name>`
+        **Alias**: `aa`
+        Adds a nickname that will always resolve to the gym provided."""
+        channel = ctx.channel
+        info = [x.strip() for x in info.split(',')]
+        if len(info) < 2:
+            await channel.send(embed=discord.Embed(colour=discord.Colour.red(),
+                                                   description="Please provide (comma separated) the alias "
+                                                               "and the name of the gym."),
+                               delete_after=12)
+            return await ctx.message.add_reaction(self.bot.failed_react)
+        alias, name = info[0], ','.join(info[1:])
+        gym = await self._location_match_prompt(channel, ctx.author.id, name, self._get_gyms(ctx.guild.id, None))
+        if not gym or not GymAliasStore.learn(ctx.guild.id, alias, gym, 'manual'):
+            await channel.send(embed=discord.Embed(colour=discord.Colour.red(),
+                                                   description=f"Failed to add alias {alias}."),
+                               delete_after=12)
+            return await ctx.message.add_reaction(self.bot.failed_react)
+        await channel.send(embed=discord.Embed(colour=discord.Colour.green(),
+                                               description=f"Added alias **{alias}** for {gym.name}."),
+                           delete_after=12)
+        return await ctx.message.add_reaction(self.bot.success_react)
+
+    @_loc.command(name="removealias", aliases=["ra"])
+    @checks.is_dev_or_owner_or_perms(manage_nicknames=True)
+    async def _loc_removealias(self, ctx, *, alias):
+        """**Usage**: `!loc removealias/ra <alias>`
+        **Alias**: `ra`
+        Removes a remembered gym alias."""
+        if GymAliasStore.remove(ctx.guild.id, alias) == 0:
+            await ctx.channel.send(embed=discord.Embed(colour=discord.Colour.red(),
+                                                       description=f"No alias found matching {alias}."),
+                                   delete_after=12)
+            return await ctx.message.add_reaction(self.bot.failed_react)
+        return await ctx.message.add_reaction(self.bot.success_react)
+
+    @_loc.command(name="prunealiases", aliases=["pa"])
+    @checks.is_dev_or_owner_or_perms(manage_guild=True)
+    async def _loc_prunealiases(self, ctx, max_hits: int = 0):
+        """**Usage**: `!loc prunealiases/pa [max hits]`
+        **Alias**: `pa`
+        Removes every gym alias that has been used no more than the given number of times (default 0)."""
+        removed = GymAliasStore.prune(ctx.guild.id, max_hits)
+        await ctx.channel.send(embed=discord.Embed(colour=discord.Colour.green(),
+                                                   description=f"Removed {removed} alias(es)."),
+                               delete_after=12)
+        return await ctx.message.add_reaction(self.bot.success_react)
+
+    @_loc.command(name="import", aliases=["imp"])
+    @checks.is_dev_or_owner_or_perms(manage_guild=True)
+    async def _loc_import(self, ctx):
+        """**Usage**: `!loc import` with a .csv, .json or .jsonl file attached
+        **Alias**: `imp`
+        Adds every location in the attached file. CSV files need a header row with the columns
+        `type, name, latitude, longitude, region, ex_eligible, note`. JSON files can be a list of
+        objects with the same keys or a gym/pokestop backup file.
+        Rows that are invalid or match an existing location's name or coordinates are skipped and reported."""
+        channel = ctx.channel
+        if not ctx.message.attachments:
+            await channel.send(embed=discord.Embed(colour=discord.Colour.red(),
+                                                   description="Please attach a file of locations to import."),
+                               delete_after=12)
+            return await ctx.message.add_reaction(self.bot.failed_react)
+        attachment = ctx.message.attachments[0]
+        buffer = io.BytesIO()
+        await attachment.save(buffer)
+        try:
+            rows = location_import.read_rows(buffer.getvalue().decode('utf-8-sig'), attachment.filename)
+            async with channel.typing():
+                # the batched inserts would block the event loop for the whole import
+                report = await self.bot.loop.run_in_executor(None, location_import.import_locations,
+                                                             ctx.guild.id, rows)
+        except (UnicodeDecodeError, ValueError, csv.Error) as e:
+            await channel.send(embed=discord.Embed(colour=discord.Colour.red(),
+                                                   description=f"Failed to read {attachment.filename}: {e}"),
+                               delete_after=12)
+            return await ctx.message.add_reaction(self.bot.failed_react)
+        # back on the event loop, so the caches can be refreshed
+        LocationStore.invalidate(ctx.guild.id)
+        added = report['gyms'] + report['stops']
+        rate = report['read'] / report['elapsed'] if report['elapsed'] else 0
+        colour = discord.Colour.green() if added else discord.Colour.red()
+        embed = discord.Embed(colour=colour, title=f"Imported {attachment.filename}")
+        embed.description = f"Added **{report['gyms']}** gyms and **{report['stops']}** pokestops " \
+                            f"from {report['read']} rows in {report['elapsed']:.1f}s ({rate:.0f} rows/s)."
+        if report['rejected']:
+            lines = [f"Row {number}: {reason}" for number, reason in report['rejected'][:10]]
+            if len(report['rejected']) > 10:
+                lines.append(f"...and {len(report['rejected']) - 10} more")
+            embed.add_field(name=f"Skipped {len(report['rejected'])} rows", value='\n'.join(lines), inline=False)
+        if report['errors']:
+            embed.add_field(name="Failed batches", value='\n'.join(report['errors'])[:1024], inline=False)
+        self.bot.logger.info(f"Location import in {ctx.guild.name}: {added} added, "
+                             f"{len(report['rejected'])} skipped, {len(report['errors'])} failed batches "
+                             f"in {report['elapsed']:.1f}s")
+        await channel.send(embed=embed)
+        react = self.bot.success_react if added else self.bot.failed_react
+        return await ctx.message.add_reaction(react)
+
     @staticmethod
     async def delete_location(ctx, location_type, name):
         channel = ctx.channel
@@ -473,11 +621,14 @@ class LocationManagement(commands.Cog):
                 elif location_type == "gym":
                     deleted = GymTable.delete().where(GymTable.location_id == locationresult).execute()
                 deleted += LocationRegionRelation.delete().where(LocationRegionRelation.id == loc_reg).execute()
+                GymAliasStore.remove_location(guild.id, location.id)
                 deleted += location.delete_instance()
                 txn.commit()
             except Exception as e: 
                 await channel.send(e)
                 txn.rollback()
+        if deleted:
+            LocationStore.refresh(guild.id, location.id)
         return deleted
 
     @staticmethod
@@ -497,6 +648,8 @@ class LocationManagement(commands.Cog):
             except Exception as e: 
                 await channel.send(e)
                 txn.rollback()
+        if created:
+            LocationStore.refresh(guild.id, location.id)
         return (deleted, created)
 
     @staticmethod
@@ -515,6 +668,8 @@ class LocationManagement(commands.Cog):
             except Exception as e: 
                 await channel.send(e)
                 txn.rollback()
+        if success:
+            LocationStore.refresh(guild.id, location.id)
         return success
 
     @staticmethod
@@ -548,6 +703,8 @@ class LocationManagement(commands.Cog):
             except Exception as e: 
                 await ctx.channel.send(e)
                 txn.rollback()
+        if success:
+            LocationStore.refresh(ctx.guild.id, loc_id)
         return success
 
     async def _location_match_prompt(self, channel, author_id, name, locations):
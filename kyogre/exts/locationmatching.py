@@ -1,10 +1,10 @@
 import os
-import tempfile
 
 import discord
 from discord.ext import commands
+from fuzzywuzzy import utils as fuzz_utils
 
-from kyogre import checks, utils
+from kyogre import checks, spatial, utils
 from kyogre.exts.db.kyogredb import *
 
 
@@ -51,108 +51,368 @@ class Pokestop(Location):
         super().__init__(id, name, latitude, longitude, region, note)
 
 
-class LocationMatching(commands.Cog):
-    def __init__(self, bot):
-        self.bot = bot
+class LocationList(list):
+    """List of locations that remembers which lookup produced it so that
+    location_match can reuse the fuzzy index built for that lookup."""
+    def __init__(self, locations, match_key=None):
+        super().__init__(locations)
+        self.match_key = match_key
 
-    def get_all(self, guild_id, regions=None):
-        return self.get_gyms(guild_id, regions=regions) + self.get_stops(guild_id, regions=regions)
+
+class LocationStore:
+    """In-memory copy of each guild's gyms and pokestops.
+
+    Loaded from the database the first time a guild is looked up and kept
+    current by LocationManagement, which refreshes or removes a location
+    right after committing a change to it. Each location id maps to the rows
+    the original join produced (one per region/note combination).
+    """
+    _guilds = {}
+    _versions = {}
+    _epoch = 0
 
     @staticmethod
-    def get_stop_by_id(guild_id, stop_id):
-        try:
-            result = (PokestopTable
+    def _query(loc_type, guild_id, location_id=None):
+        if loc_type == 'gym':
+            result = (GymTable
                       .select(LocationTable.id,
                               LocationTable.name,
                               LocationTable.latitude,
                               LocationTable.longitude,
                               RegionTable.name.alias('region'),
+                              GymTable.ex_eligible,
                               LocationNoteTable.note)
-                      .join(LocationTable)
-                      .join(LocationRegionRelation)
-                      .join(RegionTable)
-                      .join(LocationNoteTable, JOIN.LEFT_OUTER, on=(LocationNoteTable.location_id == LocationTable.id))
-                      .where((LocationTable.guild == guild_id) &
-                             (LocationTable.guild == RegionTable.guild) &
-                             (LocationTable.id == stop_id)))
-            result = result.objects(Pokestop)
-            return [o for o in result][0]
-        except:
-            return None
-
-    @staticmethod
-    def get_gym_by_id(guild_id, gym_id):
-        try:
-            result = (GymTable
+                      .join(LocationTable))
+        else:
+            result = (PokestopTable
                       .select(LocationTable.id,
                               LocationTable.name,
                               LocationTable.latitude,
                               LocationTable.longitude,
                               RegionTable.name.alias('region'),
-                              GymTable.ex_eligible,
                               LocationNoteTable.note)
-                      .join(LocationTable)
-                      .join(LocationRegionRelation)
-                      .join(RegionTable)
-                      .join(LocationNoteTable, JOIN.LEFT_OUTER, on=(LocationNoteTable.location_id == LocationTable.id))
-                      .where((LocationTable.guild == guild_id) &
-                             (LocationTable.guild == RegionTable.guild) &
-                             (LocationTable.id == gym_id)))
-            result = result.objects(Gym)
-            return [o for o in result][0]
-        except:
-            return None
-
-    @staticmethod
-    def get_gyms(guild_id, regions=None, ex=None):
-        result = (GymTable
-                  .select(LocationTable.id,
-                          LocationTable.name,
-                          LocationTable.latitude,
-                          LocationTable.longitude,
-                          RegionTable.name.alias('region'),
-                          GymTable.ex_eligible,
-                          LocationNoteTable.note)
-                  .join(LocationTable)
+                      .join(LocationTable))
+        result = (result
                   .join(LocationRegionRelation)
                   .join(RegionTable)
                   .join(LocationNoteTable, JOIN.LEFT_OUTER, on=(LocationNoteTable.location_id == LocationTable.id))
                   .where((LocationTable.guild == guild_id) &
                          (LocationTable.guild == RegionTable.guild)))
-        if regions:
-            if not isinstance(regions, list):
-                regions = [regions]
-            result = result.where(RegionTable.name << regions)
-        if ex:
-            result = result.where(GymTable.ex_eligible == '1')
-        result = result.objects(Gym)
-        return [o for o in result]
+        if location_id is not None:
+            result = result.where(LocationTable.id == location_id)
+        return result.objects(Gym if loc_type == 'gym' else Pokestop)
+
+    @classmethod
+    def _get(cls, guild_id):
+        store = cls._guilds.get(guild_id, None)
+        if store is None:
+            store = {'gym': {}, 'stop': {}, 'regions': {}, 'names': {}, 'views': {},
+                     'spatial': {'gym': spatial.GridIndex(), 'stop': spatial.GridIndex()}}
+            cls._guilds[guild_id] = store
+            for loc_type in ('gym', 'stop'):
+                for location in cls._query(loc_type, guild_id):
+                    cls._index(store, loc_type, location)
+        return store
+
+    @staticmethod
+    def _index(store, loc_type, location):
+        store[loc_type].setdefault(location.id, []).append(location)
+        store['regions'].setdefault(location.region, set()).add(location.id)
+        store['names'].setdefault(location.name, set()).add(location.id)
+        coordinates = spatial.parse_coordinates(location.latitude, location.longitude)
+        if coordinates is not None:
+            store['spatial'][loc_type].add(location.id, *coordinates)
+
+    @staticmethod
+    def _unindex(store, location_id):
+        for loc_type in ('gym', 'stop'):
+            store['spatial'][loc_type].remove(location_id)
+            for location in store[loc_type].pop(location_id, []):
+                for key, index in (('regions', location.region), ('names', location.name)):
+                    ids = store[key].get(index, set())
+                    ids.discard(location_id)
+                    if not ids:
+                        store[key].pop(index, None)
+
+    @classmethod
+    def locations(cls, guild_id, loc_type, regions=None, ex=None):
+        store = cls._get(guild_id)
+        if regions and not isinstance(regions, list):
+            regions = [regions]
+        key = (loc_type, frozenset(regions) if regions else None, bool(ex))
+        view = store['views'].get(key, None)
+        if view is None:
+            if regions:
+                ids = set().union(*(store['regions'].get(r, set()) for r in regions))
+                view = [l for loc_id, rows in store[loc_type].items() if loc_id in ids
+                        for l in rows if l.region in regions]
+            else:
+                view = [l for rows in store[loc_type].values() for l in rows]
+            if ex:
+                view = [l for l in view if l.ex_eligible]
+            store['views'][key] = view
+        return view
+
+    @classmethod
+    def by_id(cls, guild_id, loc_type, location_id):
+        try:
+            location_id = int(location_id)
+        except (TypeError, ValueError):
+            return None
+        rows = cls._get(guild_id)[loc_type].get(location_id, None)
+        return rows[0] if rows else None
+
+    @classmethod
+    def by_name(cls, guild_id, name, loc_type=None):
+        store = cls._get(guild_id)
+        types = [loc_type] if loc_type else ['gym', 'stop']
+        return [store[t][loc_id][0] for loc_id in store['names'].get(name, set())
+                for t in types if loc_id in store[t]]
+
+    @classmethod
+    def _spatial_results(cls, guild_id, loc_type, hits):
+        store = cls._get(guild_id)
+        types = [loc_type] if loc_type else ['gym', 'stop']
+        results = [(store[t][loc_id][0], distance) for t in types for loc_id, distance in hits(store['spatial'][t])]
+        return sorted(results, key=lambda r: r[1])
+
+    @classmethod
+    def within_radius(cls, guild_id, lat, lon, miles, loc_type=None):
+        """Returns (location, distance in miles) for each location within miles of
+        the point, closest first."""
+        return cls._spatial_results(guild_id, loc_type, lambda index: index.within_radius(lat, lon, miles))
+
+    @classmethod
+    def nearest(cls, guild_id, lat, lon, k=1, loc_type=None):
+        return cls._spatial_results(guild_id, loc_type, lambda index: index.nearest(lat, lon, k))[:k]
+
+    @classmethod
+    def bounding_box(cls, guild_id, min_lat, min_lon, max_lat, max_lon, loc_type=None):
+        store = cls._get(guild_id)
+        types = [loc_type] if loc_type else ['gym', 'stop']
+        return [store[t][loc_id][0] for t in types
+                for loc_id in store['spatial'][t].bounding_box(min_lat, min_lon, max_lat, max_lon)]
+
+    @classmethod
+    def version(cls, guild_id):
+        """Changes whenever any of a guild's locations change."""
+        return cls._epoch, cls._versions.get(guild_id, 0)
+
+    @classmethod
+    def refresh(cls, guild_id, location_id):
+        """Re-reads a single location after it was added or changed."""
+        cls._versions[guild_id] = cls._versions.get(guild_id, 0) + 1
+        if guild_id not in cls._guilds:
+            return
+        store = cls._guilds[guild_id]
+        cls._unindex(store, location_id)
+        for loc_type in ('gym', 'stop'):
+            for location in cls._query(loc_type, guild_id, location_id):
+                cls._index(store, loc_type, location)
+        store['views'].clear()
+
+    @classmethod
+    def remove(cls, guild_id, location_id):
+        cls._versions[guild_id] = cls._versions.get(guild_id, 0) + 1
+        if guild_id not in cls._guilds:
+            return
+        store = cls._guilds[guild_id]
+        cls._unindex(store, location_id)
+        store['views'].clear()
+
+    @classmethod
+    def invalidate(cls, guild_id=None):
+        if guild_id is None:
+            cls._guilds.clear()
+            cls._epoch += 1
+        else:
+            cls._guilds.pop(guild_id, None)
+            cls._versions[guild_id] = cls._versions.get(guild_id, 0) + 1
+
+
+class GymAliasStore:
+    """Per-guild table of alternate names for gyms.
+
+    Holds garbled scan text and nicknames that were confirmed to mean a
+    particular gym, so they can be resolved with a dictionary lookup before
+    any fuzzy matching is attempted. Hits are counted in memory and written
+    by flush(), which the periodic save calls.
+    """
+    _guilds = {}
+    _stats = {}
+    _hits = {}
+
+    @staticmethod
+    def normalize(name):
+        return ' '.join(fuzz_utils.full_process(name).split())
+
+    @classmethod
+    def _get(cls, guild_id):
+        aliases = cls._guilds.get(guild_id, None)
+        if aliases is None:
+            aliases = {a.alias: [a.location_id, a.hits] for a in
+                       GymAliasTable.select().where(GymAliasTable.guild == guild_id)}
+            cls._guilds[guild_id] = aliases
+        return aliases
+
+    @classmethod
+    def lookup(cls, guild_id, names, gyms):
+        """Returns the first gym in gyms that one of names is an alias for."""
+        aliases = cls._get(guild_id)
+        stats = cls._stats.setdefault(guild_id, {'hits': 0, 'misses': 0})
+        if not aliases:
+            stats['misses'] += 1
+            return None
+        gym_names = {g.name.lower() for g in gyms}
+        if any(name.lower() in gym_names for name in names):
+            # a real gym name always wins over an alias
+            return None
+        gym_ids = {g.id: g for g in gyms}
+        for name in names:
+            alias = cls.normalize(name)
+            entry = aliases.get(alias, None)
+            if entry is not None and entry[0] in gym_ids:
+                stats['hits'] += 1
+                entry[1] += 1
+                hits = cls._hits.setdefault(guild_id, {})
+                hits[alias] = hits.get(alias, 0) + 1
+                return gym_ids[entry[0]]
+        stats['misses'] += 1
+        return None
+
+    @classmethod
+    def learn(cls, guild_id, name, gym, source):
+        alias = cls.normalize(name)
+        if not alias or alias == cls.normalize(gym.name):
+            return False
+        aliases = cls._get(guild_id)
+        if aliases.get(alias, [None])[0] == gym.id:
+            return False
+        try:
+            GuildTable.get_or_create(snowflake=guild_id)
+            GymAliasTable.insert(guild=guild_id, alias=alias, location=gym.id, source=source, hits=0)\
+                .on_conflict_replace().execute()
+        except Exception:
+            return False
+        aliases[alias] = [gym.id, 0]
+        cls._hits.get(guild_id, {}).pop(alias, None)
+        return True
+
+    @classmethod
+    def remove(cls, guild_id, alias):
+        alias = cls.normalize(alias)
+        cls._get(guild_id).pop(alias, None)
+        cls._hits.get(guild_id, {}).pop(alias, None)
+        return GymAliasTable.delete()\
+            .where((GymAliasTable.guild == guild_id) & (GymAliasTable.alias == alias)).execute()
+
+    @classmethod
+    def remove_location(cls, guild_id, location_id):
+        aliases = cls._get(guild_id)
+        for alias in [a for a, entry in aliases.items() if entry[0] == location_id]:
+            del aliases[alias]
+            cls._hits.get(guild_id, {}).pop(alias, None)
+        return GymAliasTable.delete()\
+            .where((GymAliasTable.guild == guild_id) & (GymAliasTable.location == location_id)).execute()
+
+    @classmethod
+    def prune(cls, guild_id, max_hits=0):
+        """Removes aliases that have been used no more than max_hits times."""
+        cls.flush(guild_id)
+        aliases = cls._get(guild_id)
+        for alias in [a for a, entry in aliases.items() if entry[1] <= max_hits]:
+            del aliases[alias]
+        return GymAliasTable.delete()\
+            .where((GymAliasTable.guild == guild_id) & (GymAliasTable.hits <= max_hits)).execute()
+
+    @classmethod
+    def flush(cls, guild_id=None):
+        """Adds the hits counted since the last flush to the table."""
+        guild_ids = [guild_id] if guild_id is not None else list(cls._hits)
+        for gid in guild_ids:
+            hits = cls._hits.pop(gid, None)
+            if not hits:
+                continue
+            try:
+                with KyogreDB._db.atomic():
+                    for alias, count in hits.items():
+                        GymAliasTable.update(hits=GymAliasTable.hits + count)\
+                            .where((GymAliasTable.guild == gid) & (GymAliasTable.alias == alias)).execute()
+            except Exception:
+                # keep them for the next flush, along with any counted since
+                pending = cls._hits.setdefault(gid, {})
+                for alias, count in hits.items():
+                    pending[alias] = pending.get(alias, 0) + count
+                raise
+
+    @classmethod
+    def aliases(cls, guild_id, location_id=None):
+        """Returns (alias, location id, hits) tuples, most used first."""
+        return sorted([(alias, entry[0], entry[1]) for alias, entry in cls._get(guild_id).items()
+                       if location_id is None or entry[0] == location_id], key=lambda a: -a[2])
+
+    @classmethod
+    def get_stats(cls, guild_id):
+        stats = cls._stats.get(guild_id, {'hits': 0, 'misses': 0})
+        total = stats['hits'] + stats['misses']
+        return {'hits': stats['hits'], 'misses': stats['misses'], 'size': len(cls._get(guild_id)),
+                'hit_rate': stats['hits'] / total if total else 0.0}
+
+
+class LocationMatching(commands.Cog):
+    _match_indexes = {}
+    _exported_versions = {}
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    @staticmethod
+    def _match_key(guild_id, loc_type, regions, ex=None):
+        if regions and not isinstance(regions, list):
+            regions = [regions]
+        return guild_id, loc_type, frozenset(regions) if regions else None, bool(ex)
+
+    def get_all(self, guild_id, regions=None):
+        return LocationList(self.get_gyms(guild_id, regions=regions) + self.get_stops(guild_id, regions=regions),
+                            self._match_key(guild_id, 'all', regions))
+
+    @staticmethod
+    def get_stop_by_id(guild_id, stop_id):
+        return LocationStore.by_id(guild_id, 'stop', stop_id)
+
+    @staticmethod
+    def get_gym_by_id(guild_id, gym_id):
+        return LocationStore.by_id(guild_id, 'gym', gym_id)
+
+    @staticmethod
+    def get_gyms(guild_id, regions=None, ex=None):
+        return LocationList(LocationStore.locations(guild_id, 'gym', regions, ex),
+                            LocationMatching._match_key(guild_id, 'gym', regions, ex))
 
     @staticmethod
     def get_stops(guild_id, regions=None):
-        result = (PokestopTable
-                  .select(LocationTable.id,
-                          LocationTable.name,
-                          LocationTable.latitude,
-                          LocationTable.longitude,
-                          RegionTable.name.alias('region'),
-                          LocationNoteTable.note)
-                  .join(LocationTable)
-                  .join(LocationRegionRelation)
-                  .join(RegionTable)
-                  .join(LocationNoteTable, JOIN.LEFT_OUTER, on=(LocationNoteTable.location_id == LocationTable.id))
-                  .where((LocationTable.guild == guild_id) &
-                         (LocationTable.guild == RegionTable.guild)))
-        if regions:
-            if not isinstance(regions, list):
-                regions = [regions]
-            result = result.where(RegionTable.name << regions)
-        result = result.objects(Pokestop)
-        return [o for o in result]
+        return LocationList(LocationStore.locations(guild_id, 'stop', regions),
+                            LocationMatching._match_key(guild_id, 'stop', regions))
+
+    @staticmethod
+    def _get_match_index(match_key, names):
+        """Returns the fuzzy index for a lookup, patching it to the current
+        names so that added, renamed or removed locations are picked up."""
+        index = LocationMatching._match_indexes.get(match_key, None)
+        if index is None:
+            index = utils.FuzzyIndex(names)
+            LocationMatching._match_indexes[match_key] = index
+        else:
+            index.sync(names)
+        return index
 
     @staticmethod
     def location_match(name, locations, threshold=75, is_partial=True, limit=None):
-        match = utils.get_match([l.name for l in locations], name, threshold, is_partial, limit)
+        names = [l.name for l in locations]
+        match_key = getattr(locations, 'match_key', None)
+        if match_key is not None:
+            names = LocationMatching._get_match_index(match_key, names)
+        match = utils.get_match(names, name, threshold, is_partial, limit)
         if not isinstance(match, list):
             match = [match]
         return [(l, score) for l in locations for match_name, score in match if l.name == match_name]
@@ -243,114 +503,34 @@ class LocationMatching(commands.Cog):
                 result.append(Pokestop(name, coords[0], coords[1], None))
         return result
 
-    @staticmethod
-    def save_stops_to_json(guild_id):
-        try:
-            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.join('data', 'pokestop_data_backup1')),
-                                             delete=False) as f:
-                stops = (PokestopTable
-                         .select(LocationTable.id,
-                                 LocationTable.name,
-                                 LocationTable.latitude,
-                                 LocationTable.longitude,
-                                 RegionTable.name.alias('region'),
-                                 LocationNoteTable.note)
-                         .join(LocationTable)
-                         .join(LocationRegionRelation)
-                         .join(RegionTable)
-                         .join(LocationNoteTable, JOIN.LEFT_OUTER, on=(LocationNoteTable.location_id == LocationTable.id))
-                         .where((LocationTable.guild == guild_id) &
-                                (LocationTable.guild == RegionTable.guild)))
-                stops = stops.objects(Location)
-                s = {}
-                for stop in stops:
-                    if stop.name in s:
-                        try:
-                            s[stop.name]["notes"].append(stop.note)
-                        except:
-                            pass
-                        try:
-                            s[stop.name]["notes"] = [stop.note]
-                        except:
-                            pass
-                    else:
-                        s[stop.name] = {}
-                        s[stop.name]["coordinates"] = f"{stop.latitude},{stop.longitude}"
-                        s[stop.name]["region"] = stop.region
-                        s[stop.name]["guild"] = str(guild_id)
-                        try:
-                            s[stop.name]["notes"] = [stop.note]
-                        except:
-                            pass
-                f.write(json.dumps(s, indent=4))
-                tempname = f.name
-            try:
-                os.remove(os.path.join('data', 'pokestop_data_backup1'))
-            except OSError as e:
-                pass
-            try:
-                os.rename(os.path.join('data', 'pokestop_data_backup1'), os.path.join('data', 'pokestop_data_backup2'))
-            except OSError as e:
-                pass
-            os.rename(tempname, os.path.join('data', 'pokestop_data_backup1'))
-            return None
-        except Exception as err:
-            return err
+    async def save_stops_to_json(self, guild_id):
+        return await self._save_locations_to_json(guild_id, 'stop', 'pokestop_data_backup')
 
-    @staticmethod
-    def save_gyms_to_json(guild_id):
-        try:
-            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.join('data', 'gym_data_backup1')), delete=False) as f:
-                gyms = (GymTable
-                        .select(LocationTable.id,
-                                LocationTable.name,
-                                LocationTable.latitude,
-                                LocationTable.longitude,
-                                RegionTable.name.alias('region'),
-                                GymTable.ex_eligible,
-                                LocationNoteTable.note)
-                        .join(LocationTable)
-                        .join(LocationRegionRelation)
-                        .join(RegionTable)
-                        .join(LocationNoteTable, JOIN.LEFT_OUTER, on=(LocationNoteTable.location_id == LocationTable.id))
-                        .where((LocationTable.guild == guild_id) &
-                                (LocationTable.guild == RegionTable.guild)))
-                gyms = gyms.objects(Gym)
-                g = {}
-                for gym in gyms:
-                    if gym.name in g:
-                        try:
-                            g[gym.name]["notes"].append(gym.note)
-                        except:
-                            pass
-                        try:
-                            g[gym.name]["notes"] = [gym.note]
-                        except:
-                            pass
-                    else:
-                        g[gym.name] = {}
-                        g[gym.name]["coordinates"] = f"{gym.latitude},{gym.longitude}"
-                        g[gym.name]["ex_eligible"] = gym.ex_eligible
-                        g[gym.name]["region"] = gym.region
-                        g[gym.name]["guild"] = str(guild_id)
-                        try:
-                            g[gym.name]["notes"] = [gym.note]
-                        except:
-                            pass
-                f.write(json.dumps(g, indent=4))
-                tempname = f.name
-            try:
-                os.remove(os.path.join('data', 'gym_data_backup1'))
-            except OSError as e:
-                pass
-            try:
-                os.rename(os.path.join('data', 'gym_data_backup1'), os.path.join('data', 'gym_data_backup2'))
-            except OSError as e:
-                pass
-            os.rename(tempname, os.path.join('data', 'gym_data_backup1'))
+    async def save_gyms_to_json(self, guild_id):
+        return await self._save_locations_to_json(guild_id, 'gym', 'gym_data_backup')
+
+    async def _save_locations_to_json(self, guild_id, loc_type, filename):
+        """Exports a guild's gyms or stops, skipping the export if nothing changed
+        since the last one. The file is written off the event loop."""
+        version = LocationStore.version(guild_id)
+        if LocationMatching._exported_versions.get((guild_id, loc_type), None) == version:
             return None
-        except Exception as err:
-            return err
+        data = {}
+        for location in LocationStore.locations(guild_id, loc_type):
+            if location.name not in data:
+                entry = {"coordinates": f"{location.latitude},{location.longitude}"}
+                if loc_type == 'gym':
+                    entry["ex_eligible"] = location.ex_eligible
+                entry["region"] = location.region
+                entry["guild"] = str(guild_id)
+                data[location.name] = entry
+            data[location.name]["notes"] = [location.note]
+        err = await self.bot.loop.run_in_executor(None, utils.dump_json_atomic, data,
+                                                  os.path.join('data', f'{filename}1'),
+                                                  os.path.join('data', f'{filename}2'))
+        if err is None:
+            LocationMatching._exported_versions[(guild_id, loc_type)] = version
+        return err
 
     @commands.command(name='gyminfo', aliases=['gym', 'gi'])
     async def _gym(self, ctx, *, info):
@@ -473,12 +653,60 @@ class LocationMatching(commands.Cog):
         for e in embeds:
             await ctx.send(embed=e)
 
+    @commands.command(name='nearby', aliases=['near'])
+    async def _nearby(self, ctx, *, info):
+        """**Usage**: `!nearby <gym or pokestop name or latitude, longitude>, [miles]`
+        **Alias**: `near`
+        Lists the gyms and pokestops closest to the location provided.
+        Useful for telling apart locations that share a name.
+        If a distance in miles is provided, only locations within that distance are listed."""
+        info = [i.strip() for i in info.split(',')]
+        miles = None
+        if len(info) > 1:
+            try:
+                miles = float(info[-1])
+                info = info[:-1]
+            except ValueError:
+                pass
+        coordinates = None
+        if len(info) == 2:
+            coordinates = spatial.parse_coordinates(info[0], info[1])
+        if coordinates is None:
+            name = ','.join(info)
+            location = await self.match_prompt(ctx.channel, ctx.author.id, name, self.get_all(ctx.guild.id))
+            if location is not None:
+                coordinates = spatial.parse_coordinates(location.latitude, location.longitude)
+            if coordinates is None:
+                return await ctx.send(embed=discord.Embed(colour=discord.Colour.red(),
+                                                          description=f"No location with coordinates found "
+                                                                      f"matching '{name}'."))
+        if miles is not None:
+            nearby = LocationStore.within_radius(ctx.guild.id, *coordinates, miles)[:10]
+        else:
+            nearby = LocationStore.nearest(ctx.guild.id, *coordinates, k=10)
+        if not nearby:
+            return await ctx.send("No locations found nearby.")
+        embed = discord.Embed(colour=ctx.guild.me.colour, title=f"Locations near {coordinates[0]}, {coordinates[1]}")
+        embed.description = '\n'.join([f"[{l.__name__}] [{l.name}]({l.maps_url}) - {distance:.2f} mi "
+                                       f"({l.region})" for l, distance in nearby])
+        await ctx.send(embed=embed)
+
     async def match_prompt(self, channel, author_id, name, locations):
         # note: the following logic assumes json constraints -- no duplicates in source data
+        gyms = [l for l in locations if isinstance(l, Gym)]
+        if gyms:
+            gym = GymAliasStore.lookup(channel.guild.id, [name], gyms)
+            if gym is not None:
+                return gym
         result = self.location_match(name, locations)
         results = [(match.name, score) for match, score in result]
         match = await utils.prompt_match_result(self.bot, channel, author_id, name, results)
-        return next((l for l in locations if l.name == match), None)
+        location = next((l for l in locations if l.name == match), None)
+        # remember the name for the gym the user picked when nothing matched it fully,
+        # names that fully match several gyms are ambiguous and never remembered
+        if isinstance(location, Gym) and not any(score == 100 for __, score in results):
+            GymAliasStore.learn(channel.guild.id, name, location, 'prompt')
+        return location
 
 
 def setup(bot):
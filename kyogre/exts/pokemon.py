@@ -1,7 +1,6 @@
-import json
+import functools
 import math
 import os
-import tempfile
 
 from discord.ext import commands
 import discord
@@ -23,6 +22,100 @@ class Pokedex(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
 
+
+class PokedexRegistry:
+    """Process-wide in-memory copy of the PokemonTable.
+
+    The table is read once on first access and held in name, id and alias
+    indexes so Pokemon lookups never touch SQLite. Anything that
+    writes to the PokemonTable must call :meth:`invalidate` afterwards.
+    """
+    _loaded = False
+    _by_name = {}
+    _by_id = {}
+    _released_by_name = {}
+    _released_by_id = {}
+    _aliases = {}
+    _version = 0
+
+    @staticmethod
+    def normalize(name):
+        return ''.join(c for c in name.lower() if c.isalnum())
+
+    @classmethod
+    def load(cls):
+        by_name, by_id, released_by_name, released_by_id, aliases = {}, {}, {}, {}, {}
+        for row in PokemonTable.select().dicts():
+            name = row['name'].lower()
+            by_name[name] = row
+            by_id[row['id']] = row
+            if row['released']:
+                released_by_name[name] = row
+                released_by_id[row['id']] = row
+            alias = cls.normalize(name)
+            if alias and alias != name:
+                aliases.setdefault(alias, name)
+        cls._by_name = by_name
+        cls._by_id = by_id
+        cls._released_by_name = released_by_name
+        cls._released_by_id = released_by_id
+        cls._aliases = aliases
+        cls._loaded = True
+
+    @classmethod
+    def invalidate(cls):
+        cls._loaded = False
+        cls._version += 1
+        Pokemon._parse_argument.cache_clear()
+
+    @classmethod
+    def version(cls):
+        """Changes every time the PokemonTable is written to."""
+        return cls._version
+
+    @classmethod
+    def _ensure_loaded(cls):
+        if not cls._loaded:
+            cls.load()
+
+    @classmethod
+    def all_by_name(cls):
+        cls._ensure_loaded()
+        return cls._by_name
+
+    @classmethod
+    def all_by_id(cls):
+        cls._ensure_loaded()
+        return cls._by_id
+
+    @classmethod
+    def released_by_name(cls):
+        cls._ensure_loaded()
+        return cls._released_by_name
+
+    @classmethod
+    def released_by_id(cls):
+        cls._ensure_loaded()
+        return cls._released_by_id
+
+    @classmethod
+    def get_released(cls, pkmn):
+        """Returns the released PokemonTable row matching an id or name
+        (punctuation-insensitive), or None."""
+        cls._ensure_loaded()
+        if isinstance(pkmn, int):
+            return cls._released_by_id.get(pkmn, None)
+        name = pkmn.strip().lower()
+        if name.isdigit():
+            return cls._released_by_id.get(int(name), None)
+        p_obj = cls._released_by_name.get(name, None)
+        if p_obj is None:
+            alias = cls._aliases.get(cls.normalize(name), None)
+            if alias:
+                p_obj = cls._released_by_name.get(alias, None)
+        return p_obj
+
+
 """
 Calculating PoGO base stats from MSG base stats
 ATK = round(round(2*(0.875*max(atk,spa)+0.125*min(atk,spa))) * (1+(spe-75)/500))
@@ -78,6 +171,9 @@ class Pokemon():
                  'pb_raid', 'weather', 'moveset', 'form', 'shiny', 'alolan', 'galarian', 'mega',
                  'legendary', 'mythical', 'base_attack', 'base_defense', 'base_stamina')
 
+    # PokedexRegistry version last written by save_pokemon_to_json
+    _exported_version = None
+
     _alolans_list = ['rattata', 'raticate', 'vulpix', 'ninetails', 'sandshrew', 'sandslash', 'grimer', 'muk',
                      'meowth', 'persian', 'diglett', 'dugtrio', 'geodude', 'graveler', 'golem', 'exeggutor',
                      'marowak', 'raichu']
@@ -170,15 +266,15 @@ class Pokemon():
 
     @staticmethod
     def get_pkmn_dict():
-        return {r['name'].lower(): r for r in PokemonTable.select().where(PokemonTable.released).dicts()}
+        return PokedexRegistry.released_by_name()
 
     @staticmethod
     def get_pkmn_dict_all_by_name():
-        return {r['name'].lower(): r for r in PokemonTable.select().dicts()}
+        return PokedexRegistry.all_by_name()
 
     @staticmethod
     def get_pkmn_dict_all_by_id():
-        return {r['id']: r for r in PokemonTable.select().dicts()}
+        return PokedexRegistry.all_by_id()
 
 
     @property
@@ -340,11 +436,7 @@ class Pokemon():
         """:class:`dict` : Returns a dict of all types the Pokemon is
         weak against.
         """
-        types_eff = {}
-        for t, v in self.type_effects.items():
-            if round(v, 3) > 1:
-                types_eff[t] = v
-        return types_eff
+        return self.bot.type_chart.weaknesses(self.types)
 
     @property
     def strong_against(self):
@@ -362,13 +454,7 @@ class Pokemon():
         """:class:`dict` : Returns a dict of all Pokemon types and their
         relative effectiveness as values.
         """
-        type_eff = {}
-        for _type in self.types:
-            for atk_type in self.bot.defense_chart[_type]:
-                if atk_type not in type_eff:
-                    type_eff[atk_type] = 1
-                type_eff[atk_type] *= utils.get_effectiveness(self.bot.defense_chart[_type][atk_type])
-        return type_eff
+        return self.bot.type_chart.effects(self.types)
 
     @property
     def type_effects_grouped(self):
@@ -423,11 +509,7 @@ class Pokemon():
 
     @classmethod
     def find_obj(cls, pkmn):
-        if pkmn.isdigit():
-            p_obj = next((v for k, v in Pokemon.get_pkmn_dict().items() if v['id'] == int(pkmn)), None)
-        else:
-            p_obj = next((v for k, v in Pokemon.get_pkmn_dict().items() if k == pkmn.strip().lower()), None)
-        return p_obj
+        return PokedexRegistry.get_released(pkmn)
 
     @classmethod
     def get_pokemon(cls, bot, argument, guild=None):
@@ -437,7 +519,21 @@ class Pokemon():
             return cls(bot, str(p_obj['name']), guild)
         except ValueError:
             pass
-        argument = argument.lower()
+        parsed = Pokemon._parse_argument(' '.join(argument.lower().split()))
+        if not parsed:
+            return None
+        match, form, shiny, alolan, galarian = parsed
+        return cls(bot, str(match), guild, shiny=shiny, alolan=alolan, galarian=galarian, form=form)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def _parse_argument(argument):
+        """Splits a normalized Pokemon argument into its species and modifiers.
+
+        Returns a tuple of (species, form, shiny, alolan, galarian), or None
+        if no species matched. Results, including misses, are memoized until
+        the Pokedex is invalidated.
+        """
         if 'shiny' in argument:
             shiny = True
             argument = argument.replace('shiny', '').strip()
@@ -484,7 +580,8 @@ class Pokemon():
                 p_obj = Pokemon.find_obj(arg_split[0].strip(','))
         if not p_obj:
             pkmn_list = [p for p in Pokemon.get_pkmn_dict()]
-            match = utils.get_match(pkmn_list, argument, score_cutoff=80)[0]
+            match = utils.get_match(pkmn_list, argument, score_cutoff=80,
+                                    key=('released_pokemon', PokedexRegistry.version()))[0]
         else:
             match = p_obj['name']
         if not match:
@@ -494,7 +591,15 @@ class Pokemon():
         forms = [d for d in detected_forms if d in form_list]
         if forms:
             form = ' '.join(forms)
-        return cls(bot, str(match), guild, shiny=shiny, alolan=alolan, galarian=galarian, form=form)
+        return match, form, shiny, alolan, galarian
+
+    @staticmethod
+    def get_parse_cache_stats():
+        """Returns the hit/miss counters of the get_pokemon argument cache."""
+        info = Pokemon._parse_argument.cache_info()
+        lookups = info.hits + info.misses
+        return {'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize,
+                'hit_rate': info.hits / lookups if lookups else 0.0}
 
     @staticmethod
     def has_forms(name):
@@ -533,52 +638,28 @@ class Pokemon():
         return raidlist
 
     @staticmethod
-    def save_pokemon_to_json():
-        try:
-            with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(os.path.join('data', 'pokestop_data_backup1')),
-                                             delete=False) as f:
-                pokemon = (PokemonTable
-                           .select(PokemonTable.id,
-                                   PokemonTable.name,
-                                   PokemonTable.legendary,
-                                   PokemonTable.mythical,
-                                   PokemonTable.shiny,
-                                   PokemonTable.alolan,
-                                   PokemonTable.galarian,
-                                   PokemonTable.types,
-                                   PokemonTable.released,
-                                   PokemonTable.attack,
-                                   PokemonTable.defense,
-                                   PokemonTable.stamina))
-                s = []
-                for poke in pokemon:
-                    p = {"id": poke.id,
-                         "name": poke.name,
-                         "legendary": poke.legendary,
-                         "mythical": poke.mythical,
-                         "shiny": poke.shiny,
-                         "alolan": poke.alolan,
-                         "galarian": poke.galarian,
-                         "types": poke.types,
-                         "released": poke.released,
-                         "attack": poke.attack,
-                         "defense": poke.defense,
-                         "stamina": poke.stamina}
-                    s.append(p)
-                f.write(json.dumps(s, indent=4))
-                tempname = f.name
-            try:
-                os.remove(os.path.join('data', 'pokemon_data_backup1'))
-            except OSError as e:
-                pass
-            try:
-                os.rename(os.path.join('data', 'pokemon_data_backup1'), os.path.join('data', 'pokemon_data_backup2'))
-            except OSError as e:
-                pass
-            os.rename(tempname, os.path.join('data', 'pokemon_data_backup1'))
+    def get_weaknesses(bot, pokemon_list):
+        """Returns a dict of Pokemon name to the dict of types it is weak
+        against, for a whole list of Pokemon in one pass."""
+        weaknesses = bot.type_chart.weaknesses_batch([p.types for p in pokemon_list])
+        return {p.name: w for p, w in zip(pokemon_list, weaknesses)}
+
+    @staticmethod
+    async def save_pokemon_to_json(bot):
+        """Exports the PokemonTable if it changed since the last export.
+        The file is written off the event loop."""
+        version = PokedexRegistry.version()
+        if Pokemon._exported_version == version:
             return None
-        except Exception as err:
-            return err
+        fields = ["id", "name", "legendary", "mythical", "shiny", "alolan", "galarian",
+                  "types", "released", "attack", "defense", "stamina"]
+        data = [{field: row[field] for field in fields} for row in PokedexRegistry.all_by_id().values()]
+        err = await bot.loop.run_in_executor(None, utils.dump_json_atomic, data,
+                                             os.path.join('data', 'pokemon_data_backup1'),
+                                             os.path.join('data', 'pokemon_data_backup2'))
+        if err is None:
+            Pokemon._exported_version = version
+        return err
 
 
 def setup(bot):
@@ -12,6 +12,7 @@ from discord.ext import commands
 from kyogre import image_scan, testident, utils, checks, image_utils
 from kyogre.context import Context
 from kyogre.exts.db.kyogredb import APIUsageTable, GuildTable, TrainerTable, fn
+from kyogre.exts.locationmatching import GymAliasStore
 from kyogre.exts.pokemon import Pokemon
 
 
@@ -21,6 +22,8 @@ class RaidAuto(commands.Cog):
         self.hashes = {}
 
     async def create_raid(self, ctx, raid_info, file, warning):
+        """Reports the scanned raid. Returns the gym the raid was reported at once the
+        reporter confirmed it, or None if no raid was reported."""
         guild = ctx.guild
         channel = ctx.channel
         author = ctx.author
@@ -43,9 +46,10 @@ class RaidAuto(commands.Cog):
                                                        current=start)
         if raidexp < 0 and raid_info['type'] == 'raid':
             self.bot.gcv_logger.info(f"{ctx.author} posted an expired raid.")
-            return await ctx.channel.send(embed=discord.Embed(
+            await ctx.channel.send(embed=discord.Embed(
                 colour=discord.Colour.red(),
                 description=f"This raid has already expired. Please do not post expired raids."))
+            return None
         # Determine region
         utils_cog = self.bot.cogs.get('Utilities')
         regions = utils_cog.get_channel_regions(channel, 'raid')
@@ -55,21 +59,23 @@ class RaidAuto(commands.Cog):
         # check existing
         raid_cog = self.bot.cogs.get('RaidCommands')
         gym = await location_matching_cog.match_prompt(channel, author.id, raid_info["gym"], gyms)
-        raid_channel_ids = raid_cog.get_existing_raid(guild, gym)
+        raid_channel_ids = raid_cog.get_existing_raid(guild, gym) if gym else []
         if raid_channel_ids:
             try:
                 raid_dict_entry = self.bot.guild_dict[guild.id]['raidchannel_dict'][raid_channel_ids[0]]
                 # if existing, if screenshot is boss and existing is egg then update
                 if raid_dict_entry['type'] == 'raid' or raid_info['type'] == 'egg':
                     # already reported
-                    return await channel.send(
+                    await channel.send(
                                         embed=discord.Embed(
                                             colour=discord.Colour.red(),
                                             description=f"A raid has already been reported for {gym.name}"))
+                    return None
                 raid_pokemon = self._check_alolan(raid_info['boss'])
                 raid_pokemon = self._check_galarian(raid_pokemon.name)
                 await raid_cog.egg_to_raid(ctx, raid_pokemon.name, self.bot.get_channel(raid_channel_ids[0]))
-                return await ctx.message.add_reaction(self.bot.success_react)
+                await ctx.message.add_reaction(self.bot.success_react)
+                return gym
             except KeyError:
                 pass
         report_channel = None
@@ -78,17 +84,24 @@ class RaidAuto(commands.Cog):
         if len(reporting_channels) > 0:
             report_channel = guild.get_channel(reporting_channels[0])
         if raid_info['type'] == 'egg':
-            await raid_cog.finish_raid_report(ctx, raid_info["gym"], None, raid_info["tier"],
-                                              raidexp, report_channel=report_channel, image_file=file, bad_scan=warning)
+            raid_channel = await raid_cog.finish_raid_report(ctx, raid_info["gym"], None, raid_info["tier"],
+                                                             raidexp, report_channel=report_channel,
+                                                             image_file=file, bad_scan=warning, gym=gym)
         else:
             raid_pokemon = self._check_alolan(raid_info['boss'])
             raid_pokemon = self._check_galarian(raid_pokemon.name)
             if not raid_pokemon.is_raid:
                 error_desc = f'The Pokemon {raid_pokemon.name} does not currently appear in raids.'
-                return await channel.send(embed=discord.Embed(colour=discord.Colour.red(), description=error_desc))
-            await raid_cog.finish_raid_report(ctx, raid_info["gym"], raid_pokemon,
-                                              raid_pokemon.raid_level, raidexp,
-                                              report_channel=report_channel, image_file=file, bad_scan=warning)
+                await channel.send(embed=discord.Embed(colour=discord.Colour.red(), description=error_desc))
+                return None
+            raid_channel = await raid_cog.finish_raid_report(ctx, raid_info["gym"], raid_pokemon,
+                                                             raid_pokemon.raid_level, raidexp,
+                                                             report_channel=report_channel, image_file=file,
+                                                             bad_scan=warning, gym=gym)
+        # anything other than the new channel means the report stopped short
+        if gym is None or not isinstance(raid_channel, discord.TextChannel):
+            return None
+        return gym
 
     def _check_alolan(self, pokemon_name):
         if pokemon_name in Pokemon.get_alolans_list():
@@ -258,7 +271,11 @@ class RaidAuto(commands.Cog):
                     raid_info['exp'] = timev
             raid_info["real_scan"] = f"{time.time() - start}"
             self.bot.gcv_logger.info(raid_info)
-            await self.create_raid(ctx, raid_info, file, warning)
+            gym = await self.create_raid(ctx, raid_info, file, warning)
+            # only remember the scanned names for the gym the raid ended up at
+            if gym is not None:
+                for name in raid_info.get('alias_names', []):
+                    GymAliasStore.learn(ctx.guild.id, name, gym, 'scan')
             if egg_image:
                 await image_utils.cleanup_file(file, f"screenshots/{raid_info['tier']}")
             else:
@@ -402,18 +419,27 @@ class RaidAuto(commands.Cog):
                 image_info = await image_scan.read_photo_async(file, self.bot, self.bot.gcv_logger)
             except:
                 return {'gym': None}
-        gym = await self._determine_gym(ctx, region, image_info["names"])
+        gym, alias_names = await self._determine_gym(ctx, region, image_info["names"])
         if gym:
             image_info['gym'] = gym.name
+            image_info['alias_names'] = alias_names
         else:
             image_info['gym'] = None
         return image_info
 
     async def _determine_gym(self, ctx, region, names):
+        """Returns the gym the scanned names most likely refer to, along with
+        the scanned name that matched it best."""
         location_matching_cog = self.bot.cogs.get('LocationMatching')
         gyms = location_matching_cog.get_gyms(ctx.guild.id, region)
-        gym = None
+        names = [name.strip() for name in names]
+        # previously confirmed scans of the same gym usually produce the same text
+        gym = GymAliasStore.lookup(ctx.guild.id, names, gyms)
+        if gym:
+            return gym, []
         possible_gyms = {}
+        # best scoring scanned name for each gym, remembered as an alias if the scan is used
+        best_names = {}
         must_prompt = False
         prompt_str = ''
         # Iterate through all possible names and look first for full matches
@@ -424,9 +450,11 @@ class RaidAuto(commands.Cog):
                 prompt_str = "starbucks"
                 must_prompt = True
                 break
-            result = location_matching_cog.location_match(name.strip(), gyms, is_partial=False)
+            result = location_matching_cog.location_match(name, gyms, is_partial=False)
             results = [(match.name, score) for match, score in result]
             results = sorted(results, key=itemgetter(1), reverse=True)
+            if results and results[0][1] > best_names.get(results[0][0], (0, None))[0]:
+                best_names[results[0][0]] = (results[0][1], name)
             for r in results:
                 if not gym and r[1] >= 98:
                     gym = next((l for l in gyms if l.name == r[0]), None)
@@ -441,9 +469,11 @@ class RaidAuto(commands.Cog):
         # and again set the gym if a 100% match is found and track count of lower score matches.
         if not gym:
             for name in names:
-                result = location_matching_cog.location_match(name.strip(), gyms, threshold=65)
+                result = location_matching_cog.location_match(name, gyms, threshold=65)
                 results = [(match.name, score) for match, score in result]
                 results = sorted(results, key=itemgetter(1), reverse=True)
+                if results and results[0][0] not in best_names:
+                    best_names[results[0][0]] = (results[0][1], name)
                 for r in results:
                     if not gym and r[1] == 100:
                         gym = next((l for l in gyms if l.name == r[0]), None)
@@ -466,7 +496,9 @@ class RaidAuto(commands.Cog):
                                                   key=itemgetter(1),
                                                   reverse=True))][:min(3, len(possible_gyms))]
                 gym = next((l for l in gyms if l.name == possible_gyms[0]), None)
-        return gym
+        if not gym or must_prompt or gym.name not in best_names:
+            return gym, []
+        return gym, [best_names[gym.name][1]]
 
     async def scan_test(self, ctx, file, url, region=None):
         image_info = await self._scan_wrapper(ctx, file, url, region)
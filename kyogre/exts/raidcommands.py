@@ -19,6 +19,8 @@ from kyogre.exts.pokemon import Pokemon
 from kyogre.context import Context
 
 from kyogre.exts.db.kyogredb import KyogreDB, RaidActionTable, RaidTable, TrainerReportRelation
+from kyogre.exts.locationmatching import LocationStore
+from kyogre.raid_store import RaidChannelStore
 
 
 class RaidCommands(commands.Cog):
@@ -357,7 +359,9 @@ class RaidCommands(commands.Cog):
         return await self.finish_raid_report(ctx, raid_details, None, egg_level, raidexp)
 
     async def finish_raid_report(self, ctx, raid_details, raid_pokemon, level, raidexp,
-                                 report_channel=None, image_file=None, bad_scan=False):
+                                 report_channel=None, image_file=None, bad_scan=False, gym=None):
+        """Reports the raid and returns its new channel. gym skips matching raid_details
+        when the caller already had the gym confirmed."""
         message = ctx.message
         if report_channel:
             channel = report_channel
@@ -371,7 +375,6 @@ class RaidCommands(commands.Cog):
             raid_report = True
         utils_cog = self.bot.cogs.get('Utilities')
         report_regions = utils_cog.get_channel_regions(channel, 'raid')
-        gym = None
         location_matching_cog = self.bot.cogs.get('LocationMatching')
         gyms = location_matching_cog.get_gyms(guild.id, report_regions)
         listmgmt_cog = self.bot.cogs.get('ListManagement')
@@ -380,7 +383,8 @@ class RaidCommands(commands.Cog):
         other_region = False
         gym_regions = []
         if gyms:
-            gym = await location_matching_cog.match_prompt(channel, author.id, raid_details, gyms)
+            if gym is None:
+                gym = await location_matching_cog.match_prompt(channel, author.id, raid_details, gyms)
             if not gym:
                 all_regions = list(self.bot.guild_dict[guild.id]['configure_dict']['regions']['info'].keys())
                 gyms = location_matching_cog.get_gyms(guild.id, all_regions)
@@ -512,6 +516,7 @@ class RaidCommands(commands.Cog):
                             'tier': raid_pokemon.raid_level,
                             'ex-eligible': gym.ex_eligible if gym else False,
                             'location': raid_details,
+                            'gym_id': gym.id if gym else None,
                             'regions': gym_regions}
         else:
             raidmsg = entity_updates.get_raidtext(report_channel)
@@ -521,6 +526,7 @@ class RaidCommands(commands.Cog):
             raid_details = {'tier': level,
                             'ex-eligible': gym.ex_eligible if gym else False,
                             'location': raid_details,
+                            'gym_id': gym.id if gym else None,
                             'regions': gym_regions}
         raidmessage = await raid_channel.send(content=raidmsg, embed=raid_embed)
         if enabled:
@@ -912,7 +918,7 @@ class RaidCommands(commands.Cog):
         raid_details = {'pokemon': pkmn, 'tier': pkmn.raid_level,
                         'ex-eligible': False if gym is None else gym.ex_eligible,
                         'location': eggdetails['address'], 'regions': eggdetails['regions'],
-                        'hatching': True}
+                        'gym_id': None if gym is None else gym.id, 'hatching': True}
         new_status = None
         subscriptions_cog = self.bot.cogs.get('Subscriptions')
         if enabled:
@@ -1192,22 +1198,11 @@ class RaidCommands(commands.Cog):
 
     def get_existing_raid(self, guild, location, only_ex=False):
         """returns a list of channel ids for raids reported at the location provided"""
-        report_dict = {k: v for k, v in self.bot.guild_dict[guild.id]['raidchannel_dict'].items()
-                       if ((v.get('egglevel', '').lower() != 'ex')
-                       if not only_ex else (v.get('egglevel', '').lower() == 'ex'))}
-
-        def matches_existing(report):
-            # ignore meetups
-            if report.get('meetup', {}):
-                return False
-            gym_id = report['gym']
-            location_matching_cog = self.bot.cogs.get('LocationMatching')
-            gym = location_matching_cog.get_gym_by_id(guild.id, gym_id)
-            if gym is None:
-                return False
-            name_matches = gym.name.lower() == location.name.lower()
-            return report.get('gym', None) and name_matches
-        return [channel_id for channel_id, report in report_dict.items() if matches_existing(report)]
+        # raids at any gym sharing the location's name count as existing
+        gym_ids = {gym.id for gym in LocationStore.by_name(guild.id, location.name, 'gym')}
+        gym_ids.add(location.id)
+        return [channel_id for channel_id, level in RaidChannelStore.at_gyms(guild.id, gym_ids)
+                if ((level or '').lower() == 'ex') == only_ex]
 
     async def print_raid_timer(self, channel):
         guild = channel.guild
@@ -1956,10 +1951,9 @@ class RaidCommands(commands.Cog):
     async def channel_cleanup(self):
         while not self.bot.is_closed():
             active_raids = self.bot.active_raids
-            guilddict_chtemp = copy.deepcopy(self.bot.guild_dict)
             self.bot.logger.info('Raid Channel_Cleanup ------ BEGIN ------')
-            # for every server in save data
-            for guildid in guilddict_chtemp.keys():
+            # for every server with raid channels
+            for guildid in RaidChannelStore.guilds():
                 if guildid in self.bot.util_servers:
                     continue
                 guild = self.bot.get_guild(guildid)
@@ -1972,14 +1966,14 @@ class RaidCommands(commands.Cog):
                 # clear channel lists
                 dict_channel_delete = []
                 discord_channel_delete = []
-                # check every raid channel data for each server
-                for channelid in guilddict_chtemp[guildid]['raidchannel_dict']:
+                # check every raid channel of each server
+                for raid in RaidChannelStore.channels(guildid):
+                    channelid = raid.channel
                     channel = self.bot.get_channel(channelid)
                     log_str = 'Raid Channel_Cleanup - Server: ' + guild.name
                     log_str = (log_str + ': Channel:') + str(channelid)
                     self.bot.logger.info(log_str + ' - CHECKING')
-                    channelmatch = self.bot.get_channel(channelid)
-                    if channelmatch is None:
+                    if channel is None:
                         # list channel for deletion from save data
                         dict_channel_delete.append(channelid)
                         self.bot.logger.info(log_str + " - NOT IN DISCORD")
@@ -1988,11 +1982,10 @@ class RaidCommands(commands.Cog):
                         self.bot.logger.info(
                             ((log_str + ' (') + channel.name) + ') - EXISTS IN DISCORD')
                         # if the channel save data shows it's not an active raid
-                        if not guilddict_chtemp[guildid]['raidchannel_dict'][channelid]['active']:
-                            if guilddict_chtemp[guildid]['raidchannel_dict'][channelid]['type'] == 'egg':
+                        if not raid.active:
+                            if raid.type == 'egg':
                                 # and if it has been expired for longer than 45 minutes already
-                                if guilddict_chtemp[guildid]['raidchannel_dict'][channelid]['hatch_time'] < (
-                                        time.time() - (45 * 60)):
+                                if raid.hatch_time < (time.time() - (45 * 60)):
                                     # list the channel to be removed from save data
                                     dict_channel_delete.append(channelid)
                                     # and list the channel to be deleted in discord
@@ -2001,8 +1994,7 @@ class RaidCommands(commands.Cog):
                                         log_str + ' - 15+ MIN EXPIRY NONACTIVE EGG')
                                     continue
                                 # and if it has been expired for longer than 1 minute already
-                            elif guilddict_chtemp[guildid]['raidchannel_dict'][channelid]['expire_time'] < (
-                                    time.time() - (self.bot.channel_exp_minutes * 60)):
+                            elif raid.expire_time < (time.time() - (self.bot.channel_exp_minutes * 60)):
                                 # list the channel to be removed from save data
                                 dict_channel_delete.append(channelid)
                                 # and list the channel to be deleted in discord
@@ -2015,14 +2007,14 @@ class RaidCommands(commands.Cog):
                                 log_str + ' - = RECENTLY EXPIRED NONACTIVE RAID')
                             continue
                         # if the channel save data shows it as an active raid still
-                        elif guilddict_chtemp[guildid]['raidchannel_dict'][channelid]['active']:
+                        else:
                             # if it's an exraid
-                            if guilddict_chtemp[guildid]['raidchannel_dict'][channelid]['type'] == 'exraid':
+                            if raid.type == 'exraid':
                                 self.bot.logger.info(log_str + ' - EXRAID')
 
                                 continue
                             # or if the expiry time for the channel has already passed within 5 minutes
-                            elif guilddict_chtemp[guildid]['raidchannel_dict'][channelid]['expire_time'] <= time.time():
+                            elif raid.expire_time <= time.time():
                                 # list the channel to be sent to the channel expiry function
                                 self.bot.event_loop.create_task(self.expire_channel(channel))
                                 self.bot.logger.info(log_str + ' - RECENTLY EXPIRED')
@@ -2061,7 +2053,7 @@ class RaidCommands(commands.Cog):
                 admin_commands_cog = self.bot.cogs.get('AdminCommands')
                 if not admin_commands_cog:
                     return None
-                await admin_commands_cog.save(guildid)
+                admin_commands_cog.save_nowait(guildid)
             except Exception as err:
                 self.bot.logger.info('Channel_Cleanup - SAVING FAILED' + str(err))
             self.bot.logger.info('Channel_Cleanup ------ END ------')
@@ -2451,14 +2443,7 @@ class RaidCommands(commands.Cog):
                 await message.remove_reaction(payload.emoji, user)
 
     def get_raid_report(self, guild, message_id):
-        raid_dict = self.bot.guild_dict[guild.id]['raidchannel_dict']
-        for raid in raid_dict:
-            if raid_dict[raid]['raidreport'] == message_id:
-                return raid
-            if 'raidcityreport' in raid_dict[raid]:
-                if raid_dict[raid]['raidcityreport'] == message_id:
-                    return raid
-        return None
+        return RaidChannelStore.by_report(guild.id, message_id)
 
     async def modify_raid_report(self, payload, raid_report):
         guild_dict = self.bot.guild_dict
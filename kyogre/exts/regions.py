@@ -10,6 +10,85 @@ class Regions(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.guild_dict = bot.guild_dict
+        self.member_regions = {}
+
+    def _region_roles(self, guild_id):
+        region_dict = self.guild_dict.get(guild_id, {}).get('configure_dict', {}).get('regions', None) or {}
+        region_roles = {}
+        for name, info in region_dict.get('info', {}).items():
+            region_roles.setdefault(info.get('role', None), set()).add(name)
+        return region_roles
+
+    @staticmethod
+    def _regions_for_roles(role_names, region_roles):
+        return frozenset(region for role in role_names for region in region_roles.get(role, ()))
+
+    def _get_guild_regions(self, guild):
+        cached = self.member_regions.get(guild.id, None)
+        if cached is None:
+            region_roles = self._region_roles(guild.id)
+            cached = {'roles': region_roles,
+                      'members': {m.id: self._regions_for_roles([r.name for r in m.roles], region_roles)
+                                  for m in guild.members if not m.bot}}
+            self.member_regions[guild.id] = cached
+        return cached
+
+    def get_member_regions(self, member):
+        """Returns the frozenset of region names whose roles the member has."""
+        cached = self._get_guild_regions(member.guild)
+        regions = cached['members'].get(member.id, None)
+        if regions is None:
+            regions = self._regions_for_roles([r.name for r in member.roles], cached['roles'])
+            cached['members'][member.id] = regions
+        return regions
+
+    def invalidate(self, guild_id):
+        """Drops the guild's cached region roles and member regions, for when its region config changes."""
+        self.member_regions.pop(guild_id, None)
+
+    def update_member_regions(self, member, added_roles=(), removed_roles=()):
+        """Recomputes a member's regions from their roles, adjusted by role names
+        that were just added or removed but may not be reflected on the member yet."""
+        cached = self.member_regions.get(member.guild.id, None)
+        if cached is None:
+            return
+        role_names = set(r.name for r in member.roles)
+        role_names = (role_names | set(added_roles)) - set(removed_roles)
+        cached['members'][member.id] = self._regions_for_roles(role_names, cached['roles'])
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        self.member_regions = {}
+        for guild in self.bot.guilds:
+            if guild.id in self.guild_dict:
+                self._get_guild_regions(guild)
+
+    @commands.Cog.listener()
+    async def on_member_join(self, member):
+        self.update_member_regions(member)
+
+    @commands.Cog.listener()
+    async def on_member_update(self, before, after):
+        if after.bot:
+            return
+        if before.roles != after.roles:
+            self.update_member_regions(after)
+
+    @commands.Cog.listener()
+    async def on_member_remove(self, member):
+        self.member_regions.get(member.guild.id, {}).get('members', {}).pop(member.id, None)
+
+    @commands.Cog.listener()
+    async def on_guild_role_update(self, before, after):
+        if before.name != after.name:
+            region_roles = self.member_regions.get(after.guild.id, {}).get('roles', {})
+            if before.name in region_roles or after.name in region_roles:
+                self.invalidate(after.guild.id)
+
+    @commands.Cog.listener()
+    async def on_guild_role_delete(self, role):
+        if role.name in self.member_regions.get(role.guild.id, {}).get('roles', {}):
+            self.invalidate(role.guild.id)
 
     @commands.group(name='region', aliases=['regions'], case_insensitive=True)
     @checks.allowregion()
@@ -41,6 +120,7 @@ class Regions(commands.Cog):
         if role_objs:
             try:
                 await author.add_roles(*role_objs, reason="user requested region role add via ")
+                self.update_member_regions(author, added_roles=valid_requests)
                 await message.add_reaction('✅')
                 response += "Successfully joined "
             except:
@@ -74,6 +154,7 @@ class Regions(commands.Cog):
         if role_objs:
             try:
                 await author.remove_roles(*role_objs, reason="user requested region role remove via ")
+                self.update_member_regions(author, removed_roles=valid_requests)
                 await message.add_reaction('✅')
                 response += "Successfully left "
             except:
@@ -40,8 +40,7 @@ class SetCommands(commands.Cog):
                 pass
             else:
                 return
-            guild_dict_copy = copy.deepcopy(self.bot.guild_dict)
-            for guildid in guild_dict_copy.keys():
+            for guildid in list(self.bot.guild_dict.keys()):
                 self.bot.guild_dict[guildid]['configure_dict']['settings']['regional'] = None
             return
         elif regional == 'clear':
@@ -96,6 +95,32 @@ class SetCommands(commands.Cog):
         self.bot.guild_dict[ctx.guild.id]['configure_dict']['settings']['invasion_minutes'] = minutes
         await ctx.channel.send(f"Team Rocket Takeover expiration time changed to {minutes}.")
 
+    @_set.command()
+    @commands.has_permissions(manage_guild=True)
+    async def rolepool(self, ctx, *, size: int):
+        """Changes how many roles large subscription notifications can mention, 0 to turn them off."""
+        size = max(0, size)
+        self.bot.guild_dict[ctx.guild.id]['configure_dict'].setdefault('subscriptions', {})['role_pool_size'] = size
+        subscriptions_cog = self.bot.cogs.get('Subscriptions')
+        if subscriptions_cog:
+            subscriptions_cog.dispatcher.role_pool.forget(ctx.guild.id)
+        if size:
+            await ctx.channel.send(f"Subscription notification role pool size changed to {size}.")
+        else:
+            await ctx.channel.send("Subscription notification role pool turned off.")
+
+    @_set.command()
+    @commands.has_permissions(manage_guild=True)
+    async def notificationwindow(self, ctx, *, minutes: int):
+        """Changes how many minutes repeat subscription notifications are skipped for, 0 to turn it off."""
+        minutes = max(0, minutes)
+        config = self.bot.guild_dict[ctx.guild.id]['configure_dict'].setdefault('subscriptions', {})
+        config['notification_window'] = minutes * 60
+        if minutes:
+            await ctx.channel.send(f"Repeat subscription notifications will be skipped for {minutes} minutes.")
+        else:
+            await ctx.channel.send("Repeat subscription notifications will no longer be skipped.")
+
     @_set.command()
     @commands.has_permissions(manage_guild=True)
     async def prefix(self, ctx, prefix=None):
@@ -480,6 +505,9 @@ class SetCommands(commands.Cog):
                                   "`47.23456, -122.65432`", delete_after=15)
         self.bot.guild_dict[ctx.guild.id]['trainers'].setdefault('info', {})\
             .setdefault(ctx.author.id, {})['location'] = (lat, lon)
+        subscriptions_cog = self.bot.cogs.get('Subscriptions')
+        if subscriptions_cog:
+            subscriptions_cog.update_trainer_range(ctx.guild.id, ctx.author.id)
         await ctx.message.add_reaction(self.bot.success_react)
     
     @_set.command(name='distance', aliases=['dis'])
@@ -491,6 +519,9 @@ class SetCommands(commands.Cog):
             return await ctx.send("Please provide a number of miles.", delete_after=15)
         self.bot.guild_dict[ctx.guild.id]['trainers'].setdefault('info', {})\
             .setdefault(ctx.author.id, {})['distance'] = distance
+        subscriptions_cog = self.bot.cogs.get('Subscriptions')
+        if subscriptions_cog:
+            subscriptions_cog.update_trainer_range(ctx.guild.id, ctx.author.id)
         await ctx.message.add_reaction(self.bot.success_react)
 
     @_set.command(name='short_output', aliases=['so'])
@@ -1,25 +1,140 @@
 import asyncio
 import copy
-import math
 import re
 
 from discord.ext import commands
 
-from kyogre import constants, checks, utils
+from kyogre import constants, checks, spatial, utils
+from kyogre.notifications import NotificationDispatcher, NotificationWindow, RolePool
 
+from kyogre.exts.faves import TopSubs
 from kyogre.exts.pokemon import Pokemon
-from kyogre.exts.locationmatching import Gym
+from kyogre.exts.locationmatching import LocationStore
 
 from kyogre.exts.db.kyogredb import LureTypeTable, RewardTable, GuildTable, TrainerTable
-from kyogre.exts.db.kyogredb import SubscriptionTable, LocationTable, LocationNoteTable
-from kyogre.exts.db.kyogredb import LocationRegionRelation, RegionTable, GymTable
-from kyogre.exts.db.kyogredb import Lure, Reward, JOIN, IntegrityError
+from kyogre.exts.db.kyogredb import SubscriptionTable
+from kyogre.exts.db.kyogredb import Lure, Reward, IntegrityError
+
+
+class SubscriptionIndex:
+    """In-memory copy of each guild's subscriptions keyed by (type, target).
+
+    Loaded from the database the first time a guild is notified and kept
+    current by reloading a trainer's rows after they add or remove
+    subscriptions, so a report only touches the trainers subscribed to one
+    of its targets.
+    """
+    _guilds = {}
+
+    @staticmethod
+    def _query(guild_id, trainer=None):
+        results = (SubscriptionTable
+                   .select(SubscriptionTable.trainer, SubscriptionTable.type,
+                           SubscriptionTable.target, SubscriptionTable.specific)
+                   .join(TrainerTable, on=(SubscriptionTable.trainer == TrainerTable.snowflake))
+                   .where(TrainerTable.guild == guild_id)
+                   .where(SubscriptionTable.guild_id == guild_id))
+        if trainer is not None:
+            results = results.where(SubscriptionTable.trainer == trainer)
+        return results
+
+    @staticmethod
+    def parse_specific(specific):
+        """Returns the gym ids a subscription is limited to as a frozenset,
+        or None if it isn't limited to any gyms."""
+        if not specific:
+            return None
+        gym_ids = set()
+        for s in specific.strip('[]').split(', '):
+            try:
+                gym_ids.add(int(s))
+            except ValueError:
+                pass
+        return frozenset(gym_ids)
+
+    @classmethod
+    def _add(cls, index, trainer, sub_type, target, specific):
+        key = (sub_type, target)
+        index['targets'].setdefault(key, {}).setdefault(trainer, []).append(cls.parse_specific(specific))
+        index['trainers'].setdefault(trainer, set()).add(key)
+
+    @classmethod
+    def _get(cls, guild_id):
+        index = cls._guilds.get(guild_id, None)
+        if index is None:
+            index = {'targets': {}, 'trainers': {}}
+            for s in cls._query(guild_id):
+                cls._add(index, s.trainer, s.type, s.target, s.specific)
+            cls._guilds[guild_id] = index
+        return index
+
+    @classmethod
+    def trainer_keys(cls, guild_id, trainer):
+        """Returns the (type, target) pairs the trainer is subscribed to."""
+        return frozenset(cls._get(guild_id)['trainers'].get(trainer, ()))
+
+    @classmethod
+    def trainer_subscriptions(cls, guild_id, trainer):
+        """Returns (type, target, gym ids or None) for each of the trainer's subscriptions."""
+        index = cls._get(guild_id)
+        return [(key[0], key[1], gym_ids) for key in sorted(index['trainers'].get(trainer, ()))
+                for gym_ids in index['targets'][key][trainer]]
+
+    @classmethod
+    def reload_trainer(cls, guild_id, trainer):
+        """Call after a trainer's subscriptions change. Returns their new (type, target) pairs."""
+        index = cls._get(guild_id)
+        for key in index['trainers'].pop(trainer, ()):
+            subscribers = index['targets'][key]
+            subscribers.pop(trainer, None)
+            if not subscribers:
+                del index['targets'][key]
+        for s in cls._query(guild_id, trainer):
+            cls._add(index, s.trainer, s.type, s.target, s.specific)
+        return frozenset(index['trainers'].get(trainer, ()))
+
+    @classmethod
+    def invalidate(cls, guild_id=None):
+        if guild_id is None:
+            cls._guilds.clear()
+        else:
+            cls._guilds.pop(guild_id, None)
+
+    @classmethod
+    def match(cls, guild_id, sub_types, targets):
+        """Returns {trainer: {target: [gym ids or None, ...]}} for every
+        subscription of one of the types to one of the targets."""
+        index = cls._get(guild_id)['targets']
+        matches = {}
+        for sub_type in sub_types:
+            for target in targets:
+                subscribers = index.get((sub_type, target), None)
+                if not subscribers:
+                    continue
+                for trainer, specifics in subscribers.items():
+                    matches.setdefault(trainer, {}).setdefault(target, []).extend(specifics)
+        return matches
+
+    @classmethod
+    def get_stats(cls, guild_id):
+        index = cls._guilds.get(guild_id, None)
+        if index is None:
+            return {'loaded': False, 'trainers': 0, 'subscriptions': 0}
+        return {'loaded': True, 'trainers': len(index['trainers']),
+                'subscriptions': sum(len(s) for subs in index['targets'].values() for s in subs.values())}
 
 
 class Subscriptions(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
         self.success_react = '✅'
+        self.trainer_ranges = {}
+        self.sub_list_cache = {}
+        self.dispatcher = NotificationDispatcher(bot.logger, role_pool=RolePool(bot.guild_dict))
+        self.notification_window = NotificationWindow(bot.guild_dict)
+
+    def cog_unload(self):
+        self.dispatcher.stop()
 
     subscription_types = {"Raid Boss": "raid",
                           "Gym": "gym",
@@ -249,7 +364,7 @@ class Subscriptions(commands.Cog):
         message = ctx.message
         channel = message.channel
         sub_type = self.subscription_types[type_str]
-        sub_list = self._generate_sub_list_message(ctx, [sub_type])
+        sub_list = list(self._sub_list_pages(ctx.guild.id, ctx.author.id, [sub_type]))
         if len(sub_list) < 1:
             return await channel.send("You don't have any subscriptions of type **{sub_type}** to remove.")
         if type_str == "All":
@@ -286,6 +401,11 @@ class Subscriptions(commands.Cog):
             return None, f"Failed to {action} subscriptions because you cancelled the report."
         return prompt_msg, None
 
+    def _subscriptions_changed(self, guild_id, trainer, before):
+        after = SubscriptionIndex.reload_trainer(guild_id, trainer)
+        TopSubs.apply(guild_id, before - after, after - before)
+        self.sub_list_cache.pop((guild_id, trainer), None)
+
     @_sub.command(name="add")
     async def _sub_add(self, ctx, *, content=None):
         """Create a subscription
@@ -323,6 +443,7 @@ class Subscriptions(commands.Cog):
         trainer_obj, __ = TrainerTable.get_or_create(snowflake=trainer, guild=guild.id)
         if guild_obj is None or trainer_obj is None:
             pass
+        before = SubscriptionIndex.trainer_keys(guild.id, trainer)
         s_type = ''
         for sub in candidate_list:
             s_type = sub[0]
@@ -333,16 +454,7 @@ class Subscriptions(commands.Cog):
                 try:
                     result, __ = SubscriptionTable.get_or_create(guild_id=ctx.guild.id, trainer=trainer,
                                                                  type=s_type, target=s_target)
-                    current_gym_ids = result.specific
-                    split_ids = []
-                    if current_gym_ids:
-                        current_gym_ids = current_gym_ids.strip('[]')
-                        split_id_string = current_gym_ids.split(', ')
-                        for s in split_id_string:
-                            try:
-                                split_ids.append(int(s))
-                            except ValueError: 
-                                pass
+                    split_ids = list(SubscriptionIndex.parse_specific(result.specific) or [])
                     spec = [int(s) for s in spec]
                     new_ids = set(split_ids + spec)
                     result.specific = list(new_ids)
@@ -359,6 +471,7 @@ class Subscriptions(commands.Cog):
                     existing_list.append(s_entry)
                 except:
                     error_list.append(s_entry)
+        self._subscriptions_changed(guild.id, trainer, before)
 
         sub_count = len(sub_list)
         existing_count = len(existing_list)
@@ -424,6 +537,7 @@ class Subscriptions(commands.Cog):
                             .where((TrainerTable.snowflake == trainer) & 
                             (TrainerTable.guild == guild.id)))
 
+        before = SubscriptionIndex.trainer_keys(guild.id, trainer)
         # check for special cases
         skip_parse = False
         
@@ -436,6 +550,7 @@ class Subscriptions(commands.Cog):
                     message = f'I removed your {remove_count} subscriptions!'
                 except:
                     message = 'I was unable to remove your subscriptions!'
+                self._subscriptions_changed(guild.id, trainer, before)
                 confirmation_msg = f'{message}'
                 await channel.send(content=confirmation_msg)
                 return
@@ -470,16 +585,7 @@ class Subscriptions(commands.Cog):
                 try:
                     result, __ = SubscriptionTable.get_or_create(guild_id=ctx.guild.id, trainer=trainer,
                                                                  type='gym', target=s_target)
-                    current_gym_ids = result.specific
-                    split_ids = []
-                    if current_gym_ids:
-                        current_gym_ids = current_gym_ids.strip('[]')
-                        split_id_string = current_gym_ids.split(', ')
-                        for s in split_id_string:
-                            try:
-                                split_ids.append(int(s))
-                            except ValueError: 
-                                pass
+                    split_ids = list(SubscriptionIndex.parse_specific(result.specific) or [])
                     for s in spec:
                         if s in split_ids:
                             remove_count += 1
@@ -513,6 +619,7 @@ class Subscriptions(commands.Cog):
                         not_found_list.append(s_entry)
                 except:
                     error_list.append(s_entry)
+        self._subscriptions_changed(guild.id, trainer, before)
 
         not_found_count = len(not_found_list)
         error_count = len(error_list)
@@ -559,20 +666,18 @@ class Subscriptions(commands.Cog):
                 return await utils.sleep_and_cleanup([message, response], 10)
             if invalid_types:
                 response_msg = "\nUnable to find these subscription types: {inv}".format(inv=', '.join(invalid_types))
-        listmsg_list = self._generate_sub_list_message(ctx, valid_types)
+        pages = self._sub_list_pages(ctx.guild.id, author.id, valid_types)
+        first_page = next(pages, None)
         response_msg = f"{author.mention}, check your inbox! " \
                        f"I've sent your subscriptions to you directly!" + response_msg
-        if len(listmsg_list) > 0:
+        if first_page is not None:
             if valid_types:
                 await author.send(f"Your current {', '.join(valid_types)} subscriptions are:")
-                for m in listmsg_list:
-                    if len(m) > 0:
-                        await author.send(m)
             else:
                 await author.send('Your current subscriptions are:')
-                for m in listmsg_list:
-                    if len(m) > 0:
-                        await author.send(m)
+            await author.send(first_page)
+            for page in pages:
+                await author.send(page)
         else:
             if valid_types:
                 await author.send("You don\'t have any subscriptions for {types}! use the **!subscription add**\
@@ -583,81 +688,63 @@ class Subscriptions(commands.Cog):
         await message.add_reaction(self.success_react)
         return await channel.send(response_msg, delete_after=10)
 
-    @staticmethod
-    def _generate_sub_list_message(ctx, types):
-        message = ctx.message
-        guild = message.guild
-        results = (SubscriptionTable
-                   .select(SubscriptionTable.type, SubscriptionTable.target, SubscriptionTable.specific)
-                   .join(TrainerTable, on=(SubscriptionTable.trainer == TrainerTable.snowflake))
-                   .where(SubscriptionTable.trainer == ctx.author.id)
-                   .where(TrainerTable.guild == ctx.guild.id)
-                   .where(SubscriptionTable.guild_id == ctx.guild.id))
-        if len(types) > 0:
-            results = results.where(SubscriptionTable.type << types)
-        results = results.execute()
-
-        types = set([s.type for s in results])
-        for r in results:
-            if r.specific:
-                current_gym_ids = r.specific.strip('[').strip(']')
-                split_id_string = current_gym_ids.split(', ')
-                split_ids = []
-                for s in split_id_string:
-                    try:
-                        split_ids.append(int(s))
-                    except ValueError:
-                        pass
-
-                gyms = (GymTable
-                        .select(LocationTable.id,
-                                LocationTable.name,
-                                LocationTable.latitude,
-                                LocationTable.longitude,
-                                RegionTable.name.alias('region'),
-                                GymTable.ex_eligible,
-                                LocationNoteTable.note)
-                        .join(LocationTable)
-                        .join(LocationRegionRelation)
-                        .join(RegionTable)
-                        .join(LocationNoteTable, JOIN.LEFT_OUTER,
-                              on=(LocationNoteTable.location_id == LocationTable.id))
-                        .where((LocationTable.guild == guild.id) &
-                               (LocationTable.guild == RegionTable.guild) &
-                               (LocationTable.id << split_ids)))
-                result = gyms.objects(Gym)
-                r.specific = ",\n\t".join([o.name for o in result])
+    def _get_sub_list_sections(self, guild_id, trainer):
+        """Returns the trainer's rendered subscription list as {type: [section, ...]}.
+        Cached until the trainer's subscriptions or the guild's locations change."""
+        version = LocationStore.version(guild_id)
+        cached = self.sub_list_cache.get((guild_id, trainer), None)
+        if cached is not None and cached[0] == version:
+            return cached[1]
         subscriptions = {}
-        for t in types:
-            if t == 'gym':
-                for r in results:
-                    if r.type == 'gym':
-                        if r.specific:
-                            subscriptions[f"Level {r.target} Raids at"] = r.specific
-                        else:
-                            msg = subscriptions.get('gym', "")
-                            if len(msg) < 1:
-                                msg = r.target
-                            else:
-                                msg += f', {r.target}'
-                            subscriptions['gym'] = msg
-
-            else:
-                subscriptions[t] = [s.target for s in results if s.type == t and t != 'gym']
-        listmsg_list = []
-        subscription_msg = ""
-        sep = '\n\t'
-        for sub in subscriptions.keys():
-            if not isinstance(subscriptions[sub], list):
-                subscriptions[sub] = [subscriptions[sub]]
-            new_msg = f"**Subscription type - {sub.title()}**:\n\t{sep.join(subscriptions[sub])}\n\n"
-            if len(subscription_msg) + len(new_msg) < constants.MAX_MESSAGE_LENGTH:
-                subscription_msg += new_msg
-            else:
-                listmsg_list.append(subscription_msg)
-                subscription_msg = new_msg
-        listmsg_list.append(subscription_msg)
-        return listmsg_list
+        for sub_type, target, gym_ids in SubscriptionIndex.trainer_subscriptions(guild_id, trainer):
+            entries = subscriptions.setdefault(sub_type, {})
+            if sub_type == 'gym':
+                gyms = [LocationStore.by_id(guild_id, 'gym', gym_id) for gym_id in sorted(gym_ids or [])]
+                names = [g.name for g in gyms if g]
+                if names:
+                    entries.setdefault(f"Level {target} Raids at", []).extend(names)
+                    continue
+            entries.setdefault(sub_type, []).append(target)
+        sections = {}
+        for sub_type, entries in subscriptions.items():
+            for heading, targets in entries.items():
+                if sub_type != 'gym':
+                    sep = '\n\t'
+                elif heading == 'gym':
+                    sep = ', '
+                else:
+                    sep = ',\n\t'
+                sections.setdefault(sub_type, []).append(
+                    f"**Subscription type - {heading.title()}**:\n\t{sep.join(targets)}\n\n")
+        self.sub_list_cache[(guild_id, trainer)] = (version, sections)
+        return sections
+
+    def _sub_list_pages(self, guild_id, trainer, types):
+        """Yields the trainer's subscription list for the given types (all if empty)
+        in messages that fit Discord's length limit."""
+        sections = self._get_sub_list_sections(guild_id, trainer)
+        page = ''
+        for sub_type in sorted(sections):
+            if types and sub_type not in types:
+                continue
+            for section in sections[sub_type]:
+                pieces = [section]
+                if len(section) >= constants.MAX_MESSAGE_LENGTH:
+                    # split a section too long for one message between its lines
+                    pieces, piece = [], ''
+                    for line in section.splitlines(keepends=True):
+                        if len(piece) + len(line) >= constants.MAX_MESSAGE_LENGTH:
+                            pieces.append(piece)
+                            piece = ''
+                        piece += line
+                    pieces.append(piece)
+                for piece in pieces:
+                    if len(page) + len(piece) >= constants.MAX_MESSAGE_LENGTH:
+                        yield page
+                        page = ''
+                    page += piece
+        if page:
+            yield page
 
     @_sub.command(name="adminlist", aliases=["alist"])
     @commands.has_permissions(manage_guild=True)
@@ -685,26 +772,16 @@ class Subscriptions(commands.Cog):
                 await channel.send(response_msg)
                 return await utils.sleep_and_cleanup([message, response_msg], 10)
         try:
-            results = (SubscriptionTable
-                       .select(SubscriptionTable.type, SubscriptionTable.target)
-                       .join(TrainerTable, on=(SubscriptionTable.trainer == TrainerTable.snowflake))
-                       .where(SubscriptionTable.trainer == trainerid)
-                       .where(TrainerTable.guild == ctx.guild.id)
-                       .where(SubscriptionTable.guild_id == ctx.guild.id))
-
-            results = results.execute()
-            subscription_msg = ''
-            types = set([s.type for s in results])
-            subscriptions = {t: [s.target for s in results if s.type == t] for t in types}
-
-            for sub in subscriptions:
-                subscription_msg += '**{category}**:\n\t{subs}\n\n'.format(category=sub.title(),
-                                                                           subs='\n\t'.join(subscriptions[sub]))
-            if len(subscription_msg) > 0:
+            pages = self._sub_list_pages(ctx.guild.id, int(trainerid), [])
+            first_page = next(pages, None)
+            if first_page is not None:
                 listmsg = "Listing subscriptions for user:  {id}\n".format(id=trainer)
-                listmsg += 'Current subscriptions are:\n\n{subscriptions}'.format(subscriptions=subscription_msg)
+                listmsg += 'Current subscriptions are:\n\n'
                 await message.add_reaction(self.success_react)
                 await author.send(listmsg)
+                await author.send(first_page)
+                for page in pages:
+                    await author.send(page)
             else:
                 none_msg = await channel.send(f"No subscriptions found for user: {trainer}")
                 await message.add_reaction(self.success_react)
@@ -723,41 +800,45 @@ class Subscriptions(commands.Cog):
 
     @staticmethod
     def close_enough(coord1, coord2, distance):
-        #haversine
-        R = 6372800  # Earth radius in meters
-        conv = 1609.34 # meters in a mile
-        lat1, lon1 = coord1
-        lat2, lon2 = coord2
-        
-        phi1, phi2 = math.radians(lat1), math.radians(lat2) 
-        dphi = math.radians(lat2 - lat1)
-        dlambda = math.radians(lon2 - lon1)
-        
-        a = math.sin(dphi/2)**2 + \
-            math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
-        
-        return 2*R*math.atan2(math.sqrt(a), math.sqrt(1 - a)) / conv < distance
+        return spatial.haversine(*coord1, *coord2) < distance
+
+    def _get_trainer_ranges(self, guild_id):
+        ranges = self.trainer_ranges.get(guild_id, None)
+        if ranges is None:
+            ranges = spatial.RangeSet()
+            for trainer in self.bot.guild_dict[guild_id]['trainers'].get('info', {}):
+                self._set_trainer_range(ranges, guild_id, trainer)
+            self.trainer_ranges[guild_id] = ranges
+        return ranges
+
+    def _set_trainer_range(self, ranges, guild_id, trainer):
+        trainer_info = self.bot.guild_dict[guild_id]['trainers'].get('info', {}).get(trainer, {})
+        t_location = trainer_info.get('location', None)
+        distance = trainer_info.get('distance', None)
+        if t_location is not None and distance is not None:
+            ranges.set(trainer, t_location[0], t_location[1], distance)
+        else:
+            ranges.remove(trainer)
+
+    def update_trainer_range(self, guild_id, trainer):
+        """Call after a trainer's location or distance setting changes."""
+        if guild_id in self.trainer_ranges:
+            self._set_trainer_range(self.trainer_ranges[guild_id], guild_id, trainer)
+
+    @staticmethod
+    def _dedup_location(details):
+        if details.get('gym_id', None) is not None:
+            return details['gym_id']
+        if details.get('multi', False):
+            return 'multiple locations'
+        location = details.get('location', None)
+        return str(getattr(location, 'name', location)).lower()
 
     async def send_notifications_async(self, notification_type, details, new_channel, exclusions=[]):
         valid_types = ['raid', 'research', 'wild', 'nest', 'gym', 'shiny', 'item', 'lure', 'hideout']
         if notification_type not in valid_types:
             return
         guild = new_channel.guild
-        # get trainers
-        try:
-            results = (SubscriptionTable
-                       .select(SubscriptionTable.trainer, SubscriptionTable.target, SubscriptionTable.specific)
-                       .join(TrainerTable, on=(SubscriptionTable.trainer == TrainerTable.snowflake))
-                       .where((SubscriptionTable.type == notification_type) |
-                              (SubscriptionTable.type == 'pokemon') |
-                              (SubscriptionTable.type == 'gym'))
-                       .where(TrainerTable.guild == guild.id)
-                       .where(SubscriptionTable.guild_id == guild.id)).execute()
-        except:
-            return
-        # group targets by trainer
-        trainers = set([s.trainer for s in results])
-        target_dict = {t: {s.target: s.specific for s in results if s.trainer == t} for t in trainers}
         regions = set(details.get('regions', []))
         ex_eligible = details.get('ex-eligible', None)
         tier = details.get('tier', None)
@@ -770,7 +851,37 @@ class Subscriptions(commands.Cog):
             pokemon_list = [pokemon_list]
         location = details.get('location', None)
         multi = details.get('multi', False)
+        # every subscription target this report can match
+        report_targets = ['shiny', 'takeover'] + [p.name for p in pokemon_list]
+        if ex_eligible:
+            report_targets.append('ex-eligible')
+        if tier:
+            report_targets.append(str(tier))
+        if perfect:
+            report_targets.append('perfect')
+        if isinstance(gym, str):
+            report_targets.append(gym)
+        if item:
+            report_targets.append(item.lower())
+        if lure_type:
+            report_targets.append(lure_type)
+        # what wildcard subscriptions (shiny, takeover) matched, and where, for the dedup window
+        report_subject = ', '.join([p.name for p in pokemon_list]) or item or lure_type or str(tier)
+        dedup_location = self._dedup_location(details)
+        reported_gym_ids = set()
+        if tier:
+            if details.get('gym_id', None) is not None:
+                reported_gym_ids.add(details['gym_id'])
+            elif isinstance(gym, str):
+                reported_gym_ids = {g.id for g in LocationStore.by_name(guild.id, gym, 'gym')}
+        # get trainers
+        try:
+            target_dict = SubscriptionIndex.match(guild.id, {notification_type, 'pokemon', 'gym'}, report_targets)
+        except:
+            return
         region_dict = self.bot.guild_dict[guild.id]['configure_dict'].get('regions', None)
+        regions_cog = self.bot.cogs.get('Regions')
+        trainer_ranges, in_range = None, None
         outbound_dict = {}
         # build final dict
         for trainer in target_dict:
@@ -778,82 +889,52 @@ class Subscriptions(commands.Cog):
             if trainer in exclusions or not user:
                 continue
             if region_dict and region_dict.get('enabled', False):
-                matched_regions = [n for n, o in region_dict.get('info', {}).items() if
-                                   o['role'] in [r.name for r in user.roles]]
+                matched_regions = regions_cog.get_member_regions(user)
                 if regions and regions.isdisjoint(matched_regions):
                     continue
             targets = target_dict[trainer]
             descriptors = []
-            target_matched = False
+            # the subscription targets this report matched, for the dedup window
+            matched = []
             if 'ex-eligible' in targets and ex_eligible:
-                target_matched = True
+                matched.append('ex-eligible')
                 descriptors.append('ex-eligible')
             if tier and str(tier) in targets:
                 tier = str(tier)
-                if targets[tier]:
-                    try:
-                        current_gym_ids = targets[tier].strip('[').strip(']')
-                        split_id_string = current_gym_ids.split(', ')
-                        split_ids = []
-                        for s in split_id_string:
-                            try:
-                                split_ids.append(int(s))
-                            except ValueError:
-                                pass
-                        target_gyms = (GymTable
-                                       .select(LocationTable.id,
-                                               LocationTable.name,
-                                               LocationTable.latitude,
-                                               LocationTable.longitude,
-                                               RegionTable.name.alias('region'),
-                                               GymTable.ex_eligible,
-                                               LocationNoteTable.note)
-                                       .join(LocationTable)
-                                       .join(LocationRegionRelation)
-                                       .join(RegionTable)
-                                       .join(LocationNoteTable, JOIN.LEFT_OUTER,
-                                             on=(LocationNoteTable.location_id == LocationTable.id))
-                                       .where((LocationTable.guild == guild.id) &
-                                              (LocationTable.guild == RegionTable.guild) &
-                                              (LocationTable.id << split_ids)))
-                        target_gyms = target_gyms.objects(Gym)
-                        found_gym_names = [r.name for r in target_gyms]
-                        if gym in found_gym_names:
-                            target_matched = True
-                    except:
-                        pass
-                else:
-                    target_matched = True
+                for gyms in targets[tier]:
+                    if gyms is None or not gyms.isdisjoint(reported_gym_ids):
+                        matched.append(tier)
+                        break
                 descriptors.append('level {level}'.format(level=details['tier']))
             pkmn_adj = ''
             if perfect and 'perfect' in targets:
-                target_matched = True
+                matched.append('perfect')
                 pkmn_adj = 'perfect '
             for pokemon in pokemon_list:
                 if pokemon.name in targets:
-                    target_matched = True
+                    matched.append(pokemon.name)
                 full_name = pkmn_adj + pokemon.name
                 descriptors.append(full_name)
             if gym in targets:
-                target_matched = True
+                matched.append(gym)
             if item and item.lower() in targets:
-                target_matched = True
+                matched.append(item.lower())
             if 'shiny' in targets:
-                target_matched = True
+                matched.append(report_subject)
             if 'takeover' in targets or (lure_type and lure_type in targets):
-                trainer_info = self.bot.guild_dict[guild.id]['trainers'].setdefault('info', {}).setdefault(trainer, {})
-                t_location = trainer_info.setdefault('location', None)
-                distance = trainer_info.setdefault('distance', None)
-                stop = details['location']
-                if t_location is not None and distance is not None:
-                    if self.close_enough((float(stop.latitude), float(stop.longitude)),
-                                         (t_location[0], t_location[1]), distance):
-                        target_matched = True
-                    else:
-                        target_matched = False
+                if trainer_ranges is None:
+                    # one vectorized distance check covers every trainer with a range set
+                    trainer_ranges = self._get_trainer_ranges(guild.id)
+                    stop = details['location']
+                    in_range = trainer_ranges.within(float(stop.latitude), float(stop.longitude))
+                if trainer not in trainer_ranges or trainer in in_range:
+                    matched.append(lure_type or report_subject)
                 else:
-                    target_matched = True
-            if not target_matched:
+                    matched = []
+            if not matched:
+                continue
+            if not self.notification_window.allow(guild.id, trainer,
+                                                  [(target, dedup_location) for target in matched]):
                 continue
             description = ', '.join(descriptors)
             start = 'An' if re.match(r'^[aeiou]', description, re.I) else 'A'
@@ -877,70 +958,18 @@ class Subscriptions(commands.Cog):
             else:
                 message = f'{start} {description} {notification_type} at {location} has been reported!'
             outbound_dict[trainer] = {'discord_obj': user, 'message': message}
-        pokemon_names = ' '.join([p.name for p in pokemon_list])
-        if notification_type == 'item':
-            role_name = utils.sanitize_name(f"{item} {location}".title())
-        elif notification_type == 'lure':
-            role_name = utils.sanitize_name(f'{lure_type} {location.name}'.title())
-        elif notification_type == 'hideout':
-            role_name = utils.sanitize_name(f'Rocket Hideout {location.name}'.title())
-        else:
-            role_name = utils.sanitize_name(f"{notification_type} {pokemon_names} {location}".title())
-        # starting to hit rate limit for role creation so explicitly mentioning all trainers in the meantime
         await self.notify_all_async(new_channel, outbound_dict)
         faves_cog = self.bot.cogs.get('Faves')
         return faves_cog.get_report_points(guild, pokemon_list, notification_type, perfect)
-        #return await self.generate_role_notification_async(role_name, new_channel, outbound_dict)
-
-    @staticmethod
-    async def notify_all_async(channel, outbound_dict):
-        if len(outbound_dict) == 0:
-            return
-        guild = channel.guild
-        trainer_notify_string = ''
-        for trainer in outbound_dict.values():
-            try:
-                user = guild.get_member(trainer['discord_obj'].id)
-                trainer_notify_string += user.mention
-            except:
-                pass
-        # send notification message in channel
-        obj = next(iter(outbound_dict.values()))
-        message = obj['message']
-        msg_obj = await channel.send(f'{message} {trainer_notify_string}')
 
-        async def cleanup():
-            await asyncio.sleep(60)
-            try:
-                await msg_obj.delete()
-            except:
-                pass
-
-        asyncio.ensure_future(cleanup())
-
-    @staticmethod
-    async def generate_role_notification_async(role_name, channel, outbound_dict):
-        """Generates and handles a temporary role notification in the new raid channel"""
+    async def notify_all_async(self, channel, outbound_dict):
         if len(outbound_dict) == 0:
             return
         guild = channel.guild
-        # generate new role
-        temp_role = await guild.create_role(name=role_name, hoist=False, mentionable=True)
-        for trainer in outbound_dict.values():
-            await trainer['discord_obj'].add_roles(temp_role)
-        # send notification message in channel
+        members = [guild.get_member(trainer['discord_obj'].id) for trainer in outbound_dict.values()]
+        # every trainer gets the first trainer's message
         obj = next(iter(outbound_dict.values()))
-        message = obj['message']
-        msg_obj = await channel.send(f'{temp_role.mention} {message}')
-
-        async def cleanup():
-            await asyncio.sleep(60)
-            await temp_role.delete()
-            try:
-                await msg_obj.delete()
-            except:
-                pass
-        asyncio.ensure_future(cleanup())
+        self.dispatcher.enqueue(channel, obj['message'], [m for m in members if m])
 
     def get_region_list_channel(self, guild, region, event_type):
         send_channel = None
@@ -0,0 +1,95 @@
+# GuildStore records the schema version each shard was written with and runs
+# the migrations a shard is missing when it is loaded, so each migration runs
+# once per guild rather than on every start.
+
+# sections decoded the first time they are accessed rather than when the guild is loaded
+COLD_SECTIONS = ('trainers', 'trainer_names', 'trade_dict')
+
+
+def new_guild_state():
+    return {
+        'configure_dict': {
+            'welcome': {'enabled': False, 'welcomechan': '', 'welcomemsg': ''},
+            'raid': {'enabled': False, 'report_channels': {}, 'categories': 'same',
+                     'category_dict': {}, 'raid_channels': {},
+                     'listings': {'enabled': False, 'channels': {}}, 'short_output': {}},
+            'counters': {'enabled': False, 'auto_levels': []},
+            'wild': {'enabled': False, 'report_channels': {},
+                     'listings': {'enabled': False, 'channels': {}}},
+            'research': {'enabled': False, 'report_channels': {},
+                         'listings': {'enabled': False, 'channels': {}}},
+            'archive': {'enabled': False, 'category': 'same', 'list': None},
+            'invite': {'enabled': False},
+            'team': {'enabled': False},
+            'settings': {'offset': 0, 'regional': None, 'done': False, 'prefix': None,
+                         'config_sessions': {}, 'invasion_minutes': 30, 'lure_minutes': 30},
+            'trade': {'enabled': False, 'report_channels': []},
+            'regions': {'enabled': False, 'command_channels': [], 'info': {}, 'notify_channel': None},
+            'meetup': {'enabled': False},
+            'subscriptions': {'enabled': False, 'report_channels': [], 'leaderboard_refresh_seconds': 720,
+                              'leaderboard_message': None, 'leaderboard_channel': None,
+                              'leaderboard_limit': 5, 'notification_window': 0,
+                              'notification_rate_limit': 0, 'role_pool_size': 0},
+            'pvp': {'enabled': False, 'report_channels': []},
+            'join': {'enabled': False},
+            'lure': {'enabled': False, 'report_channels': {},
+                     'listings': {'enabled': False, 'channels': {}}},
+            'invite_tracking': {'enabled': False, 'destination': None, 'invite_counts': {}},
+            'quick_badge': {'listen_channels': [], 'pokenav_channel': None, 'badge_channel': None,
+                            'badges': {}, '40_role': None, '40_listen_channels': []},
+            'hideout': {'enabled': False, 'report_channels': {},
+                        'listings': {'enabled': False, 'channels': {}}}},
+        'wildreport_dict': {},
+        'questreport_dict': {},
+        'raidchannel_dict': {},
+        'exchannel_dict': {},
+        'pvp_dict': {},
+        'raid_notice_dict': {},
+        'trade_dict': {},
+        'trainers': {},
+        'trainer_names': {}
+    }
+
+
+def _add_config_defaults(state):
+    """Adds the settings and sections introduced since the guild was set up,
+    and moves trainers out of configure_dict."""
+    try:
+        config = state['configure_dict']
+    except KeyError:
+        return new_guild_state()
+    config.setdefault('trade', {})
+    config.setdefault('regions', {'enabled': False, 'command_channels': [], 'info': {}, 'notify_channel': None})
+    config.setdefault('meetup', {'enabled': False})
+    config.setdefault('subscriptions', {'enabled': False, 'report_channels': [],
+                                        'leaderboard_refresh_seconds': 720,
+                                        'leaderboard_message': None,
+                                        'leaderboard_channel': None, 'leaderboard_limit': 5,
+                                        'notification_window': 0,
+                                        'notification_rate_limit': 0, 'role_pool_size': 0})
+    config.setdefault('pvp', {'enabled': False, 'report_channels': []})
+    config.setdefault('join', {'enabled': False})
+    config.setdefault('lure', {'enabled': False, 'report_channels': {},
+                               'listings': {'enabled': False, 'channels': {}}})
+    config.setdefault('invite_tracking', {'enabled': False, 'destination': None, 'invite_counts': {}})
+    config.setdefault('quick_badge', {'listen_channels': [], 'pokenav_channel': None,
+                                      'badge_channel': None, 'badges': {}, '40_role': None,
+                                      '40_listen_channels': []})
+    config.setdefault('hideout', {'enabled': False, 'report_channels': {},
+                                  'listings': {'enabled': True, 'channels': {}}})
+    state.setdefault('pvp_dict', {})
+    state.setdefault('raid_notice_dict', {})
+    state.setdefault('trade_dict', {})
+    state.setdefault('exchannel_dict', {})
+    try:
+        trainers = config['trainers']
+        state['trainers'] = trainers
+        del config['trainers']
+    except KeyError:
+        state.setdefault('trainers', {})
+    state.setdefault('trainer_names', {})
+    return state
+
+
+# MIGRATIONS[n] upgrades a state from schema version n to n + 1
+MIGRATIONS = [_add_config_defaults]
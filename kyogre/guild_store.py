@@ -0,0 +1,565 @@
+import asyncio
+import copy
+import hashlib
+import io
+import os
+import pickle
+import struct
+import tempfile
+from collections.abc import MutableMapping
+
+from kyogre import journal
+
+SHARD_SUFFIX = '.pickle'
+BACKUP_SUFFIX = '.pickle_backup'
+SHARD_MAGIC = b'KYGS'
+SHARD_FORMAT = 1
+# magic, shard format, schema version and length of the section table
+SHARD_HEADER = struct.Struct('<4sHHI')
+
+
+class LazySection:
+    """A top level section of a guild's state that is still pickled."""
+    __slots__ = ('data',)
+
+    def __init__(self, data):
+        self.data = data
+
+    def decode(self):
+        return pickle.loads(self.data)
+
+
+def _decoded(value):
+    return value.decode() if isinstance(value, LazySection) else value
+
+
+def _untracked(value):
+    return value._data if isinstance(value, TrackedDict) else value
+
+
+class TrackedDict(MutableMapping):
+    """A dict nested in a GuildState, as handed out by reading it.
+
+    The dict itself stays plain in the state. Writes through it are recorded
+    in the state under their key path, and the dicts nested in it are handed
+    out tracked in turn. Copies and pickles are plain dicts.
+    """
+    __slots__ = ('_data', '_root', '_path')
+
+    def __init__(self, data, root, path):
+        self._data = data
+        self._root = root
+        self._path = path
+
+    def __getitem__(self, key):
+        return self._root._track(self._path + (key,), self._data[key])
+
+    def get(self, key, default=None):
+        if key in self._data:
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if key not in self._data:
+            self[key] = default
+        return self[key]
+
+    def __setitem__(self, key, value):
+        self._data[key] = _untracked(value)
+        self._root._record(self._path + (key,))
+
+    def __delitem__(self, key):
+        del self._data[key]
+        self._root._record(self._path + (key,))
+
+    def pop(self, key, *args):
+        if key in self._data:
+            self._root._record(self._path + (key,))
+        return self._data.pop(key, *args)
+
+    def popitem(self):
+        key, value = self._data.popitem()
+        self._root._record(self._path + (key,))
+        return key, value
+
+    def clear(self):
+        if self._data:
+            self._data.clear()
+            self._root._record(self._path)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+    def __eq__(self, other):
+        return self._data == _untracked(other)
+
+    def __repr__(self):
+        return repr(self._data)
+
+    def copy(self):
+        return self._data.copy()
+
+    __copy__ = copy
+
+    def __deepcopy__(self, memo):
+        return copy.deepcopy(self._data, memo)
+
+    def __reduce_ex__(self, protocol):
+        return dict, (self._data,)
+
+
+class GuildState(dict):
+    """A guild's state dict that flags itself dirty when it's written to.
+
+    Nested dicts are handed out as TrackedDicts, so writes at any depth are
+    recorded with their key path for the journal. Lists and sets, and dict
+    subclasses, are changed in place without a way to see it, so handing one
+    out records its path as written.
+
+    Cold sections are held as LazySections and decoded in place the first
+    time they are read.
+    """
+    _in_place = (dict, list, set)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dirty = False
+        self.changed = set()
+
+    def _record(self, path):
+        self.dirty = True
+        self.changed.add(path)
+
+    def _track(self, path, value):
+        if type(value) is dict:
+            return TrackedDict(value, self, path)
+        if isinstance(value, self._in_place) and not isinstance(value, GuildState):
+            self._record(path)
+        return value
+
+    def _value(self, key, value):
+        if isinstance(value, LazySection):
+            value = value.decode()
+            dict.__setitem__(self, key, value)
+        return value
+
+    def _decode_all(self):
+        for key in [k for k, v in dict.items(self) if isinstance(v, LazySection)]:
+            self._value(key, dict.__getitem__(self, key))
+
+    def __getitem__(self, key):
+        return self._track((key,), self._value(key, super().__getitem__(key)))
+
+    def get(self, key, default=None):
+        if dict.__contains__(self, key):
+            return self[key]
+        return default
+
+    def setdefault(self, key, default=None):
+        if not dict.__contains__(self, key):
+            self[key] = default
+        return self[key]
+
+    def values(self):
+        return [self[key] for key in self.keys()]
+
+    def items(self):
+        return [(key, self[key]) for key in self.keys()]
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, _untracked(value))
+        self._record((key,))
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._record((key,))
+
+    def pop(self, key, *args):
+        if dict.__contains__(self, key):
+            self._record((key,))
+        return _decoded(super().pop(key, *args))
+
+    def popitem(self):
+        key, value = super().popitem()
+        self._record((key,))
+        return key, _decoded(value)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        for key in list(self.keys()):
+            self._record((key,))
+        super().clear()
+
+    def __deepcopy__(self, memo):
+        # snapshots are plain dicts and copying doesn't count as a change
+        self._decode_all()
+        return copy.deepcopy(dict(self), memo)
+
+
+def _outermost(paths):
+    """Returns the paths that aren't inside another one of paths."""
+    kept = set()
+    for path in sorted(paths, key=len):
+        if not any(path[:i] in kept for i in range(1, len(path))):
+            kept.add(path)
+    return kept
+
+
+def _container(state, path):
+    """Returns the plain dict path leads to in state, raising KeyError or TypeError if there's none."""
+    container = state
+    for depth, key in enumerate(path):
+        container = state._value(key, dict.__getitem__(state, key)) if depth == 0 else container[key]
+    if not isinstance(container, dict):
+        raise TypeError(f"{path} is not a dict")
+    return container
+
+
+class GuildStore(MutableMapping):
+    """guild_dict, kept as one pickled shard file per guild.
+
+    Shards are loaded the first time their guild is accessed and save() only
+    rewrites the shards of guilds that are dirty and whose contents changed,
+    each one atomically with the previous version kept as a backup.
+
+    With a journal, flush_journal() appends the values at the key paths
+    written since the last flush, so little is lost between saves. save() folds the
+    journal into the shards and recover() replays it after a crash.
+
+    external maps top level keys that are stored elsewhere to a loader. They
+    are left out of the shards and the journal, and loader(guild_id, value)
+    supplies them whenever a guild's state is loaded or set, given whatever
+    value the shard or the new state had for them.
+
+    Each top level key is pickled as its own section of the shard, behind a
+    table of the sections' lengths. Sections in cold_sections are only
+    decoded when first read, and written back as they were if never read.
+    Shards record the schema version they were written with, the number of
+    migrations applied, and the missing migrations run when one is loaded.
+    Shards written before sections existed are loaded with unpickler and
+    count as version 0.
+    """
+
+    def __init__(self, path, logger=None, unpickler=pickle.Unpickler, journal=None, external=None,
+                 migrations=(), cold_sections=()):
+        self.path = path
+        self.logger = logger
+        self.unpickler = unpickler
+        self.journal = journal
+        self.external = external or {}
+        self.migrations = list(migrations)
+        self.cold_sections = frozenset(cold_sections)
+        self._states = {}
+        self._deleted = set()
+        self._digests = {}
+        self._guild_ops = {}
+        os.makedirs(path, exist_ok=True)
+        for filename in os.listdir(path):
+            for suffix in (SHARD_SUFFIX, BACKUP_SUFFIX):
+                if filename.endswith(suffix) and filename[:-len(suffix)].isdigit():
+                    self._states[int(filename[:-len(suffix)])] = None
+
+    def _shard_path(self, guild_id, suffix=SHARD_SUFFIX):
+        return os.path.join(self.path, f'{guild_id}{suffix}')
+
+    def _load(self, guild_id):
+        for suffix in (SHARD_SUFFIX, BACKUP_SUFFIX):
+            try:
+                with open(self._shard_path(guild_id, suffix), 'rb') as fd:
+                    data = fd.read()
+                state = self._decode(data)
+                self._digests[guild_id] = _digest(data)
+                return self._attach(guild_id, state)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Failed to load guild data for {guild_id} from {suffix}. Error: {str(e)}")
+        return self._attach(guild_id, GuildState())
+
+    def _decode(self, data):
+        if data[:len(SHARD_MAGIC)] != SHARD_MAGIC:
+            return self.migrate(self.unpickler(io.BytesIO(data)).load(), 0)
+        __, __, version, table_length = SHARD_HEADER.unpack_from(data)
+        offset = SHARD_HEADER.size + table_length
+        state = {}
+        # sections are written by this code, so they skip the unpickler's renames
+        for key, length in pickle.loads(data[SHARD_HEADER.size:offset]):
+            section = data[offset:offset + length]
+            state[key] = LazySection(section) if key in self.cold_sections else pickle.loads(section)
+            offset += length
+        return self.migrate(state, version)
+
+    def _encode_shard(self, state):
+        table, sections = [], []
+        for key, value in dict.items(state):
+            if key in self.external:
+                continue
+            section = value.data if isinstance(value, LazySection) else pickle.dumps(value, 4)
+            table.append((key, len(section)))
+            sections.append(section)
+        table = pickle.dumps(table, 4)
+        header = SHARD_HEADER.pack(SHARD_MAGIC, SHARD_FORMAT, len(self.migrations), len(table))
+        return b''.join([header, table] + sections)
+
+    def migrate(self, state, version):
+        """Runs the migrations a state written with schema version version is missing.
+        Returns it as a GuildState, dirty if it was migrated."""
+        if version >= len(self.migrations):
+            return state if isinstance(state, GuildState) else GuildState(state)
+        state = {key: _decoded(value) for key, value in dict.items(state)}
+        for migration in self.migrations[version:]:
+            state = migration(state)
+        state = GuildState(state)
+        state.dirty = True
+        return state
+
+    def _attach(self, guild_id, state):
+        for key, loader in self.external.items():
+            dict.__setitem__(state, key, loader(guild_id, dict.get(state, key, None)))
+        return state
+
+    def _persisted(self, state):
+        return {k: v for k, v in dict.items(state) if k not in self.external}
+
+    def __getitem__(self, guild_id):
+        state = self._states[guild_id]
+        if state is None:
+            state = self._states[guild_id] = self._load(guild_id)
+        return state
+
+    def __setitem__(self, guild_id, value):
+        state = self._attach(guild_id, value if isinstance(value, GuildState) else GuildState(value))
+        state.dirty = True
+        self._states[guild_id] = state
+        self._deleted.discard(guild_id)
+        self._guild_ops[guild_id] = journal.SET
+
+    def __delitem__(self, guild_id):
+        del self._states[guild_id]
+        self._deleted.add(guild_id)
+        self._guild_ops[guild_id] = journal.DELETE
+
+    def __contains__(self, guild_id):
+        return guild_id in self._states
+
+    def __iter__(self):
+        return iter(self._states)
+
+    def __len__(self):
+        return len(self._states)
+
+    def __deepcopy__(self, memo):
+        return {guild_id: copy.deepcopy(self[guild_id], memo) for guild_id in self}
+
+    def dirty_guilds(self):
+        return [g for g, state in self._states.items() if state is not None and state.dirty]
+
+    def _serialize(self, guild_id):
+        """Pickles a dirty guild and marks it clean. Returns (data, digest), or None if it's unchanged."""
+        state = self._states[guild_id]
+        state.dirty = False
+        data = self._encode_shard(state)
+        digest = _digest(data)
+        if self._digests.get(guild_id, None) == digest:
+            return None
+        return data, digest
+
+    def _write_file(self, guild_id, data):
+        # only touches this guild's files, so it's safe to run in an executor
+        with tempfile.NamedTemporaryFile('wb', dir=self.path, delete=False) as tf:
+            tf.write(data)
+            tempname = tf.name
+        path = self._shard_path(guild_id)
+        if os.path.exists(path):
+            os.replace(path, self._shard_path(guild_id, BACKUP_SUFFIX))
+        os.replace(tempname, path)
+
+    def _save_failed(self, guild_id, e):
+        if guild_id in self._states and self._states[guild_id] is not None:
+            self._states[guild_id].dirty = True
+        if self.logger:
+            self.logger.error(f"Failed to save guild data for {guild_id}. Error: {str(e)}")
+
+    def _finish_save(self, sealed, failed):
+        for guild_id in list(self._deleted):
+            for suffix in (SHARD_SUFFIX, BACKUP_SUFFIX):
+                try:
+                    os.remove(self._shard_path(guild_id, suffix))
+                except FileNotFoundError:
+                    pass
+            self._deleted.discard(guild_id)
+            self._digests.pop(guild_id, None)
+        if sealed is not None and not failed:
+            self.journal.discard(sealed)
+
+    def save(self):
+        """Writes the shards of dirty guilds, removes those of deleted guilds and
+        discards the journal written before the save.
+        Returns the number of shards and bytes written."""
+        sealed = self.journal.rotate() if self.journal is not None else None
+        result, failed = {'shards': 0, 'bytes': 0}, False
+        for guild_id in self.dirty_guilds():
+            try:
+                serialized = self._serialize(guild_id)
+                if serialized is not None:
+                    self._write_file(guild_id, serialized[0])
+                    self._digests[guild_id] = serialized[1]
+                    result['shards'] += 1
+                    result['bytes'] += len(serialized[0])
+            except Exception as e:
+                failed = True
+                self._save_failed(guild_id, e)
+        self._finish_save(sealed, failed)
+        return result
+
+    async def save_async(self):
+        """save(), with the file writes run in the default executor and the event
+        loop let in between guilds. Pickling stays on the loop as it holds the GIL
+        throughout, so a thread wouldn't free the loop for it anyway."""
+        loop = asyncio.get_event_loop()
+        sealed = self.journal.rotate() if self.journal is not None else None
+        result, failed = {'shards': 0, 'bytes': 0}, False
+        for guild_id in self.dirty_guilds():
+            if guild_id not in self._states:
+                continue
+            try:
+                serialized = self._serialize(guild_id)
+                if serialized is not None:
+                    await loop.run_in_executor(None, self._write_file, guild_id, serialized[0])
+                    self._digests[guild_id] = serialized[1]
+                    result['shards'] += 1
+                    result['bytes'] += len(serialized[0])
+            except Exception as e:
+                failed = True
+                self._save_failed(guild_id, e)
+            await asyncio.sleep(0)
+        self._finish_save(sealed, failed)
+        return result
+
+    @staticmethod
+    def _encode(guild_id, path, op, value=None):
+        return pickle.dumps((guild_id, path, op, value), 4)
+
+    @staticmethod
+    def _pickled(state, path):
+        value = dict.__getitem__(state, path[0])
+        if len(path) == 1 and isinstance(value, LazySection):
+            return value.data
+        if len(path) > 1:
+            value = _container(state, path[:-1])[path[-1]]
+        return pickle.dumps(value, 4)
+
+    def flush_journal(self):
+        """Appends the changes made since the last flush to the journal. Returns the number of records."""
+        if self.journal is None:
+            return 0
+        records = []
+        for guild_id, op in self._guild_ops.items():
+            if op == journal.DELETE:
+                records.append(self._encode(guild_id, (), journal.DELETE))
+            elif guild_id in self._states:
+                state = self._states[guild_id]
+                state.changed.clear()
+                records.append(self._encode(guild_id, (), journal.SET, pickle.dumps(self._persisted(state), 4)))
+        self._guild_ops.clear()
+        for guild_id, state in self._states.items():
+            if state is None or not state.changed:
+                continue
+            for path in _outermost(state.changed):
+                if path[0] in self.external:
+                    continue
+                try:
+                    value = self._pickled(state, path)
+                except (KeyError, TypeError):
+                    records.append(self._encode(guild_id, path, journal.DELETE))
+                    continue
+                records.append(self._encode(guild_id, path, journal.SET, value))
+            state.changed.clear()
+        self.journal.append(records)
+        return len(records)
+
+    def recover(self):
+        """Replays the journal over the shards and saves the result. Returns the number of records replayed."""
+        if self.journal is None:
+            return 0
+        count = 0
+        for record in self.journal.replay():
+            guild_id, path, op, value = pickle.loads(record)
+            if value is not None:
+                value = self.unpickler(io.BytesIO(value)).load()
+            if not path:
+                if op == journal.SET:
+                    self[guild_id] = value
+                elif guild_id in self._states:
+                    del self[guild_id]
+            else:
+                if guild_id not in self._states:
+                    self._states[guild_id] = self._attach(guild_id, GuildState())
+                state = self[guild_id]
+                if path[0] in self.external:
+                    # written before the key was stored elsewhere, its loader decides what to keep
+                    if op == journal.SET:
+                        dict.__setitem__(state, path[0], self.external[path[0]](guild_id, value))
+                elif len(path) == 1:
+                    if op == journal.SET:
+                        dict.__setitem__(state, path[0], value)
+                    else:
+                        dict.pop(state, path[0], None)
+                else:
+                    try:
+                        parent = _container(state, path[:-1])
+                    except (KeyError, TypeError):
+                        # nothing to apply it to, the record replacing the parent comes later
+                        parent = None
+                    if parent is not None and op == journal.SET:
+                        parent[path[-1]] = value
+                    elif parent is not None:
+                        parent.pop(path[-1], None)
+                state.dirty = True
+            count += 1
+        self._guild_ops.clear()
+        for state in self._states.values():
+            if state is not None:
+                state.changed.clear()
+        self.save()
+        return count
+
+
+def _digest(data):
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def migrate_serverdict(store, serverdict_path, unpickler=pickle.Unpickler, logger=None):
+    """Splits a whole-dict serverdict pickle, or its backup, into shards in an empty store.
+
+    The pickle is renamed afterwards so it isn't picked up again.
+    Returns the number of guilds migrated, or None if there was nothing to migrate.
+    """
+    if len(store) > 0:
+        return None
+    for path in (serverdict_path, serverdict_path + '_backup'):
+        try:
+            with open(path, 'rb') as fd:
+                guild_dict = unpickler(fd).load()
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            if logger:
+                logger.error(f"Failed to read {path} for migration. Error: {str(e)}")
+            continue
+        for guild_id, state in guild_dict.items():
+            store[guild_id] = store.migrate(state, 0)
+        store.save()
+        os.rename(path, path + '_migrated')
+        return len(guild_dict)
+    return None
@@ -0,0 +1,134 @@
+import os
+import struct
+import time
+import zlib
+
+SEGMENT_SUFFIX = '.journal'
+# record length and crc32 of the record body
+HEADER = struct.Struct('<II')
+
+SET = 1
+DELETE = 2
+
+FSYNC_POLICIES = ('always', 'interval', 'never')
+
+
+class Journal:
+    """Append-only log of guild state changes, kept in numbered segment files.
+
+    Each record is a length and crc32 header followed by the encoded change,
+    so a record torn by a crash is detected and replay stops there. Records
+    go to the newest segment; rotate() starts a new one so the older segments
+    can be discarded once their changes are in the snapshot.
+
+    fsync is 'always' (after every append), 'interval' (at most every
+    fsync_interval seconds) or 'never' (left to the OS).
+    """
+
+    def __init__(self, path, fsync='interval', fsync_interval=1.0, logger=None):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"fsync must be one of {', '.join(FSYNC_POLICIES)}")
+        self.path = path
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.logger = logger
+        self._fd = None
+        self._last_fsync = 0
+        self._counts = {'records': 0, 'bytes': 0, 'fsyncs': 0}
+        os.makedirs(path, exist_ok=True)
+        self._segments = sorted(int(f[:-len(SEGMENT_SUFFIX)]) for f in os.listdir(path)
+                                if f.endswith(SEGMENT_SUFFIX) and f[:-len(SEGMENT_SUFFIX)].isdigit())
+        if not self._segments:
+            self._segments.append(1)
+
+    def _segment_path(self, segment):
+        return os.path.join(self.path, f'{segment:08d}{SEGMENT_SUFFIX}')
+
+    def _open(self):
+        if self._fd is None:
+            self._fd = open(self._segment_path(self._segments[-1]), 'ab')
+        return self._fd
+
+    def append(self, bodies):
+        """Appends the encoded records in bodies. Returns the number of bytes written."""
+        if not bodies:
+            return 0
+        data = b''.join(HEADER.pack(len(body), zlib.crc32(body)) + body for body in bodies)
+        fd = self._open()
+        fd.write(data)
+        fd.flush()
+        now = time.monotonic()
+        if self.fsync == 'always' or (self.fsync == 'interval' and now - self._last_fsync >= self.fsync_interval):
+            os.fsync(fd.fileno())
+            self._last_fsync = now
+            self._counts['fsyncs'] += 1
+        self._counts['records'] += len(bodies)
+        self._counts['bytes'] += len(data)
+        return len(data)
+
+    def sync(self):
+        if self._fd is not None and self.fsync != 'never':
+            os.fsync(self._fd.fileno())
+            self._last_fsync = time.monotonic()
+            self._counts['fsyncs'] += 1
+
+    def rotate(self):
+        """Starts a new segment. Returns the segments written before it."""
+        self.sync()
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+        sealed = list(self._segments)
+        self._segments.append(self._segments[-1] + 1)
+        return sealed
+
+    def discard(self, segments):
+        """Deletes segments whose changes have been written to the snapshot."""
+        for segment in segments:
+            try:
+                os.remove(self._segment_path(segment))
+            except FileNotFoundError:
+                pass
+            if segment in self._segments and segment != self._segments[-1]:
+                self._segments.remove(segment)
+
+    def replay(self):
+        """Yields the record bodies of every segment, oldest first."""
+        for segment in list(self._segments):
+            try:
+                with open(self._segment_path(segment), 'rb') as fd:
+                    data = fd.read()
+            except FileNotFoundError:
+                continue
+            offset = 0
+            while offset + HEADER.size <= len(data):
+                length, crc = HEADER.unpack_from(data, offset)
+                body = data[offset + HEADER.size:offset + HEADER.size + length]
+                if len(body) < length or zlib.crc32(body) != crc:
+                    if self.logger:
+                        self.logger.error(f"Journal segment {segment} is torn at byte {offset}, "
+                                          f"ignoring the rest of it")
+                    break
+                yield body
+                offset += HEADER.size + length
+
+    def size(self):
+        total = 0
+        for segment in self._segments:
+            try:
+                total += os.path.getsize(self._segment_path(segment))
+            except OSError:
+                pass
+        return total
+
+    def close(self):
+        self.sync()
+        if self._fd is not None:
+            self._fd.close()
+            self._fd = None
+
+    def get_stats(self):
+        stats = dict(self._counts)
+        stats['segments'] = len(self._segments)
+        stats['size'] = self.size()
+        return stats
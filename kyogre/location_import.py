@@ -0,0 +1,152 @@
+import csv
+import io
+import json
+import time
+
+from peewee import chunked
+
+from kyogre import spatial, utils
+from kyogre.exts.db.kyogredb import KyogreDB, GuildTable, RegionTable, LocationTable, GymTable, PokestopTable
+from kyogre.exts.db.kyogredb import LocationRegionRelation, LocationNoteTable
+
+CSV_FIELDS = ['type', 'name', 'latitude', 'longitude', 'region', 'ex_eligible', 'note']
+
+
+def read_rows(text, filename=''):
+    """Yields location rows from CSV, JSON Lines or JSON text.
+
+    CSV needs a header using the CSV_FIELDS column names. JSON may be a list of
+    row objects or the name-keyed format written by save_gyms_to_json and
+    save_stops_to_json (rows without ex_eligible are read as pokestops).
+    """
+    filename = filename.lower()
+    if filename.endswith('.csv'):
+        yield from csv.DictReader(io.StringIO(text))
+    elif filename.endswith('.jsonl'):
+        for line in io.StringIO(text):
+            if line.strip():
+                yield json.loads(line)
+    else:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            for name, info in data.items():
+                latitude, __, longitude = info.get('coordinates', '').partition(',')
+                notes = [n for n in info.get('notes', []) if n]
+                yield {'type': 'gym' if 'ex_eligible' in info else 'stop', 'name': name,
+                       'latitude': latitude, 'longitude': longitude, 'region': info.get('region', ''),
+                       'ex_eligible': info.get('ex_eligible', None), 'note': notes[0] if notes else None,
+                       'guild': info.get('guild', None)}
+        else:
+            yield from data
+
+
+def _validate(row, guild_id, regions):
+    """Returns (location, None) for a valid row or (None, reason) otherwise."""
+    if not isinstance(row, dict):
+        return None, 'not a row'
+    if row.get('guild') and str(row['guild']) != str(guild_id):
+        return None, 'belongs to another server'
+    loc_type = str(row.get('type') or '').strip().lower()
+    if loc_type in ('pokestop', 'stop'):
+        loc_type = 'stop'
+    elif loc_type != 'gym':
+        return None, f"unknown type '{loc_type}'"
+    name = str(row.get('name') or '').strip()
+    if not name:
+        return None, 'missing name'
+    coordinates = spatial.parse_coordinates(row.get('latitude'), row.get('longitude'))
+    if coordinates is None:
+        return None, 'invalid coordinates'
+    region = str(row.get('region') or '').strip().lower()
+    if region not in regions:
+        return None, f"unknown region '{region}'"
+    ex_eligible = row.get('ex_eligible', None)
+    if isinstance(ex_eligible, str):
+        ex_eligible = utils.convert_to_bool(ex_eligible) if ex_eligible.strip() else False
+        if ex_eligible is None:
+            return None, 'invalid ex_eligible value'
+    note = str(row.get('note') or '').strip()
+    return {'type': loc_type, 'name': name,
+            'latitude': str(row.get('latitude')).strip(), 'longitude': str(row.get('longitude')).strip(),
+            'coordinates': coordinates, 'region': regions[region],
+            'ex_eligible': bool(ex_eligible), 'note': note or None}, None
+
+
+def _insert_batch(guild_id, batch):
+    with KyogreDB._db.atomic():
+        LocationTable.insert_many([(l['name'], l['latitude'], l['longitude'], guild_id) for l in batch],
+                                  fields=[LocationTable.name, LocationTable.latitude,
+                                          LocationTable.longitude, LocationTable.guild]).execute()
+        # SQLite can't return the new ids of a multi-row insert, so look them up by the unique key
+        created = (LocationTable
+                   .select(LocationTable.id, LocationTable.name, LocationTable.latitude, LocationTable.longitude)
+                   .where((LocationTable.guild == guild_id) &
+                          (LocationTable.name << list({l['name'] for l in batch}))))
+        ids = {(c.name, c.latitude, c.longitude): c.id for c in created}
+        gyms, stops, regions, notes = [], [], [], []
+        for location in batch:
+            location_id = ids[(location['name'], location['latitude'], location['longitude'])]
+            if location['type'] == 'gym':
+                gyms.append((location_id, location['ex_eligible']))
+            else:
+                stops.append((location_id,))
+            regions.append((location_id, location['region']))
+            if location['note']:
+                notes.append((location_id, location['note']))
+        if gyms:
+            GymTable.insert_many(gyms, fields=[GymTable.location, GymTable.ex_eligible]).execute()
+        if stops:
+            PokestopTable.insert_many(stops, fields=[PokestopTable.location]).execute()
+        LocationRegionRelation.insert_many(regions, fields=[LocationRegionRelation.location,
+                                                            LocationRegionRelation.region]).execute()
+        if notes:
+            LocationNoteTable.insert_many(notes, fields=[LocationNoteTable.location,
+                                                         LocationNoteTable.note]).execute()
+
+
+def import_locations(guild_id, rows, batch_size=200):
+    """Validates, de-duplicates and inserts location rows for a guild in batches.
+
+    Rows whose name or coordinates match an existing location of the guild, or
+    an earlier row, are rejected. Returns a report dict with the counts, the
+    rejected rows as (row number, reason) tuples and the elapsed time.
+    Callers are responsible for refreshing any location caches afterwards.
+    """
+    start = time.time()
+    GuildTable.get_or_create(snowflake=guild_id)
+    regions = {r.name.lower(): r.id for r in RegionTable.select().where(RegionTable.guild == guild_id)}
+    names, coordinates = set(), set()
+    for location in LocationTable.select(LocationTable.name, LocationTable.latitude, LocationTable.longitude)\
+            .where(LocationTable.guild == guild_id):
+        names.add(location.name.lower())
+        parsed = spatial.parse_coordinates(location.latitude, location.longitude)
+        if parsed is not None:
+            coordinates.add((round(parsed[0], 6), round(parsed[1], 6)))
+    report = {'read': 0, 'gyms': 0, 'stops': 0, 'rejected': [], 'errors': []}
+    valid = []
+    for number, row in enumerate(rows, start=1):
+        report['read'] += 1
+        location, reason = _validate(row, guild_id, regions)
+        if location is not None:
+            key = (round(location['coordinates'][0], 6), round(location['coordinates'][1], 6))
+            if location['name'].lower() in names:
+                location, reason = None, 'duplicate name'
+            elif key in coordinates:
+                location, reason = None, 'duplicate coordinates'
+            else:
+                names.add(location['name'].lower())
+                coordinates.add(key)
+        if location is None:
+            report['rejected'].append((number, reason))
+            continue
+        valid.append(location)
+    for batch in chunked(valid, batch_size):
+        try:
+            _insert_batch(guild_id, batch)
+        except Exception as e:
+            report['errors'].append(f"{len(batch)} rows starting with '{batch[0]['name']}': {e}")
+            continue
+        report['gyms'] += len([l for l in batch if l['type'] == 'gym'])
+        report['stops'] += len([l for l in batch if l['type'] == 'stop'])
+    report['elapsed'] = time.time() - start
+    return report
@@ -0,0 +1,392 @@
+import asyncio
+import heapq
+import time
+from collections import deque
+
+from kyogre import constants
+
+
+def chunk_mentions(message, mentions, limit=constants.MAX_MESSAGE_LENGTH):
+    """Splits a notification into messages of at most limit characters.
+
+    The first message carries the notification text, the rest only mentions.
+    """
+    chunks = []
+    current = message
+    for mention in mentions:
+        if len(current) + len(mention) + 1 > limit:
+            chunks.append(current)
+            current = mention
+        else:
+            current = f'{current} {mention}' if current else mention
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class RolePool:
+    """Reusable mentionable roles for notifying many trainers with one mention.
+
+    Each guild gets up to role_pool_size roles, created on first use and kept in
+    the guild's subscriptions config so restarts reuse them. A notification
+    leases a free role, which is given to the matched trainers and mentioned
+    once, then stripped and returned to the pool after the cleanup window.
+    Role edits run at most role_pool_edit_limit at a time per guild.
+    The pool is off unless the guild sets a role_pool_size, with !set rolepool.
+    """
+    role_name = 'notify'
+
+    def __init__(self, guild_dict, pool_size=0, threshold=25, edit_limit=4):
+        self.guild_dict = guild_dict
+        self.pool_size = pool_size
+        self.threshold = threshold
+        self.edit_limit = edit_limit
+        self._free = {}
+        self._leased = {}
+        self._locks = {}
+        self._semaphores = {}
+        self._counts = {'leases': 0, 'exhausted': 0, 'role_edits': 0, 'edit_failures': 0}
+
+    def _config(self, guild_id):
+        return self.guild_dict.get(guild_id, {}).get('configure_dict', {}).get('subscriptions', {})
+
+    def wants(self, guild_id, member_count):
+        """Whether a notification for member_count trainers should use a pool role."""
+        config = self._config(guild_id)
+        return config.get('role_pool_size', self.pool_size) > 0 and \
+            member_count >= config.get('role_pool_threshold', self.threshold)
+
+    def _semaphore(self, guild_id):
+        if guild_id not in self._semaphores:
+            limit = self._config(guild_id).get('role_pool_edit_limit', self.edit_limit)
+            self._semaphores[guild_id] = asyncio.Semaphore(max(1, limit))
+        return self._semaphores[guild_id]
+
+    async def _edit(self, guild_id, func, *args):
+        async with self._semaphore(guild_id):
+            try:
+                await func(*args)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self._counts['edit_failures'] += 1
+                return False
+            self._counts['role_edits'] += 1
+            return True
+
+    async def _load(self, guild):
+        """Finds or creates the guild's pool roles and strips any left assigned before a restart."""
+        config = self.guild_dict[guild.id]['configure_dict'].setdefault('subscriptions', {})
+        size = config.get('role_pool_size', self.pool_size)
+        roles = [guild.get_role(role_id) for role_id in config.get('role_pool', [])]
+        roles = [r for r in roles if r is not None][:size]
+        while len(roles) < size:
+            try:
+                roles.append(await guild.create_role(name=f'{self.role_name}-{len(roles) + 1}',
+                                                     hoist=False, mentionable=True,
+                                                     reason='Subscription notification role pool'))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                break
+        config['role_pool'] = [r.id for r in roles]
+        await asyncio.gather(*[self._edit(guild.id, m.remove_roles, r) for r in roles for m in r.members])
+        self._free[guild.id] = [r.id for r in roles]
+        self._leased[guild.id] = set()
+
+    def forget(self, guild_id):
+        """Drops the guild's loaded roles, so the next lease loads them again at the configured size."""
+        self._free.pop(guild_id, None)
+        self._leased.pop(guild_id, None)
+
+    async def lease(self, guild):
+        """Returns a free pool role, or None if the guild has none available."""
+        if guild.id not in self._free:
+            lock = self._locks.setdefault(guild.id, asyncio.Lock())
+            async with lock:
+                if guild.id not in self._free:
+                    await self._load(guild)
+        free = self._free[guild.id]
+        while free:
+            role = guild.get_role(free.pop())
+            if role is not None:
+                self._leased[guild.id].add(role.id)
+                self._counts['leases'] += 1
+                return role
+        self._counts['exhausted'] += 1
+        return None
+
+    async def assign(self, role, members):
+        """Gives role to each member. Returns the members that have it."""
+        results = await asyncio.gather(*[self._edit(role.guild.id, m.add_roles, role) for m in members])
+        return [m for m, added in zip(members, results) if added]
+
+    async def release(self, role, members):
+        """Strips role from its holders and returns it to the pool."""
+        holders = {m.id: m for m in list(members) + list(role.members)}
+        await asyncio.gather(*[self._edit(role.guild.id, m.remove_roles, role) for m in holders.values()])
+        leased = self._leased.get(role.guild.id, set())
+        if role.id in leased:
+            leased.discard(role.id)
+            self._free[role.guild.id].append(role.id)
+
+    def get_stats(self):
+        stats = dict(self._counts)
+        stats['in_use'] = sum(len(leased) for leased in self._leased.values())
+        stats['free'] = sum(len(free) for free in self._free.values())
+        return stats
+
+
+class NotificationWindow:
+    """Remembers which (target, location) pairs each trainer was notified about.
+
+    Within the guild's notification_window seconds, a trainer isn't notified
+    again when they were already notified about every pair a report matched,
+    so repeat reports of a spawn ping them once. The pairs are keyed by the
+    subscription target, so an egg and its hatch only ping once for trainers
+    subscribed to the tier alone; a subscription to the boss still matches
+    the hatch. notification_rate_limit caps how many notifications a trainer
+    gets per window, 0 for no cap. Both come from the guild's subscriptions
+    config. The window is 0 unless a guild sets it, which turns this off.
+    """
+    sweep_interval = 60
+
+    def __init__(self, guild_dict, window=0, rate_limit=0):
+        self.guild_dict = guild_dict
+        self.window = window
+        self.rate_limit = rate_limit
+        self._seen = {}
+        self._sent = {}
+        self._next_sweep = 0
+        self._counts = {'allowed': 0, 'duplicates': 0, 'rate_limited': 0}
+
+    def _settings(self, guild_id):
+        config = self.guild_dict.get(guild_id, {}).get('configure_dict', {}).get('subscriptions', {})
+        return config.get('notification_window', self.window), config.get('notification_rate_limit', self.rate_limit)
+
+    def _sweep(self, now):
+        if now < self._next_sweep:
+            return
+        self._next_sweep = now + self.sweep_interval
+        for seen in self._seen.values():
+            for key in [k for k, expiry in seen.items() if expiry <= now]:
+                del seen[key]
+        for guild_id, sent in self._sent.items():
+            window = self._settings(guild_id)[0]
+            for trainer in list(sent):
+                times = sent[trainer]
+                while times and times[0] <= now - window:
+                    times.popleft()
+                if not times:
+                    del sent[trainer]
+
+    def allow(self, guild_id, trainer, keys, now=None):
+        """Returns whether trainer should be notified about the (target, location) keys,
+        recording the notification if so."""
+        window, rate_limit = self._settings(guild_id)
+        if window <= 0:
+            return True
+        now = time.monotonic() if now is None else now
+        self._sweep(now)
+        seen = self._seen.setdefault(guild_id, {})
+        if keys and all(seen.get((trainer, key), 0) > now for key in keys):
+            self._counts['duplicates'] += 1
+            return False
+        if rate_limit > 0:
+            times = self._sent.setdefault(guild_id, {}).setdefault(trainer, deque())
+            while times and times[0] <= now - window:
+                times.popleft()
+            if len(times) >= rate_limit:
+                self._counts['rate_limited'] += 1
+                return False
+            times.append(now)
+        for key in keys:
+            seen[(trainer, key)] = now + window
+        self._counts['allowed'] += 1
+        return True
+
+    def get_stats(self):
+        stats = dict(self._counts)
+        stats['tracked'] = sum(len(seen) for seen in self._seen.values())
+        return stats
+
+
+class NotificationDispatcher:
+    """Sends subscription notifications from background workers.
+
+    Reports only enqueue a job, so the reporting command isn't held up by the
+    sends. A job waits coalesce_seconds before it is sent and any notification
+    with the same text for the same channel that arrives in the meantime is
+    merged into it. With a role_pool, notifications for many trainers mention a
+    leased pool role instead of each trainer. Sent messages are deleted, and
+    pool roles reclaimed, by a single scheduler task.
+    """
+
+    def __init__(self, logger=None, workers=2, coalesce_seconds=2.0, delete_after=60, role_pool=None):
+        self.logger = logger
+        self.role_pool = role_pool
+        self.worker_count = workers
+        self.coalesce_seconds = coalesce_seconds
+        self.delete_after = delete_after
+        self._queue = None
+        self._pending = {}
+        self._tasks = []
+        self._scheduled = []
+        self._scheduled_added = None
+        self._sequence = 0
+        self._latencies = deque(maxlen=500)
+        self._counts = {'jobs': 0, 'coalesced': 0, 'messages': 0, 'failed': 0, 'deleted': 0,
+                        'role_notifications': 0}
+
+    def _start(self):
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue()
+        self._scheduled_added = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._worker()) for __ in range(self.worker_count)]
+        self._tasks.append(asyncio.ensure_future(self._scheduler()))
+
+    def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self._pending = {}
+
+    def enqueue(self, channel, message, members):
+        """Queues a notification mentioning every member in members."""
+        if not members:
+            return
+        self._start()
+        key = (channel.id, message)
+        job = self._pending.get(key, None)
+        if job is not None:
+            self._counts['coalesced'] += 1
+        else:
+            job = {'channel': channel, 'message': message, 'members': {},
+                   'queued': time.monotonic()}
+            self._pending[key] = job
+            self._queue.put_nowait(key)
+            self._counts['jobs'] += 1
+        for member in members:
+            job['members'].setdefault(member.id, member)
+
+    async def _worker(self):
+        while True:
+            key = await self._queue.get()
+            job = self._pending.get(key, None)
+            if job is None:
+                continue
+            delay = job['queued'] + self.coalesce_seconds - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self._pending.pop(key, None)
+            try:
+                await self._send(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(f"Failed to send notification: {e}")
+
+    async def _send(self, job):
+        message = job['message']
+        members = list(job['members'].values())
+        if self.role_pool is not None and self.role_pool.wants(job['channel'].guild.id, len(members)):
+            sent, members = await self._send_with_role(job['channel'], message, members)
+            if sent:
+                # the role mention carried the message, only trainers the role couldn't be given to remain
+                message = ''
+        for chunk in chunk_mentions(message, [m.mention for m in members]):
+            msg_obj = await self._send_message(job['channel'], chunk)
+            if msg_obj is not None:
+                self.schedule_delete(msg_obj, self.delete_after)
+        self._latencies.append(time.monotonic() - job['queued'])
+
+    async def _send_with_role(self, channel, message, members):
+        """Mentions a leased pool role given to members.
+
+        Returns whether the message was sent and the members still to be mentioned directly."""
+        role = await self.role_pool.lease(channel.guild)
+        if role is None:
+            return False, members
+        assigned = await self.role_pool.assign(role, members)
+        msg_obj = None
+        if assigned:
+            msg_obj = await self._send_message(channel, f'{role.mention} {message}')
+        self.schedule(self.delete_after, self.role_pool.release, role, assigned)
+        if msg_obj is None:
+            return False, members
+        self._counts['role_notifications'] += 1
+        self.schedule_delete(msg_obj, self.delete_after)
+        assigned_ids = {m.id for m in assigned}
+        return True, [m for m in members if m.id not in assigned_ids]
+
+    async def _send_message(self, channel, content):
+        try:
+            msg_obj = await channel.send(content)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            self._counts['failed'] += 1
+            return None
+        self._counts['messages'] += 1
+        return msg_obj
+
+    def schedule(self, delay, callback, *args):
+        """Awaits callback(*args) after delay seconds."""
+        self._start()
+        self._sequence += 1
+        heapq.heappush(self._scheduled, (time.monotonic() + delay, self._sequence, callback, args))
+        self._scheduled_added.set()
+
+    def schedule_delete(self, message, delay):
+        """Deletes message after delay seconds."""
+        self.schedule(delay, self._delete, message)
+
+    async def _delete(self, message):
+        try:
+            await message.delete()
+            self._counts['deleted'] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            pass
+
+    async def _run_scheduled(self, callback, args):
+        try:
+            await callback(*args)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self.logger:
+                self.logger.error(f"Scheduled notification cleanup failed: {e}")
+
+    async def _scheduler(self):
+        while True:
+            if not self._scheduled:
+                self._scheduled_added.clear()
+                await self._scheduled_added.wait()
+                continue
+            delay = self._scheduled[0][0] - time.monotonic()
+            if delay > 0:
+                # wake early if something due sooner gets scheduled
+                self._scheduled_added.clear()
+                try:
+                    await asyncio.wait_for(self._scheduled_added.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            __, __, callback, args = heapq.heappop(self._scheduled)
+            # role reclaims can take a while, don't hold up the deletes behind them
+            asyncio.ensure_future(self._run_scheduled(callback, args))
+
+    def get_stats(self):
+        latencies = sorted(self._latencies)
+        stats = dict(self._counts)
+        stats['queue_depth'] = len(self._pending)
+        stats['scheduled'] = len(self._scheduled)
+        stats['latency_avg'] = sum(latencies) / len(latencies) if latencies else 0
+        stats['latency_p95'] = latencies[int(len(latencies) * 0.95)] if latencies else 0
+        stats['latency_max'] = latencies[-1] if latencies else 0
+        stats['role_pool'] = self.role_pool.get_stats() if self.role_pool is not None else None
+        return stats
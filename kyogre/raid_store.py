@@ -0,0 +1,228 @@
+import pickle
+
+from peewee import chunked
+
+from kyogre.exts.db.kyogredb import KyogreDB, RaidChannelTable, RaidLogTable, RaidRSVPTable
+from kyogre.guild_store import GuildState
+
+STATUSES = ('maybe', 'coming', 'here', 'lobby')
+# kept in their own tables, a row per trainer or logged message
+SEPARATE = ('trainer_dict', 'logs')
+
+
+class RaidChannels(GuildState):
+    """A guild's raidchannel_dict. Writes to its channels are recorded the
+    same way GuildState records the key paths written to."""
+
+    def __init__(self, guild_id, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.guild_id = guild_id
+
+
+class RaidChannelStore:
+    """Raid channel state, kept in RaidChannelTable with one RaidRSVPTable row
+    per trainer in the raid and one RaidLogTable row per archived message.
+
+    Each guild's raidchannel_dict is loaded from the tables when its guild
+    state is loaded, and GuildStore leaves it out of the shards. flush()
+    writes what changed since the last flush, going by the key paths written:
+    the channel row is updated in place and only the trainers and messages
+    written to are upserted or deleted. The queries flush the guild first,
+    so they see every change made on the event loop so far. A channel that
+    fails to write is logged and retried on the next flush without holding
+    back the others.
+    """
+    _guilds = {}
+    logger = None
+
+    @classmethod
+    def load(cls, guild_id, legacy=None):
+        """Returns the guild's raidchannel_dict. legacy is the raidchannel_dict
+        found in the guild's shard, which is imported if the tables have none."""
+        current = cls._guilds.get(guild_id, None)
+        if current is not None:
+            if legacy is current:
+                return current
+            cls.flush(guild_id)
+        channels = RaidChannels(guild_id)
+        rows = list(RaidChannelTable.select().where(RaidChannelTable.guild == guild_id))
+        for row in rows:
+            raid = pickle.loads(row.state)
+            raid['trainer_dict'] = {}
+            if 'logs' in raid:
+                # written before logs had their own table, rewrite it without them
+                channels.changed.add((row.channel,))
+            dict.__setitem__(channels, row.channel, raid)
+        rsvps = (RaidRSVPTable
+                 .select(RaidRSVPTable.raid_channel, RaidRSVPTable.trainer, RaidRSVPTable.details)
+                 .join(RaidChannelTable)
+                 .where(RaidChannelTable.guild == guild_id))
+        for rsvp in rsvps.tuples():
+            dict.__getitem__(channels, rsvp[0])['trainer_dict'][rsvp[1]] = pickle.loads(rsvp[2])
+        logs = (RaidLogTable
+                .select(RaidLogTable.raid_channel, RaidLogTable.message, RaidLogTable.details)
+                .join(RaidChannelTable)
+                .where(RaidChannelTable.guild == guild_id))
+        for log in logs.tuples():
+            dict.__getitem__(channels, log[0]).setdefault('logs', {})[log[1]] = pickle.loads(log[2])
+        if not rows and legacy:
+            dict.update(channels, legacy)
+            channels.changed.update((channel_id,) for channel_id in legacy.keys())
+        channels.dirty = False
+        cls._guilds[guild_id] = channels
+        return channels
+
+    @staticmethod
+    def _row(raid):
+        return {
+            'type': raid.get('type', None),
+            'level': raid.get('egglevel', None),
+            'pokemon': raid.get('pokemon', None),
+            'gym': raid.get('gym', None),
+            'active': bool(raid.get('active', False)),
+            'meetup': bool(raid.get('meetup', {})),
+            'hatch_time': _timestamp(raid.get('hatch_time', None)),
+            'expire_time': _timestamp(raid.get('expire_time', None)),
+            'report_message': raid.get('raidreport', None),
+            'city_message': raid.get('raidcityreport', None),
+            'state': pickle.dumps({k: v for k, v in raid.items() if k not in SEPARATE}, 4)
+        }
+
+    @staticmethod
+    def _rsvp(channel_id, trainer, details):
+        status = details.get('status', {})
+        return {'raid_channel': channel_id, 'trainer': trainer, **{s: status.get(s, 0) for s in STATUSES},
+                'count': details.get('count', 1), 'details': pickle.dumps(details, 4)}
+
+    @staticmethod
+    def _log(channel_id, message, details):
+        return {'raid_channel': channel_id, 'message': message, 'details': pickle.dumps(details, 4)}
+
+    @classmethod
+    def _write_entries(cls, table, key_field, entry, channel_id, entries, keys):
+        """Writes a channel's trainer_dict or logs to table. keys are the ones that
+        changed, or None if the whole dict was replaced."""
+        if keys is None:
+            table.delete().where(table.raid_channel == channel_id).execute()
+            keys = entries.keys()
+        else:
+            gone = [key for key in keys if key not in entries]
+            if gone:
+                table.delete().where((table.raid_channel == channel_id) & (key_field.in_(gone))).execute()
+        rows = [entry(channel_id, key, entries[key]) for key in keys if key in entries]
+        for batch in chunked(rows, 50):
+            table.insert_many(batch).on_conflict_replace().execute()
+
+    @classmethod
+    def _write(cls, guild_id, channel_id, raid, paths):
+        """Writes the parts of the channel at paths, relative to the channel. Returns
+        False if the channel has no row yet and has to be written whole."""
+        if () not in paths:
+            if any(path[0] not in SEPARATE for path in paths):
+                updated = (RaidChannelTable.update(cls._row(raid))
+                           .where(RaidChannelTable.channel == channel_id).execute())
+                if not updated:
+                    return False
+            elif not RaidChannelTable.select().where(RaidChannelTable.channel == channel_id).exists():
+                return False
+        else:
+            RaidRSVPTable.delete().where(RaidRSVPTable.raid_channel == channel_id).execute()
+            RaidLogTable.delete().where(RaidLogTable.raid_channel == channel_id).execute()
+            RaidChannelTable.delete().where(RaidChannelTable.channel == channel_id).execute()
+            RaidChannelTable.insert(guild=guild_id, channel=channel_id, **cls._row(raid)).execute()
+        for key, table, key_field, entry in (('trainer_dict', RaidRSVPTable, RaidRSVPTable.trainer, cls._rsvp),
+                                             ('logs', RaidLogTable, RaidLogTable.message, cls._log)):
+            if () in paths or (key,) in paths:
+                keys = None
+            else:
+                keys = {path[1] for path in paths if path[0] == key and len(path) > 1}
+                if not keys:
+                    continue
+            cls._write_entries(table, key_field, entry, channel_id, raid.get(key, None) or {}, keys)
+        return True
+
+    @classmethod
+    def _delete(cls, channel_id):
+        RaidRSVPTable.delete().where(RaidRSVPTable.raid_channel == channel_id).execute()
+        RaidLogTable.delete().where(RaidLogTable.raid_channel == channel_id).execute()
+        RaidChannelTable.delete().where(RaidChannelTable.channel == channel_id).execute()
+
+    @classmethod
+    def flush(cls, guild_id=None):
+        """Writes the channels changed since the last flush. Returns the number of channels written or removed."""
+        guild_ids = [guild_id] if guild_id is not None else list(cls._guilds)
+        written = 0
+        for gid in guild_ids:
+            channels = cls._guilds.get(gid, None)
+            if channels is None or not channels.changed:
+                continue
+            changed = {}
+            for path in channels.changed:
+                changed.setdefault(path[0], set()).add(path[1:])
+            failed = set()
+            with KyogreDB._db.atomic():
+                for channel_id, paths in changed.items():
+                    try:
+                        # each channel gets a savepoint so one bad channel doesn't undo the rest
+                        with KyogreDB._db.atomic():
+                            if not dict.__contains__(channels, channel_id):
+                                cls._delete(channel_id)
+                            else:
+                                raid = dict.__getitem__(channels, channel_id)
+                                if not cls._write(gid, channel_id, raid, paths):
+                                    cls._write(gid, channel_id, raid, {()})
+                    except Exception as e:
+                        failed.add(channel_id)
+                        if cls.logger:
+                            cls.logger.error(f"Failed to save raid channel {channel_id}. Error: {str(e)}")
+                        continue
+                    written += 1
+            channels.changed = {path for path in channels.changed if path[0] in failed}
+        return written
+
+    @classmethod
+    def guilds(cls):
+        """Returns the ids of the guilds that have raid channels."""
+        cls.flush()
+        return [g for (g,) in RaidChannelTable.select(RaidChannelTable.guild).distinct().tuples()]
+
+    @classmethod
+    def channels(cls, guild_id):
+        """Returns the guild's raid channels, soonest to expire first."""
+        cls.flush(guild_id)
+        return list(RaidChannelTable
+                    .select(RaidChannelTable.channel, RaidChannelTable.type, RaidChannelTable.level,
+                            RaidChannelTable.pokemon, RaidChannelTable.active, RaidChannelTable.meetup,
+                            RaidChannelTable.hatch_time, RaidChannelTable.expire_time)
+                    .where(RaidChannelTable.guild == guild_id)
+                    .order_by(RaidChannelTable.expire_time)
+                    .namedtuples())
+
+    @classmethod
+    def at_gyms(cls, guild_id, gym_ids):
+        """Returns (channel, level) for the raids, not meetups, reported at any of the gyms."""
+        if not gym_ids:
+            return []
+        cls.flush(guild_id)
+        return list(RaidChannelTable
+                    .select(RaidChannelTable.channel, RaidChannelTable.level)
+                    .where((RaidChannelTable.guild == guild_id) &
+                           (RaidChannelTable.gym.in_(list(gym_ids))) &
+                           (RaidChannelTable.meetup == False))
+                    .tuples())
+
+    @classmethod
+    def by_report(cls, guild_id, message_id):
+        """Returns the raid channel whose report or city report message is message_id, or None."""
+        cls.flush(guild_id)
+        row = (RaidChannelTable
+               .select(RaidChannelTable.channel)
+               .where((RaidChannelTable.guild == guild_id) &
+                      ((RaidChannelTable.report_message == message_id) |
+                       (RaidChannelTable.city_message == message_id)))
+               .first())
+        return row.channel if row else None
+
+
+def _timestamp(value):
+    return float(value) if isinstance(value, (int, float)) else None
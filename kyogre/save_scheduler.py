@@ -0,0 +1,119 @@
+import asyncio
+import copy
+import time
+from collections import deque
+
+from kyogre import utils
+from kyogre.exts.locationmatching import GymAliasStore
+from kyogre.exts.pokemon import Pokemon
+from kyogre.raid_store import RaidChannelStore
+
+
+class SaveScheduler:
+    """Coalesces save requests into at most one flush every interval seconds.
+
+    Every request made before a flush starts is answered by that flush, so the
+    maintenance loops and commands asking for saves back to back only cost one.
+    A flush writes config.json, the changed raid channels, the gym alias hit
+    counts, the dirty guild shards and the location and pokemon exports of the
+    guilds saves were requested for. State is snapshotted on the event loop and
+    the files are written in the default executor.
+    """
+
+    def __init__(self, bot, interval=60):
+        self.bot = bot
+        self.interval = interval
+        self._pending = None
+        self._guild_ids = set()
+        self._wake = None
+        self._lock = asyncio.Lock()
+        self._last_flush = 0
+        self._durations = deque(maxlen=100)
+        self._counts = {'requests': 0, 'flushes': 0, 'shards': 0, 'bytes': 0, 'failures': 0}
+
+    async def request(self, guild_id=None, immediate=False):
+        """Waits for a flush that includes everything changed before the request.
+        immediate skips the wait for the interval, for shutdowns.
+        Returns the flush result: shards and bytes written and any errors."""
+        self._counts['requests'] += 1
+        if guild_id is not None:
+            self._guild_ids.add(guild_id)
+        if self._pending is None:
+            self._pending = asyncio.get_event_loop().create_future()
+            self._wake = asyncio.Event()
+            asyncio.ensure_future(self._run(self._pending, self._wake))
+        if immediate:
+            self._wake.set()
+        return await asyncio.shield(self._pending)
+
+    async def _run(self, future, wake):
+        delay = self._last_flush + self.interval - time.monotonic()
+        if delay > 0:
+            try:
+                await asyncio.wait_for(wake.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+        async with self._lock:
+            # requests from here on wait for the next flush
+            self._pending = None
+            guild_ids, self._guild_ids = self._guild_ids, set()
+            try:
+                result = await self._flush(guild_ids)
+            except Exception as e:
+                self._counts['failures'] += 1
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                self._last_flush = time.monotonic()
+
+    async def _flush(self, guild_ids):
+        start = time.monotonic()
+        loop = asyncio.get_event_loop()
+        result = {'shards': 0, 'bytes': 0, 'errors': []}
+        err = await loop.run_in_executor(None, utils.dump_json_atomic, copy.deepcopy(self.bot.config), 'config.json')
+        if err is not None:
+            self.bot.logger.error(f"Failed to save config. Error: {str(err)}")
+            result['errors'].append(f'Failed to save config with error: {err}!')
+        try:
+            RaidChannelStore.flush()
+        except Exception as e:
+            self.bot.logger.error(f"Failed to save raid channels. Error: {str(e)}")
+            result['errors'].append(f'Failed to save raid channel data with error: {e}!')
+        try:
+            GymAliasStore.flush()
+        except Exception as e:
+            self.bot.logger.error(f"Failed to save gym alias hits. Error: {str(e)}")
+            result['errors'].append(f'Failed to save gym alias hits with error: {e}!')
+        saved = await self.bot.guild_dict.save_async()
+        result['shards'], result['bytes'] = saved['shards'], saved['bytes']
+        location_matching_cog = self.bot.cogs.get('LocationMatching')
+        if guild_ids and not location_matching_cog:
+            result['errors'].append('Pokestop and Gym data not saved!')
+        elif location_matching_cog:
+            for guild_id in guild_ids:
+                stop_save = await location_matching_cog.save_stops_to_json(guild_id)
+                gym_save = await location_matching_cog.save_gyms_to_json(guild_id)
+                if stop_save is not None:
+                    result['errors'].append(f'Failed to save pokestop data with error: {stop_save}!')
+                if gym_save is not None:
+                    result['errors'].append(f'Failed to save gym data with error: {gym_save}!')
+        pkmn_save = await Pokemon.save_pokemon_to_json(self.bot)
+        if pkmn_save is not None:
+            result['errors'].append(f'Failed to save pokemon data with error: {pkmn_save}!')
+        duration = time.monotonic() - start
+        self._durations.append(duration)
+        self._counts['flushes'] += 1
+        self._counts['shards'] += result['shards']
+        self._counts['bytes'] += result['bytes']
+        result['duration'] = duration
+        return result
+
+    def get_stats(self):
+        durations = sorted(self._durations)
+        stats = dict(self._counts)
+        stats['pending'] = self._pending is not None
+        stats['duration_avg'] = sum(durations) / len(durations) if durations else 0
+        stats['duration_max'] = durations[-1] if durations else 0
+        stats['last_flush_age'] = time.monotonic() - self._last_flush if self._last_flush else None
+        return stats
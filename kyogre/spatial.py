@@ -0,0 +1,191 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS = 6372800  # meters
+METERS_PER_MILE = 1609.34
+MILES_PER_DEGREE = 2 * math.pi * EARTH_RADIUS / METERS_PER_MILE / 360
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance in miles between two points."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = math.radians(lat2 - lat1)
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi/2)**2 + math.cos(phi1)*math.cos(phi2)*math.sin(dlambda/2)**2
+    return 2*EARTH_RADIUS*math.atan2(math.sqrt(a), math.sqrt(1 - a)) / METERS_PER_MILE
+
+
+def parse_coordinates(latitude, longitude):
+    """Returns (lat, lon) as floats, or None if either value is missing or invalid."""
+    try:
+        lat, lon = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        return None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+
+class GridIndex:
+    """Buckets points into fixed-size latitude/longitude cells.
+
+    Queries only visit the cells overlapping the search area, so their cost
+    grows with the number of nearby points rather than the total.
+    """
+
+    def __init__(self, cell_size=0.02):
+        self.cell_size = cell_size
+        self._cells = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def __contains__(self, key):
+        return key in self._points
+
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_size)), int(math.floor(lon / self.cell_size))
+
+    def add(self, key, lat, lon):
+        self.remove(key)
+        self._points[key] = (lat, lon)
+        self._cells.setdefault(self._cell(lat, lon), set()).add(key)
+
+    def remove(self, key):
+        point = self._points.pop(key, None)
+        if point is None:
+            return
+        cell = self._cell(*point)
+        keys = self._cells[cell]
+        keys.discard(key)
+        if not keys:
+            del self._cells[cell]
+
+    def _keys_in_cells(self, min_lat, min_lon, max_lat, max_lon):
+        lat_start, lon_start = self._cell(min_lat, min_lon)
+        lat_end, lon_end = self._cell(max_lat, max_lon)
+        if (lat_end - lat_start + 1) * (lon_end - lon_start + 1) > len(self._cells):
+            # the box covers more cells than are occupied, walk the occupied ones instead
+            for (lat_cell, lon_cell), keys in self._cells.items():
+                if lat_start <= lat_cell <= lat_end and lon_start <= lon_cell <= lon_end:
+                    yield from keys
+            return
+        for lat_cell in range(lat_start, lat_end + 1):
+            for lon_cell in range(lon_start, lon_end + 1):
+                yield from self._cells.get((lat_cell, lon_cell), ())
+
+    def bounding_box(self, min_lat, min_lon, max_lat, max_lon):
+        """Returns the keys of all points inside the box."""
+        result = []
+        for key in self._keys_in_cells(min_lat, min_lon, max_lat, max_lon):
+            lat, lon = self._points[key]
+            if min_lat <= lat <= max_lat and min_lon <= lon <= max_lon:
+                result.append(key)
+        return result
+
+    @staticmethod
+    def _box_around(lat, lon, miles):
+        lat_span = miles / MILES_PER_DEGREE
+        cos_lat = math.cos(math.radians(min(89.0, abs(lat) + lat_span)))
+        lon_span = min(180.0, miles / (MILES_PER_DEGREE * cos_lat))
+        return lat - lat_span, lon - lon_span, lat + lat_span, lon + lon_span
+
+    def within_radius(self, lat, lon, miles):
+        """Returns (key, distance) for every point within miles, closest first."""
+        result = []
+        for key in self._keys_in_cells(*self._box_around(lat, lon, miles)):
+            distance = haversine(lat, lon, *self._points[key])
+            if distance <= miles:
+                result.append((key, distance))
+        result.sort(key=lambda r: r[1])
+        return result
+
+    def nearest(self, lat, lon, k=1):
+        """Returns (key, distance) for the k closest points, closest first."""
+        k = min(k, len(self._points))
+        if k < 1:
+            return []
+        # double the radius until it holds k points, everything closer has then been seen
+        miles = self.cell_size * MILES_PER_DEGREE / 2
+        while True:
+            found = self.within_radius(lat, lon, miles)
+            if len(found) >= k:
+                return found[:k]
+            if miles > 2 * math.pi * EARTH_RADIUS / METERS_PER_MILE:
+                return found
+            miles *= 2
+
+
+class RangeSet:
+    """Home locations and notification radii held in NumPy arrays.
+
+    Lets a single vectorized haversine decide which of many trainers are
+    close enough to a reported location. Entries are updated in place as
+    trainers change their settings.
+    """
+
+    def __init__(self):
+        self._keys = []
+        self._slots = {}
+        self._lat = np.empty(0)
+        self._lon = np.empty(0)
+        self._cos_lat = np.empty(0)
+        self._miles = np.empty(0)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, key):
+        return key in self._slots
+
+    def _grow(self):
+        capacity = max(16, 2 * len(self._lat))
+        for name in ('_lat', '_lon', '_cos_lat', '_miles'):
+            array = np.empty(capacity)
+            array[:len(self._keys)] = getattr(self, name)[:len(self._keys)]
+            setattr(self, name, array)
+
+    def set(self, key, lat, lon, miles):
+        slot = self._slots.get(key, None)
+        if slot is None:
+            slot = len(self._keys)
+            if slot == len(self._lat):
+                self._grow()
+            self._keys.append(key)
+            self._slots[key] = slot
+        self._lat[slot] = math.radians(lat)
+        self._lon[slot] = math.radians(lon)
+        self._cos_lat[slot] = math.cos(self._lat[slot])
+        self._miles[slot] = miles
+
+    def remove(self, key):
+        slot = self._slots.pop(key, None)
+        if slot is None:
+            return
+        last = len(self._keys) - 1
+        if slot != last:
+            # move the last entry into the freed slot to keep the arrays dense
+            moved = self._keys[last]
+            self._keys[slot] = moved
+            self._slots[moved] = slot
+            for array in (self._lat, self._lon, self._cos_lat, self._miles):
+                array[slot] = array[last]
+        self._keys.pop()
+
+    def mask(self, lat, lon):
+        """Returns the keys and a boolean mask of which of them are strictly
+        within their own radius of the point."""
+        size = len(self._keys)
+        phi = math.radians(lat)
+        dphi = (phi - self._lat[:size]) / 2
+        dlambda = (math.radians(lon) - self._lon[:size]) / 2
+        a = np.sin(dphi)**2 + math.cos(phi) * self._cos_lat[:size] * np.sin(dlambda)**2
+        miles = 2*EARTH_RADIUS*np.arctan2(np.sqrt(a), np.sqrt(1 - a)) / METERS_PER_MILE
+        return self._keys, miles < self._miles[:size]
+
+    def within(self, lat, lon):
+        """Returns the set of keys whose radius includes the point."""
+        keys, mask = self.mask(lat, lon)
+        return {keys[i] for i in np.flatnonzero(mask)}
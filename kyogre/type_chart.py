@@ -0,0 +1,79 @@
+import numpy as np
+
+from kyogre import utils
+
+
+class TypeChart:
+    """Type effectiveness compiled from defense_chart.json.
+
+    ``matrix[d][a]`` holds the damage multiplier of attacking type ``a``
+    against defending type ``d``. ``columns[d]`` lists the attacking types
+    the chart mentions for ``d``, in the chart's order, since callers only
+    ever reported those types and in the order the chart lists them for
+    each of the defending types.
+    """
+
+    def __init__(self, defense_chart):
+        self.types = list(defense_chart.keys())
+        for def_type in defense_chart:
+            for atk_type in defense_chart[def_type]:
+                if atk_type not in self.types:
+                    self.types.append(atk_type)
+        self.type_index = {t: i for i, t in enumerate(self.types)}
+        size = len(self.types)
+        self.matrix = np.ones((size, size), dtype=np.float64)
+        self.columns = {}
+        for def_type, atk_types in defense_chart.items():
+            row = self.type_index[def_type]
+            for atk_type, value in atk_types.items():
+                self.matrix[row, self.type_index[atk_type]] = utils.get_effectiveness(value)
+            self.columns[def_type] = [self.type_index[atk_type] for atk_type in atk_types]
+        self._vector_cache = {}
+        self._effects_cache = {}
+
+    def _vector(self, def_types):
+        key = tuple(sorted(def_types))
+        cached = self._vector_cache.get(key, None)
+        if cached is None:
+            rows = [self.type_index[t] for t in key if t in self.type_index]
+            cached = self.matrix[rows].prod(axis=0) if rows else np.ones(len(self.types))
+            self._vector_cache[key] = cached
+        return cached
+
+    def _effects(self, def_types):
+        # keyed by the types in the order given, which decides the order of the results
+        key = tuple(def_types)
+        cached = self._effects_cache.get(key, None)
+        if cached is None:
+            values = self._vector(key)
+            columns = dict.fromkeys(col for t in key for col in self.columns.get(t, ()))
+            cached = [(self.types[col], float(values[col])) for col in columns]
+            self._effects_cache[key] = cached
+        return cached
+
+    def effects(self, def_types):
+        """Returns a dict of attacking type to multiplier against the given
+        defending types."""
+        return dict(self._effects(def_types))
+
+    def weaknesses(self, def_types):
+        return {t: value for t, value in self._effects(def_types) if round(value, 3) > 1}
+
+    def weaknesses_batch(self, type_lists):
+        """Returns the weaknesses dict for each entry of type_lists, computing
+        every uncached type combination in a single matrix product."""
+        missing = {tuple(sorted(t)) for t in type_lists} - self._vector_cache.keys()
+        missing = [key for key in missing if any(t in self.type_index for t in key)]
+        if missing:
+            width = max(len(key) for key in missing)
+            size = len(self.types)
+            # pad single types with a row of ones so the whole batch can be reduced at once
+            padded = np.vstack([self.matrix, np.ones(size)])
+            index = np.full((len(missing), width), size)
+            for n, key in enumerate(missing):
+                rows = [self.type_index[t] for t in key if t in self.type_index]
+                index[n, :len(rows)] = rows
+            values = padded[index].prod(axis=1)
+            for n, key in enumerate(missing):
+                self._vector_cache[key] = values[n]
+        return [self.weaknesses(t) for t in type_lists]
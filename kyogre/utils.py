@@ -1,23 +1,239 @@
 import asyncio
 import datetime
 import dateparser
+import difflib
+import heapq
+import json
+import os
 import re
+import tempfile
 
+from collections import Counter, OrderedDict
 from dateutil.relativedelta import relativedelta
 from fuzzywuzzy import fuzz
 from fuzzywuzzy import process
+from fuzzywuzzy import utils as fuzz_utils
 
 import discord
 from kyogre import checks
 
 
-def get_match(word_list: list, word: str, score_cutoff: int = 60, isPartial: bool = False, limit: int = 1):
+class FuzzyIndex:
+    """Reusable fuzzy matcher over a list of choices.
+
+    Gives the same results as fuzzywuzzy's extractOne/extractBests with the
+    ratio or partial_ratio scorer, but choices are processed once and indexed
+    by trigram. Candidates sharing the most trigrams with the query are scored
+    first and any candidate whose upper-bound score (from length, character and
+    trigram overlap) cannot reach the cutoff or displace the current best
+    results is skipped without being scored.
+    """
+    _q = 3
+
+    def __init__(self, choices=()):
+        self._entries = {}
+        self._postings = {}
+        self._order = []
+        self._lengths = Counter()
+        self._rank = None
+        self._next_id = 0
+        for choice in choices:
+            self._order.append(self._insert(choice))
+
+    def __len__(self):
+        return len(self._order)
+
+    @property
+    def choices(self):
+        return [self._entries[slot][0] for slot in self._order]
+
+    @classmethod
+    def _grams(cls, processed):
+        return Counter(processed[i:i + cls._q] for i in range(len(processed) - cls._q + 1))
+
+    def _insert(self, choice):
+        slot = self._next_id
+        self._next_id += 1
+        processed = fuzz_utils.full_process(choice)
+        grams = self._grams(processed)
+        self._entries[slot] = (choice, processed, Counter(processed), grams)
+        self._lengths[len(processed)] += 1
+        for gram, count in grams.items():
+            self._postings.setdefault(gram, {})[slot] = count
+        self._rank = None
+        return slot
+
+    def _discard(self, slot):
+        choice, processed, chars, grams = self._entries.pop(slot)
+        self._lengths[len(processed)] -= 1
+        if not self._lengths[len(processed)]:
+            del self._lengths[len(processed)]
+        for gram in grams:
+            postings = self._postings[gram]
+            del postings[slot]
+            if not postings:
+                del self._postings[gram]
+        self._rank = None
+
+    def add(self, choice):
+        self._order.append(self._insert(choice))
+
+    def remove(self, choice):
+        for slot in [s for s in self._order if self._entries[s][0] == choice]:
+            self._order.remove(slot)
+            self._discard(slot)
+
+    def sync(self, choices):
+        """Patches the index in place so it holds exactly choices, in order.
+        Only the entries that were added, removed or renamed are reprocessed."""
+        current = self.choices
+        if current == choices:
+            return
+        matcher = difflib.SequenceMatcher(None, current, choices, autojunk=False)
+        new_order = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag == 'equal':
+                new_order.extend(self._order[i1:i2])
+                continue
+            for slot in self._order[i1:i2]:
+                self._discard(slot)
+            new_order.extend(self._insert(choice) for choice in choices[j1:j2])
+        self._order = new_order
+        self._rank = None
+
+    @classmethod
+    def _length_bound(cls, q_len, c_len, shared, is_partial):
+        """Upper bound on the score from the string lengths and the number of
+        shared trigrams, using the q-gram lemma to bound the edit distance."""
+        if not q_len or not c_len:
+            return 0
+        q = cls._q
+        if is_partial:
+            # the best window is only as long as the shorter string and can
+            # only contain trigrams the longer string has
+            short = min(q_len, c_len)
+            edits = max(0, -(-(short - q + 1 - shared) // q))
+            return int(100 - 50 * edits / short + 0.5 + 1e-7)
+        total = q_len + c_len
+        edits = max(abs(q_len - c_len), -(-(max(q_len, c_len) - q + 1 - shared) // q))
+        return int(100 - 100 * edits / total + 0.5 + 1e-7)
+
+    @staticmethod
+    def _char_bound(q_len, q_chars, entry, is_partial):
+        """Upper bound on the score from the characters the strings have in common."""
+        c_len = len(entry[1])
+        if not q_len or not c_len:
+            return 0
+        c_chars = entry[2]
+        common = 0
+        for char, count in q_chars.items():
+            c_count = c_chars.get(char, 0)
+            common += count if count < c_count else c_count
+        if is_partial:
+            common = min(common, q_len, c_len)
+            return int(200 * common / (min(q_len, c_len) + common) + 0.5 + 1e-7) if common else 0
+        return int(200 * common / (q_len + c_len) + 0.5 + 1e-7)
+
+    def extract(self, query, score_cutoff=0, is_partial=False, limit=1):
+        """Returns a list of (choice, score) tuples ordered best first, as
+        fuzzywuzzy would. A limit of None returns every match."""
+        scorer = fuzz.partial_ratio if is_partial else fuzz.ratio
+        processed_query = fuzz_utils.full_process(query)
+        if self._rank is None:
+            self._rank = {slot: n for n, slot in enumerate(self._order)}
+        rank = self._rank
+        q_len = len(processed_query)
+        q_chars = Counter(processed_query)
+        shared = {}
+        for gram, count in self._grams(processed_query).items():
+            for slot, c_count in self._postings.get(gram, {}).items():
+                shared[slot] = shared.get(slot, 0) + (count if count < c_count else c_count)
+        candidates = sorted(shared, key=lambda s: (-shared[s], rank[s]))
+        candidates.extend(s for s in self._order if s not in shared)
+        # best possible score of any choice sharing a given number of trigrams;
+        # candidates come in decreasing order of shared trigrams so once this
+        # falls below what is needed nothing later can qualify
+        group_bounds = {}
+        # min-heap of the best (score, -rank) keys seen so far, capped at limit
+        best = []
+        matches = []
+        for slot in candidates:
+            slot_shared = shared.get(slot, 0)
+            group_bound = group_bounds.get(slot_shared, None)
+            if group_bound is None:
+                group_bound = max((self._length_bound(q_len, c_len, slot_shared, is_partial) for c_len in self._lengths),
+                                  default=0)
+                group_bounds[slot_shared] = group_bound
+            if group_bound < score_cutoff or (limit is not None and len(best) >= limit and group_bound < best[0][0]):
+                break
+            entry = self._entries[slot]
+            bound = self._length_bound(q_len, len(entry[1]), slot_shared, is_partial)
+            if bound < score_cutoff:
+                continue
+            if limit is not None and len(best) >= limit and (bound, -rank[slot]) <= best[0]:
+                continue
+            bound = min(bound, self._char_bound(q_len, q_chars, entry, is_partial))
+            if bound < score_cutoff:
+                continue
+            if limit is not None and len(best) >= limit and (bound, -rank[slot]) <= best[0]:
+                continue
+            score = scorer(processed_query, entry[1])
+            if score < score_cutoff:
+                continue
+            matches.append((score, rank[slot], entry[0]))
+            if limit is not None:
+                key = (score, -rank[slot])
+                if len(best) < limit:
+                    heapq.heappush(best, key)
+                elif key > best[0]:
+                    heapq.heapreplace(best, key)
+        matches.sort(key=lambda m: (-m[0], m[1]))
+        if limit is not None:
+            matches = matches[:limit]
+        return [(choice, score) for score, __, choice in matches]
+
+    def get_match(self, word, score_cutoff=60, isPartial=False, limit=1):
+        """Same contract as :func:`get_match`, against this index."""
+        if not word:
+            return (None, None)
+        result = self.extract(word, score_cutoff, isPartial, limit)
+        if not result:
+            return (None, None)
+        if limit == 1:
+            return result[0]
+        return result
+
+
+_match_indexes = OrderedDict()
+_match_index_min_size = 50
+_match_index_cache_size = 32
+
+
+def get_match(word_list: list, word: str, score_cutoff: int = 60, isPartial: bool = False, limit: int = 1,
+              key=None):
     """Uses fuzzywuzzy to see if word is close to entries in word_list
 
+    word_list may also be a FuzzyIndex. key identifies the contents of a large
+    word_list, such as the kind of list and the version of its data, and has to
+    change whenever they do. The list is indexed on first use and the index is
+    reused for every call with the same key.
+
     Returns a tuple of (MATCH, SCORE)
     """
     if not word:
         return (None, None)
+    if isinstance(word_list, FuzzyIndex):
+        return word_list.get_match(word, score_cutoff, isPartial, limit)
+    if key is not None and len(word_list) >= _match_index_min_size:
+        index = _match_indexes.get(key, None)
+        if index is None:
+            index = FuzzyIndex(word_list)
+            _match_indexes[key] = index
+            if len(_match_indexes) > _match_index_cache_size:
+                _match_indexes.popitem(last=False)
+        else:
+            _match_indexes.move_to_end(key)
+        return index.get_match(word, score_cutoff, isPartial, limit)
     result = None
     scorer = fuzz.ratio
     if isPartial:
@@ -33,6 +249,28 @@ def get_match(word_list: list, word: str, score_cutoff: int = 60, isPartial: boo
     return result
 
 
+def dump_json_atomic(data, path, backup_path=None):
+    """Streams data as JSON to a temporary file next to path and renames it into
+    place, first moving any existing file to backup_path.
+
+    Returns the exception on failure, otherwise None."""
+    try:
+        with tempfile.NamedTemporaryFile('w', dir=os.path.dirname(path), delete=False) as f:
+            json.dump(data, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+            tempname = f.name
+        if backup_path:
+            try:
+                os.replace(path, backup_path)
+            except FileNotFoundError:
+                pass
+        os.replace(tempname, path)
+        return None
+    except Exception as err:
+        return err
+
+
 def colour(*args):
     """Returns a discord Colour object.
 